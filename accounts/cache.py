@@ -0,0 +1,42 @@
+"""
+Cache of authenticated users by email.
+
+`FirebaseAuthentication` resolves the `MarketUser` of every request. The
+user is cached by email so the lookup only hits the database on a miss.
+`accounts.signals` drops the entry whenever the user or its profile is
+saved or deleted. Other workers only see the drop with a shared cache
+(`REDIS_URL`); otherwise `USER_CACHE_TIMEOUT` bounds how long they keep a
+deactivated or re-roled user.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = "accounts:user"
+
+
+def _user_key(email):
+    digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+def get_cached_user(email):
+    """
+    Return the cached `MarketUser` for `email`, or None on a miss.
+    """
+    return cache.get(_user_key(email))
+
+
+def cache_user(user):
+    """
+    Store `user` under its email.
+    """
+    cache.set(_user_key(user.email), user, timeout=settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user(email):
+    if email:
+        cache.delete(_user_key(email))
@@ -2,47 +2,138 @@
 Firebase authentication module.
 
 Handles Firebase authentication and user management integration with Django.
+
+`auth` is `firebase_admin.auth`, or the local stand-in from
+`accounts.local_auth` when `FIREBASE_AUTH_BACKEND` is "local".
 """
 
-import logging, requests
+import hashlib
+import logging
+import threading
+import time
 logger = logging.getLogger(__name__)
+from cachetools import TLRUCache
 from django.db import transaction
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import credentials
+from firebase_admin import exceptions as firebase_exceptions
 from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from agrario_backend.http_client import get_session
+from .cache import cache_user, get_cached_user
+from .jwks import verify_id_token_offline
 from .models import MarketUser
 from .utils import get_user_role
 
-# Initialize Firebase Admin SDK
-if not firebase_admin._apps:
+if settings.FIREBASE_AUTH_BACKEND == "local":
+    from .local_auth import get_local_auth
+
+    auth = get_local_auth()
+else:
+    from firebase_admin import auth
+
+    # Initialize Firebase Admin SDK
+    if not firebase_admin._apps:
+        try:
+            cred = credentials.Certificate(settings.FIREBASE_CONFIG)
+            firebase_admin.initialize_app(cred)
+        except Exception as e:
+            raise RuntimeError("Firebase initialization error") from e
+
+def _token_expiry(key, entry, now):
+    """
+    Cached tokens expire together with the token itself.
+    """
+    return entry["claims"]["exp"]
+
+
+# sha256(token) -> {"claims": dict, "checked_at": float}
+_token_cache = TLRUCache(
+    maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE, ttu=_token_expiry, timer=time.time)
+_token_cache_lock = threading.Lock()
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def clear_token_cache():
+    with _token_cache_lock:
+        _token_cache.clear()
+    with _refresh_cache_lock:
+        _refresh_cache.clear()
+
+
+def check_revoked(decoded_token):
+    """
+    Raise like `verify_id_token(check_revoked=True)` for a revoked token or
+    disabled user.
+
+    An unreachable Firebase backend is tolerated: the token is checked again
+    after the next interval.
+    """
     try:
-        cred = credentials.Certificate(settings.FIREBASE_CONFIG)
-        firebase_admin.initialize_app(cred)
-    except Exception as e:
-        raise RuntimeError("Firebase initialization error") from e
+        user = auth.get_user(decoded_token["uid"])
+    except (firebase_exceptions.UnavailableError, firebase_exceptions.DeadlineExceededError) as e:
+        logger.warning(f"Skipping revocation check, Firebase unavailable: {str(e)}")
+        return
+
+    if user.disabled:
+        raise auth.UserDisabledError("The user record is disabled.")
+    valid_after = user.tokens_valid_after_timestamp
+    if valid_after and decoded_token["auth_time"] * 1000 < valid_after:
+        raise auth.RevokedIdTokenError("The Firebase ID token has been revoked.")
+
 
 def verify_firebase_token(token):
     """
     Verify the Firebase ID token.
 
+    Verified tokens are cached until their `exp`. A cached token is checked
+    for revocation again once `FIREBASE_REVOCATION_CHECK_INTERVAL` seconds
+    have passed since its last check.
+
+    With `FIREBASE_TOKEN_VERIFICATION = "offline"` the signature is checked
+    against the locally cached key set (see `accounts.jwks`) and only the
+    periodic revocation check talks to Firebase.
+
     Args:
         token (str): The Firebase ID token.
 
     Returns:
         dict: The decoded token if valid, None otherwise.
     """
+    key = _token_key(token)
+    now = time.time()
+
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+    if entry and now - entry["checked_at"] < settings.FIREBASE_REVOCATION_CHECK_INTERVAL:
+        return entry["claims"]
+
     try:
-        decoded_token = auth.verify_id_token(token, check_revoked=True)
-        return decoded_token
+        if settings.FIREBASE_TOKEN_VERIFICATION == "offline":
+            decoded_token = entry["claims"] if entry else verify_id_token_offline(token)
+            check_revoked(decoded_token)
+        else:
+            decoded_token = auth.verify_id_token(token, check_revoked=True)
     except auth.RevokedIdTokenError:
         logger.error("Token has been revoked.")
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
         return None
     except Exception as e:
         logger.error(f"Token verification error: {str(e)}")
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
         return None
 
+    if "exp" in decoded_token:
+        with _token_cache_lock:
+            _token_cache[key] = {"claims": decoded_token, "checked_at": now}
+    return decoded_token
+
 def create_firebase_user(email, password):
     """
     Create a Firebase user.
@@ -67,6 +158,24 @@ def create_firebase_user(email, password):
         logger.error(f"Firebase user creation error: {str(e)}")
         raise AuthenticationFailed({"error": "Could not create Firebase user. Please check the details."}) from e
 
+def set_role_claim(uid, role):
+    """
+    Store the user's role as a custom claim on the Firebase user.
+
+    ID tokens issued afterwards carry `role`, so `get_user_role` does not
+    need the database. Other custom claims are kept.
+
+    Args:
+        uid (str): The Firebase user ID.
+        role (str): The MarketUser role.
+    """
+    claims = dict(auth.get_user(uid).custom_claims or {})
+    if claims.get("role") == role:
+        return False
+    claims["role"] = role
+    auth.set_custom_user_claims(uid, claims)
+    return True
+
 def refresh_firebase_token(refresh_token):
     """
     Refresh Firebase access token using the refresh token.
@@ -78,14 +187,14 @@ def refresh_firebase_token(refresh_token):
         dict: Contains new access_token and refresh_token.
     """
     firebase_api_key = settings.FIREBASE_API_KEY
-    url = f"https://securetoken.googleapis.com/v1/token?key={firebase_api_key}"
+    url = f"{settings.FIREBASE_SECURE_TOKEN_URL}/v1/token?key={firebase_api_key}"
     
     payload = {
         "grant_type": "refresh_token",
         "refresh_token": refresh_token
     }
 
-    response = requests.post(url, data=payload)
+    response = get_session().post(url, data=payload)
     
     if response.status_code != 200:
         logger.error(f"Failed to refresh token: {response.json()}")
@@ -99,26 +208,154 @@ def refresh_firebase_token(refresh_token):
         "expires_in": data["expires_in"]
     }
 
+def _refresh_expiry(key, entry, now):
+    """
+    Refreshed tokens are reused until shortly before the new ID token expires.
+    """
+    return entry["expires_at"]
+
+
+# sha256(refresh token) -> {"tokens": dict, "expires_at": float}
+_refresh_cache = TLRUCache(
+    maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE, ttu=_refresh_expiry, timer=time.time)
+_refresh_flights = {}
+_refresh_cache_lock = threading.Lock()
+
+
+class _RefreshFlight:
+    """
+    One remote refresh in progress and, once done, its tokens or error.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.tokens = None
+        self.error = None
+
+
+def refresh_firebase_token_cached(refresh_token):
+    """
+    `refresh_firebase_token`, cached per refresh token until the new ID
+    token expires.
+
+    Concurrent calls with the same refresh token share one remote refresh:
+    the first caller refreshes, the others wait for its outcome and return
+    its tokens or raise its error. A failure is not cached; the next call
+    after it refreshes again.
+    """
+    key = _token_key(refresh_token)
+
+    with _refresh_cache_lock:
+        entry = _refresh_cache.get(key)
+        if entry:
+            return entry["tokens"]
+        flight = _refresh_flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _refresh_flights[key] = _RefreshFlight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.tokens
+
+    try:
+        tokens = refresh_firebase_token(refresh_token)
+        expires_at = (
+            time.time() + int(tokens["expires_in"])
+            - settings.FIREBASE_REFRESH_CACHE_MARGIN
+        )
+        with _refresh_cache_lock:
+            _refresh_cache[key] = {"tokens": tokens, "expires_at": expires_at}
+        flight.tokens = tokens
+        return tokens
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        # Waiters hold the flight itself, so dropping it here only makes
+        # later callers start a new refresh.
+        with _refresh_cache_lock:
+            _refresh_flights.pop(key, None)
+        flight.done.set()
+
+
+def get_bearer_token(request):
+    """
+    Return the bearer token of the `Authorization` header, or None.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split("Bearer ")[1]
+
+
+def _http_request(request):
+    # DRF wraps the Django request; memoize on the one shared by both.
+    return getattr(request, "_request", request)
+
+
+def get_firebase_claims(request):
+    """
+    Verify the request's Firebase ID token once and memoize the claims.
+
+    Authentication, permissions and views all call this, so a token is
+    verified at most once per request.
+
+    Args:
+        request: A Django `HttpRequest` or DRF `Request`.
+
+    Returns:
+        dict: The decoded token, or None if missing or invalid.
+    """
+    http_request = _http_request(request)
+    if not hasattr(http_request, "firebase_claims"):
+        token = get_bearer_token(http_request)
+        http_request.firebase_claims = verify_firebase_token(token) if token else None
+    return http_request.firebase_claims
+
+
+def get_firebase_user(request):
+    """
+    Return the `MarketUser` of the request's Firebase token, or None.
+
+    Reuses the user resolved by `FirebaseAuthentication` when available.
+    """
+    http_request = _http_request(request)
+    if not hasattr(http_request, "firebase_user"):
+        claims = get_firebase_claims(request)
+        email = claims.get("email") if claims else None
+        user = get_cached_user(email) if email else None
+        if user is None and email:
+            user = MarketUser.objects.filter(email=email).first()
+            if user is not None:
+                cache_user(user)
+        http_request.firebase_user = user
+    return http_request.firebase_user
+
+
 class FirebaseAuthentication(BaseAuthentication):
     """
     Custom authentication class for Firebase Authentication.
+
+    The decoded claims and the user are memoized on the request, see
+    `get_firebase_claims` and `get_firebase_user`. Users are looked up in
+    `accounts.cache` first; only a miss runs `get_or_create`.
     """
     
 
     def authenticate(self, request):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
+        if not get_bearer_token(request):
             return None
 
-        token = auth_header.split("Bearer ")[1]
-
-        decoded_token = verify_firebase_token(token)
+        decoded_token = get_firebase_claims(request)
         if not decoded_token:
             refresh_token = request.data.get("refresh_token") or request.headers.get("Refresh-Token")
             
             if refresh_token:
                 try:
-                    new_tokens = refresh_firebase_token(refresh_token)
+                    new_tokens = refresh_firebase_token_cached(refresh_token)
                     token = new_tokens["firebase_token"]
                     decoded_token = verify_firebase_token(token)
 
@@ -127,6 +364,11 @@ class FirebaseAuthentication(BaseAuthentication):
 
                 except AuthenticationFailed:
                     raise AuthenticationFailed({"error": "Session expired. Please log in again."})
+
+                http_request = _http_request(request)
+                http_request.firebase_claims = decoded_token
+                # Returned to the client by RefreshedTokenMiddleware.
+                http_request.refreshed_tokens = new_tokens
             else:
                 raise AuthenticationFailed({"error": "Invalid or expired Firebase token."})
 
@@ -134,17 +376,21 @@ class FirebaseAuthentication(BaseAuthentication):
         if not email:
             raise AuthenticationFailed({"error": "Email not found in Firebase token."})
 
-        try:
-            with transaction.atomic():
-                user, created = MarketUser.objects.get_or_create(
-                    email=email,
-                    defaults={
-                        "username": email.split("@")[0],
-                        "is_superuser": decoded_token.get("is_superuser", False),
-                        "is_staff": decoded_token.get("is_superuser", False),
-                    },
-                )
-        except Exception as e:
-            raise AuthenticationFailed({"error": "Failed to authenticate user."}) from e
+        user = get_cached_user(email)
+        if user is None:
+            try:
+                with transaction.atomic():
+                    user, created = MarketUser.objects.get_or_create(
+                        email=email,
+                        defaults={
+                            "username": email.split("@")[0],
+                            "is_superuser": decoded_token.get("is_superuser", False),
+                            "is_staff": decoded_token.get("is_superuser", False),
+                        },
+                    )
+            except Exception as e:
+                raise AuthenticationFailed({"error": "Failed to authenticate user."}) from e
+            cache_user(user)
 
+        _http_request(request).firebase_user = user
         return (user, None)
@@ -0,0 +1,211 @@
+"""
+Offline verification of Firebase ID tokens.
+
+Firebase signs ID tokens with keys published as X.509 certificates. This
+module keeps that key set in memory and in a file shared by all worker
+processes, honoring the `Cache-Control: max-age` of the certificate
+endpoint. Shortly before the key set expires it is refreshed in a
+background thread; when the endpoint is unreachable the last known keys
+stay in use for `FIREBASE_CERTS_STALE_TTL` seconds. Verifying a token is
+then a local signature and claims check.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+from django.conf import settings
+
+from agrario_backend.http_client import get_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 3600
+
+re_max_age = re.compile(r"max-age=(\d+)")
+
+
+class KeySetUnavailable(Exception):
+    """
+    No usable signing keys could be loaded.
+    """
+
+
+class FirebaseKeySet:
+    """
+    Signing keys of Firebase ID tokens, cached in memory and on disk.
+    """
+
+    def __init__(self, url=None, path=None):
+        self.url = url
+        self.path = path
+        self.certs = {}
+        self.expires_at = 0
+        self._public_keys = {}
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+
+    @property
+    def certs_url(self):
+        return self.url or settings.FIREBASE_CERTS_URL
+
+    @property
+    def cache_path(self):
+        return self.path or settings.FIREBASE_CERTS_CACHE_PATH
+
+    def get_public_key(self, kid):
+        """
+        Return the public key for a token's `kid`.
+
+        Raises:
+            KeySetUnavailable: If no fresh or tolerably stale keys exist.
+            jwt.InvalidTokenError: If the key set has no such `kid`.
+        """
+        self._ensure_fresh()
+        key = self._public_keys.get(kid)
+        if key is None:
+            cert = self.certs.get(kid)
+            if cert is None:
+                raise jwt.InvalidTokenError(f"Unknown signing key id {kid!r}.")
+            key = load_pem_x509_certificate(cert.encode()).public_key()
+            self._public_keys[kid] = key
+        return key
+
+    def _ensure_fresh(self):
+        now = time.time()
+        if now < self.expires_at - settings.FIREBASE_CERTS_REFRESH_MARGIN:
+            return
+
+        with self._lock:
+            # Another process may have refreshed the shared file already.
+            self._load_from_disk()
+            now = time.time()
+
+            if now < self.expires_at - settings.FIREBASE_CERTS_REFRESH_MARGIN:
+                return
+            if self.certs and now < self.expires_at + settings.FIREBASE_CERTS_STALE_TTL:
+                # Serve the keys we have and refresh them in the background.
+                self._refresh_in_background()
+                return
+
+            self._refresh()
+
+    def _refresh_in_background(self):
+        if self._refreshing.is_set():
+            return
+        self._refreshing.set()
+
+        def run():
+            try:
+                # Fetch without the lock so readers keep using the old keys.
+                certs, expires_at = self._fetch()
+                with self._lock:
+                    self._set(certs, expires_at)
+                    self._save_to_disk()
+            except KeySetUnavailable as e:
+                logger.warning(f"Keeping cached Firebase certificates: {e}")
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=run, name="firebase-certs-refresh", daemon=True).start()
+
+    def _refresh(self):
+        """
+        Fetch the key set synchronously; callers hold the lock.
+        """
+        certs, expires_at = self._fetch()
+        self._set(certs, expires_at)
+        self._save_to_disk()
+
+    def _fetch(self):
+        """
+        Return the published certificates and when they expire.
+        """
+        try:
+            response = get_session().get(self.certs_url, timeout=settings.FIREBASE_CERTS_TIMEOUT)
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise KeySetUnavailable(str(e)) from e
+
+        match = re_max_age.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        return certs, time.time() + max_age
+
+    def _set(self, certs, expires_at):
+        if certs != self.certs:
+            self._public_keys = {}
+        self.certs = certs
+        self.expires_at = expires_at
+
+    def _load_from_disk(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data["expires_at"] > self.expires_at:
+                self._set(data["certs"], data["expires_at"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save_to_disk(self):
+        directory = os.path.dirname(self.cache_path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".firebase-certs-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"certs": self.certs, "expires_at": self.expires_at}, f)
+            # Atomic, so other processes never read a partial file.
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write Firebase certificate cache: {e}")
+
+
+key_set = FirebaseKeySet()
+
+
+def verify_id_token_offline(token):
+    """
+    Verify a Firebase ID token against the cached key set.
+
+    Performs the checks of `firebase_admin.auth.verify_id_token` except the
+    revocation check.
+
+    Args:
+        token (str): The Firebase ID token.
+
+    Returns:
+        dict: The decoded token, with `uid` set like the Admin SDK does.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid or expired.
+        KeySetUnavailable: If the signing keys could not be loaded.
+    """
+    project_id = settings.FIREBASE_CONFIG["project_id"]
+
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") != "RS256":
+        raise jwt.InvalidAlgorithmError("Firebase ID tokens must be signed with RS256.")
+
+    claims = jwt.decode(
+        token,
+        key_set.get_public_key(header.get("kid")),
+        algorithms=["RS256"],
+        audience=project_id,
+        issuer=f"https://securetoken.google.com/{project_id}",
+        leeway=settings.FIREBASE_TOKEN_CLOCK_SKEW,
+        options={"require": ["exp", "iat", "sub", "auth_time"]},
+    )
+
+    if not claims["sub"] or len(claims["sub"]) > 128:
+        raise jwt.InvalidTokenError("Invalid subject claim.")
+    if claims["auth_time"] > time.time() + settings.FIREBASE_TOKEN_CLOCK_SKEW:
+        raise jwt.ImmatureSignatureError("auth_time is in the future.")
+
+    claims["uid"] = claims["sub"]
+    return claims
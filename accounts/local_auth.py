@@ -0,0 +1,375 @@
+"""
+Local stand-in for Firebase Authentication.
+
+Selected with `FIREBASE_AUTH_BACKEND = "local"` for load tests and CI.
+`LocalAuth` offers the part of `firebase_admin.auth` this project uses, so
+`accounts.firebase_auth` can use either interchangeably. Users live in a
+small SQLite file and ID tokens are real RS256 JWTs with Firebase's claims,
+signed by a key kept in a file. Both files are shared by every process on
+the machine, so the API workers and the fake REST server started with
+`manage.py run_local_firebase` agree on users and keys.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+ID_TOKEN_LIFETIME = 3600
+REFRESH_TOKEN_LIFETIME = 30 * 24 * 3600
+
+
+class LocalAuthError(Exception):
+    """
+    Base class of the local backend's errors.
+    """
+
+
+class UserNotFoundError(LocalAuthError):
+    pass
+
+
+class EmailAlreadyExistsError(LocalAuthError):
+    pass
+
+
+class InvalidPasswordError(LocalAuthError):
+    pass
+
+
+class InvalidIdTokenError(LocalAuthError):
+    pass
+
+
+class RevokedIdTokenError(InvalidIdTokenError):
+    pass
+
+
+class UserDisabledError(InvalidIdTokenError):
+    pass
+
+
+class UserRecord:
+    """
+    The fields of `firebase_admin.auth.UserRecord` this project reads.
+    """
+
+    def __init__(self, uid, email, disabled, custom_claims, tokens_valid_after_timestamp):
+        self.uid = uid
+        self.email = email
+        self.disabled = disabled
+        self.custom_claims = custom_claims
+        self.tokens_valid_after_timestamp = tokens_valid_after_timestamp
+
+
+class LocalUserStore:
+    """
+    Users in a SQLite file, one connection per thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " uid TEXT PRIMARY KEY,"
+                " email TEXT UNIQUE NOT NULL,"
+                " password_hash TEXT NOT NULL,"
+                " disabled INTEGER NOT NULL DEFAULT 0,"
+                " custom_claims TEXT NOT NULL DEFAULT '{}',"
+                " valid_after INTEGER)"
+            )
+
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def fetch(self, column, value):
+        row = self.connection().execute(
+            f"SELECT * FROM users WHERE {column} = ?", (value,)).fetchone()
+        if row is None:
+            raise UserNotFoundError(f"No user record found for {column}={value!r}.")
+        return row
+
+    def insert(self, uid, email, password_hash):
+        try:
+            with self.connection() as connection:
+                connection.execute(
+                    "INSERT INTO users (uid, email, password_hash) VALUES (?, ?, ?)",
+                    (uid, email, password_hash),
+                )
+        except sqlite3.IntegrityError as e:
+            raise EmailAlreadyExistsError(f"The email {email} is already in use.") from e
+
+    def update(self, uid, **values):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self.connection() as connection:
+            cursor = connection.execute(
+                f"UPDATE users SET {assignments} WHERE uid = ?", (*values.values(), uid))
+        if not cursor.rowcount:
+            raise UserNotFoundError(f"No user record found for uid={uid!r}.")
+
+
+class LocalTokenIssuer:
+    """
+    Signs Firebase-style ID tokens with a key shared through a PEM file.
+    """
+
+    def __init__(self, key_path, project_id):
+        self.project_id = project_id
+        self.private_key = self._load_or_create_key(key_path)
+        self.public_key = self.private_key.public_key()
+        self.certificate = self._self_signed_certificate()
+        self.kid = hashlib.sha256(self.certificate.encode()).hexdigest()[:40]
+
+    @staticmethod
+    def _load_or_create_key(path):
+        try:
+            with open(path, "rb") as f:
+                return serialization.load_pem_private_key(f.read(), password=None)
+        except FileNotFoundError:
+            pass
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        try:
+            # O_EXCL: when processes race, the first key written wins.
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(path, "rb") as f:
+                return serialization.load_pem_private_key(f.read(), password=None)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        return key
+
+    def _self_signed_certificate(self):
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.local")])
+        # Fixed validity, so every process derives the same certificate and kid.
+        not_before = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self.public_key)
+            .serial_number(1)
+            .not_valid_before(not_before)
+            .not_valid_after(not_before + datetime.timedelta(days=36500))
+            .sign(self.private_key, hashes.SHA256())
+        )
+        return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+    @property
+    def issuer(self):
+        return f"https://securetoken.google.com/{self.project_id}"
+
+    def certs(self):
+        """
+        The key set in the format of Google's x509 certificate endpoint.
+        """
+        return {self.kid: self.certificate}
+
+    def issue_id_token(self, user, auth_time=None):
+        now = int(time.time())
+        payload = {
+            **user.custom_claims,
+            "iss": self.issuer,
+            "aud": self.project_id,
+            "auth_time": auth_time or now,
+            "user_id": user.uid,
+            "sub": user.uid,
+            "iat": now,
+            "exp": now + ID_TOKEN_LIFETIME,
+            "email": user.email,
+            "email_verified": True,
+            "firebase": {
+                "identities": {"email": [user.email]},
+                "sign_in_provider": "password",
+            },
+        }
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    def issue_refresh_token(self, user, auth_time):
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer,
+            "sub": user.uid,
+            "auth_time": auth_time,
+            "iat": now,
+            "exp": now + REFRESH_TOKEN_LIFETIME,
+            "typ": "refresh",
+        }
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    def decode(self, token, audience=None):
+        try:
+            claims = jwt.decode(
+                token,
+                self.public_key,
+                algorithms=["RS256"],
+                audience=audience,
+                issuer=self.issuer,
+                options={"verify_aud": audience is not None},
+            )
+        except jwt.InvalidTokenError as e:
+            raise InvalidIdTokenError(str(e)) from e
+        claims["uid"] = claims["sub"]
+        return claims
+
+
+class LocalAuth:
+    """
+    Drop-in for the `firebase_admin.auth` functions used by this project,
+    plus the password sign-in and token refresh of the REST API.
+    """
+
+    UserNotFoundError = UserNotFoundError
+    EmailAlreadyExistsError = EmailAlreadyExistsError
+    InvalidPasswordError = InvalidPasswordError
+    InvalidIdTokenError = InvalidIdTokenError
+    RevokedIdTokenError = RevokedIdTokenError
+    UserDisabledError = UserDisabledError
+
+    def __init__(self, store_path, key_path, project_id):
+        self.store = LocalUserStore(store_path)
+        self.issuer = LocalTokenIssuer(key_path, project_id)
+
+    @staticmethod
+    def _record(row):
+        return UserRecord(
+            uid=row["uid"],
+            email=row["email"],
+            disabled=bool(row["disabled"]),
+            custom_claims=json.loads(row["custom_claims"]),
+            tokens_valid_after_timestamp=row["valid_after"],
+        )
+
+    def create_user(self, email, password, uid=None, **kwargs):
+        if not password or len(password) < 6:
+            raise InvalidPasswordError("The password must be at least 6 characters long.")
+        uid = uid or uuid.uuid4().hex
+        self.store.insert(uid, email, make_password(password))
+        return self.get_user(uid)
+
+    def get_user(self, uid):
+        return self._record(self.store.fetch("uid", uid))
+
+    def get_user_by_email(self, email):
+        return self._record(self.store.fetch("email", email))
+
+    def set_custom_user_claims(self, uid, custom_claims):
+        self.store.update(uid, custom_claims=json.dumps(custom_claims or {}))
+
+    def update_user(self, uid, disabled=None, **kwargs):
+        if disabled is not None:
+            self.store.update(uid, disabled=int(disabled))
+        return self.get_user(uid)
+
+    def generate_password_reset_link(self, email, action_code_settings=None):
+        user = self.get_user_by_email(email)
+        return (
+            f"{settings.FIREBASE_IDENTITY_TOOLKIT_URL}/emulator/action"
+            f"?mode=resetPassword&uid={user.uid}"
+        )
+
+    def revoke_refresh_tokens(self, uid):
+        # Firebase stores the cutoff in seconds and reports milliseconds.
+        self.store.update(uid, valid_after=int(time.time()) * 1000)
+
+    def verify_id_token(self, id_token, check_revoked=False):
+        claims = self.issuer.decode(id_token, audience=self.issuer.project_id)
+        if check_revoked:
+            self._check_revoked(claims)
+        return claims
+
+    def _check_revoked(self, claims):
+        user = self.get_user(claims["uid"])
+        if user.disabled:
+            raise UserDisabledError("The user record is disabled.")
+        valid_after = user.tokens_valid_after_timestamp
+        if valid_after and claims["auth_time"] * 1000 < valid_after:
+            raise RevokedIdTokenError("The Firebase ID token has been revoked.")
+
+    def sign_in_with_password(self, email, password):
+        """
+        Response of `accounts:signInWithPassword`.
+        """
+        try:
+            row = self.store.fetch("email", email)
+        except UserNotFoundError:
+            raise InvalidPasswordError("EMAIL_NOT_FOUND")
+        if not check_password(password, row["password_hash"]):
+            raise InvalidPasswordError("INVALID_PASSWORD")
+
+        user = self._record(row)
+        if user.disabled:
+            raise UserDisabledError("USER_DISABLED")
+        auth_time = int(time.time())
+        return {
+            "kind": "identitytoolkit#VerifyPasswordResponse",
+            "localId": user.uid,
+            "email": user.email,
+            "idToken": self.issuer.issue_id_token(user, auth_time),
+            "refreshToken": self.issuer.issue_refresh_token(user, auth_time),
+            "expiresIn": str(ID_TOKEN_LIFETIME),
+            "registered": True,
+        }
+
+    def refresh(self, refresh_token):
+        """
+        Response of the securetoken `token` endpoint.
+        """
+        claims = self.issuer.decode(refresh_token)
+        if claims.get("typ") != "refresh":
+            raise InvalidIdTokenError("INVALID_REFRESH_TOKEN")
+        self._check_revoked(claims)
+
+        user = self.get_user(claims["uid"])
+        return {
+            "id_token": self.issuer.issue_id_token(user, claims["auth_time"]),
+            "refresh_token": self.issuer.issue_refresh_token(user, claims["auth_time"]),
+            "expires_in": str(ID_TOKEN_LIFETIME),
+            "token_type": "Bearer",
+            "user_id": user.uid,
+            "project_id": self.issuer.project_id,
+        }
+
+
+_local_auth = None
+_lock = threading.Lock()
+
+
+def get_local_auth():
+    """
+    Return the process-wide `LocalAuth` configured from settings.
+    """
+    global _local_auth
+    if _local_auth is None:
+        with _lock:
+            if _local_auth is None:
+                _local_auth = LocalAuth(
+                    store_path=settings.FIREBASE_LOCAL_STORE_PATH,
+                    key_path=settings.FIREBASE_LOCAL_KEY_PATH,
+                    project_id=settings.FIREBASE_CONFIG["project_id"],
+                )
+    return _local_auth
@@ -0,0 +1,33 @@
+import secrets
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.local_auth import get_local_auth
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints a signed ID token from the local auth backend, creating the "
+        "user if needed. For driving load tests without a login round trip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--role", help="Set the role custom claim.")
+
+    def handle(self, *args, **options):
+        if settings.FIREBASE_AUTH_BACKEND != "local":
+            raise CommandError("Set FIREBASE_AUTH_BACKEND=local to issue local tokens.")
+
+        auth = get_local_auth()
+        try:
+            user = auth.get_user_by_email(options["email"])
+        except auth.UserNotFoundError:
+            user = auth.create_user(email=options["email"], password=secrets.token_urlsafe(16))
+
+        if options["role"]:
+            auth.set_custom_user_claims(user.uid, {**user.custom_claims, "role": options["role"]})
+            user = auth.get_user(user.uid)
+
+        self.stdout.write(auth.issuer.issue_id_token(user))
@@ -0,0 +1,119 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.local_auth import LocalAuthError, get_local_auth
+
+CERTS_PATH = "/www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+SIGN_IN_PATH = "/identitytoolkit.googleapis.com/v1/accounts:signInWithPassword"
+SIGN_UP_PATH = "/identitytoolkit.googleapis.com/v1/accounts:signUp"
+TOKEN_PATH = "/securetoken.googleapis.com/v1/token"
+
+
+class LocalFirebaseHandler(BaseHTTPRequestHandler):
+    """
+    The Firebase REST endpoints the backend calls, answered by `LocalAuth`.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoints.
+    quiet = True
+
+    def do_GET(self):
+        if urlsplit(self.path).path == CERTS_PATH:
+            self.send_json(200, get_local_auth().issuer.certs(), {"Cache-Control": "public, max-age=3600"})
+        else:
+            self.send_error_json(404, "NOT_FOUND")
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self.read_body()
+        auth = get_local_auth()
+
+        try:
+            if path == SIGN_IN_PATH:
+                self.send_json(200, auth.sign_in_with_password(body.get("email"), body.get("password")))
+            elif path == SIGN_UP_PATH:
+                auth.create_user(email=body.get("email"), password=body.get("password"))
+                self.send_json(200, auth.sign_in_with_password(body.get("email"), body.get("password")))
+            elif path == TOKEN_PATH:
+                if body.get("grant_type") != "refresh_token":
+                    self.send_error_json(400, "INVALID_GRANT_TYPE")
+                    return
+                self.send_json(200, auth.refresh(body.get("refresh_token", "")))
+            else:
+                self.send_error_json(404, "NOT_FOUND")
+        except LocalAuthError as e:
+            self.send_error_json(400, str(e))
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or "{}")
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def send_json(self, status, data, headers=None):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": {"code": status, "message": message}})
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the Firebase identitytoolkit, securetoken and certificate "
+        "endpoints from the local auth backend (FIREBASE_AUTH_BACKEND=local)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--addr", default=settings.FIREBASE_LOCAL_HOST,
+            help="host:port to listen on (default: FIREBASE_LOCAL_HOST).",
+        )
+        parser.add_argument(
+            "--user", action="append", default=[], metavar="EMAIL:PASSWORD[:ROLE]",
+            help="Create a user before serving. Repeatable.",
+        )
+        parser.add_argument("--verbose-requests", action="store_true")
+
+    def handle(self, *args, **options):
+        if settings.FIREBASE_AUTH_BACKEND != "local":
+            raise CommandError("Set FIREBASE_AUTH_BACKEND=local to run the local Firebase server.")
+
+        auth = get_local_auth()
+        for spec in options["user"]:
+            email, password, *role = spec.split(":")
+            try:
+                user = auth.create_user(email=email, password=password)
+            except auth.EmailAlreadyExistsError:
+                user = auth.get_user_by_email(email)
+            if role:
+                auth.set_custom_user_claims(user.uid, {**user.custom_claims, "role": role[0]})
+            self.stdout.write(f"User {email} ({user.uid})")
+
+        host, _, port = options["addr"].rpartition(":")
+        LocalFirebaseHandler.quiet = not options["verbose_requests"]
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), LocalFirebaseHandler)
+        server.daemon_threads = True
+
+        self.stdout.write(self.style.SUCCESS(f"Local Firebase listening on http://{options['addr']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from accounts.firebase_auth import auth, set_role_claim
+from accounts.models import MarketUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Sets the `role` custom claim on the Firebase user of every MarketUser "
+        "with a role. Users pick the claim up with their next ID token."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report which users would be updated.",
+        )
+
+    def handle(self, *args, **options):
+        updated = unchanged = failed = 0
+
+        users = MarketUser.objects.exclude(role="").only("email", "role").order_by("email")
+        for user in users.iterator():
+            try:
+                firebase_user = auth.get_user_by_email(user.email)
+                claims = firebase_user.custom_claims or {}
+                if claims.get("role") == user.role:
+                    unchanged += 1
+                    continue
+                if not options["dry_run"]:
+                    set_role_claim(firebase_user.uid, user.role)
+                updated += 1
+                self.stdout.write(f"{user.email}: role={user.role}")
+            except auth.UserNotFoundError:
+                failed += 1
+                self.stderr.write(self.style.WARNING(f"{user.email}: no Firebase user."))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{user.email}: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} updated, {unchanged} unchanged, {failed} failed"
+            + (" (dry run)" if options["dry_run"] else "")
+        ))
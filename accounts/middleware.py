@@ -0,0 +1,32 @@
+"""
+Middleware for the Accounts application.
+"""
+
+REFRESHED_TOKEN_HEADERS = {
+    "firebase_token": "X-Firebase-Token",
+    "refresh_token": "X-Refresh-Token",
+    "expires_in": "X-Token-Expires-In",
+}
+
+
+class RefreshedTokenMiddleware:
+    """
+    Return tokens refreshed during authentication in response headers.
+
+    When `FirebaseAuthentication` had to refresh an expired ID token, the
+    client gets the new tokens in `X-Firebase-Token`, `X-Refresh-Token` and
+    `X-Token-Expires-In`, so its next requests stop sending the stale token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        tokens = getattr(request, "refreshed_tokens", None)
+        if tokens:
+            for key, header in REFRESHED_TOKEN_HEADERS.items():
+                response[header] = str(tokens[key])
+            response["Cache-Control"] = "no-store"
+        return response
@@ -0,0 +1,32 @@
+"""
+Permission classes shared by the Agrario apps.
+"""
+
+from rest_framework.permissions import BasePermission
+
+from .firebase_auth import get_bearer_token, get_firebase_claims
+
+
+class FirebaseIsAuthenticated(BasePermission):
+    """
+    Custom permission class for Firebase authentication.
+
+    Reuses the claims `FirebaseAuthentication` already verified for the
+    request instead of verifying the token again.
+    """
+
+    def has_permission(self, request, view):
+        if not get_bearer_token(request):
+            request.error_message = {
+                "error": "Authentication header or Bearer token is missing."}
+            return False
+
+        decoded_token = get_firebase_claims(request)
+        if not decoded_token:
+            request.error_message = {
+                "error": "Invalid or expired Firebase token."}
+            return False
+
+        request.user_email = decoded_token.get("email")
+        request.user_role = decoded_token.get("role", "user")
+        return True
@@ -297,9 +297,9 @@ class LandownerDashboardSerializer(serializers.ModelSerializer):
         """
         Retrieve notifications (unread messages).
         """
-        from messaging.models import Message  # Replace with actual model path
+        from messaging.services import unread_total
 
-        unread_messages = Message.objects.filter(sender=obj, is_read=False).count()
+        unread_messages = unread_total(obj)
         return {
             "unread_messages": unread_messages
         }
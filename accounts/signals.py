@@ -0,0 +1,33 @@
+"""
+Signal handlers for the Accounts application.
+
+Drop cached users (see `accounts.cache`) after the transaction that saved or
+deleted them commits. Profile subclasses send their own signals, so they are
+connected explicitly.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import cache
+from .models import Landowner, MarketUser, ProjectDeveloper
+
+USER_MODELS = (MarketUser, Landowner, ProjectDeveloper)
+
+
+def remember_email(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred column is never loaded here.
+    instance._loaded_email = instance.__dict__.get("email")
+
+
+def invalidate_user(sender, instance, **kwargs):
+    emails = {getattr(instance, "_loaded_email", None), instance.__dict__.get("email")}
+    for email in emails - {None}:
+        transaction.on_commit(lambda email=email: cache.invalidate_user(email))
+    instance._loaded_email = instance.__dict__.get("email")
+
+
+for model in USER_MODELS:
+    post_init.connect(remember_email, sender=model)
+    post_save.connect(invalidate_user, sender=model)
+    post_delete.connect(invalidate_user, sender=model)
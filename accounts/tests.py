@@ -1,7 +1,35 @@
-from django.test import TestCase
-from rest_framework.test import APIClient
+import datetime
+import os
+import tempfile
+import time
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from unittest.mock import patch
 
+from .firebase_auth import (
+    FirebaseAuthentication,
+    auth,
+    clear_token_cache,
+    get_firebase_user,
+    refresh_firebase_token_cached,
+    verify_firebase_token,
+)
+from agrario_backend.http_client import run_concurrently
+from .jwks import key_set, verify_id_token_offline
+from .local_auth import LocalAuth
+from .middleware import RefreshedTokenMiddleware
+from .permissions import FirebaseIsAuthenticated
+
 class FirebaseAuthTests(TestCase):
     @patch("accounts.firebase_auth.auth.verify_id_token")
     def test_valid_token(self, mock_verify):
@@ -21,3 +49,218 @@ class FirebaseAuthTests(TestCase):
         client = APIClient()
         response = client.post("/api/accounts/login/", {"firebase_token": "invalid-token"})
         self.assertEqual(response.status_code, 401)
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class FirebaseTokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        clear_token_cache()
+        self.claims = {"uid": "test-uid", "email": "testuser@example.com", "exp": time.time() + 3600}
+
+    def test_verified_token_is_cached(self, mock_verify):
+        mock_verify.return_value = self.claims
+
+        self.assertEqual(verify_firebase_token("token"), self.claims)
+        self.assertEqual(verify_firebase_token("token"), self.claims)
+        self.assertEqual(mock_verify.call_count, 1)
+
+    @override_settings(FIREBASE_REVOCATION_CHECK_INTERVAL=0)
+    def test_revocation_is_rechecked_after_interval(self, mock_verify):
+        mock_verify.return_value = self.claims
+        verify_firebase_token("token")
+
+        mock_verify.side_effect = auth.RevokedIdTokenError("revoked")
+        self.assertIsNone(verify_firebase_token("token"))
+        self.assertEqual(mock_verify.call_count, 2)
+
+    def test_expired_token_is_not_served_from_cache(self, mock_verify):
+        mock_verify.return_value = dict(self.claims, exp=time.time() - 1)
+
+        verify_firebase_token("token")
+        verify_firebase_token("token")
+        self.assertEqual(mock_verify.call_count, 2)
+
+
+class FirebaseRequestPipelineTests(TestCase):
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+
+    def authenticated_request(self):
+        return Request(
+            APIRequestFactory().get("/", HTTP_AUTHORIZATION="Bearer token"),
+            authenticators=[FirebaseAuthentication()],
+        )
+
+    @patch("accounts.firebase_auth.auth.verify_id_token")
+    def test_token_is_verified_once_per_request(self, mock_verify):
+        mock_verify.return_value = {"uid": "test-uid", "email": "testuser@example.com"}
+        request = self.authenticated_request()
+
+        user = request.user
+        self.assertTrue(FirebaseIsAuthenticated().has_permission(request, None))
+        self.assertEqual(get_firebase_user(request), user)
+        self.assertEqual(request.user_email, "testuser@example.com")
+        self.assertEqual(mock_verify.call_count, 1)
+
+    @patch("accounts.firebase_auth.auth.verify_id_token")
+    def test_known_user_is_resolved_from_cache(self, mock_verify):
+        mock_verify.return_value = {"uid": "test-uid", "email": "testuser@example.com"}
+        first = self.authenticated_request().user
+
+        with self.assertNumQueries(0):
+            second = self.authenticated_request().user
+        self.assertEqual(second, first)
+
+        first.first_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.authenticated_request().user.first_name, "Renamed")
+
+
+@patch("accounts.firebase_auth.refresh_firebase_token")
+class TokenRefreshCacheTests(SimpleTestCase):
+    def setUp(self):
+        clear_token_cache()
+        self.tokens = {"firebase_token": "new-id", "refresh_token": "new-refresh", "expires_in": "3600"}
+
+    def test_burst_of_refreshes_calls_firebase_once(self, mock_refresh):
+        def slow_refresh(refresh_token):
+            time.sleep(0.05)
+            return self.tokens
+        mock_refresh.side_effect = slow_refresh
+
+        futures = run_concurrently(*[lambda: refresh_firebase_token_cached("refresh")] * 4)
+        self.assertEqual([future.result() for future in futures], [self.tokens] * 4)
+        self.assertEqual(mock_refresh.call_count, 1)
+
+    def test_burst_shares_a_failed_refresh(self, mock_refresh):
+        def slow_failure(refresh_token):
+            time.sleep(0.05)
+            raise AuthenticationFailed("expired")
+        mock_refresh.side_effect = slow_failure
+
+        futures = run_concurrently(*[lambda: refresh_firebase_token_cached("refresh")] * 4)
+        for future in futures:
+            self.assertIsInstance(future.exception(), AuthenticationFailed)
+        self.assertEqual(mock_refresh.call_count, 1)
+
+    def test_failed_refresh_is_not_cached(self, mock_refresh):
+        mock_refresh.side_effect = AuthenticationFailed("expired")
+        with self.assertRaises(AuthenticationFailed):
+            refresh_firebase_token_cached("refresh")
+
+        mock_refresh.side_effect = None
+        mock_refresh.return_value = self.tokens
+        self.assertEqual(refresh_firebase_token_cached("refresh"), self.tokens)
+
+    def test_refreshed_tokens_are_returned_in_headers(self, mock_refresh):
+        request = APIRequestFactory().get("/")
+        request.refreshed_tokens = self.tokens
+        response = RefreshedTokenMiddleware(lambda request: HttpResponse())(request)
+
+        self.assertEqual(response["X-Firebase-Token"], "new-id")
+        self.assertEqual(response["X-Refresh-Token"], "new-refresh")
+        self.assertEqual(response["X-Token-Expires-In"], "3600")
+
+
+def make_signing_cert():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(1)
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    return private_key, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@override_settings(FIREBASE_CONFIG={"project_id": "agrario-test"}, FIREBASE_TOKEN_CLOCK_SKEW=0)
+class OfflineTokenVerificationTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key, cert = make_signing_cert()
+        key_set._set({"key-1": cert}, time.time() + 3600)
+
+    def make_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": "https://securetoken.google.com/agrario-test",
+            "aud": "agrario-test",
+            "sub": "test-uid",
+            "auth_time": now,
+            "iat": now,
+            "exp": now + 3600,
+            "email": "testuser@example.com",
+            "role": "landowner",
+            **claims,
+        }
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": "key-1"})
+
+    def test_valid_token(self):
+        claims = verify_id_token_offline(self.make_token())
+        self.assertEqual(claims["uid"], "test-uid")
+        self.assertEqual(claims["role"], "landowner")
+
+    def test_wrong_audience_and_expired_tokens_are_rejected(self):
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_id_token_offline(self.make_token(aud="other-project"))
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_id_token_offline(self.make_token(exp=int(time.time()) - 10))
+
+
+@override_settings(OUTBOUND_HTTP_WORKERS=2)
+class RunConcurrentlyTests(SimpleTestCase):
+    def test_results_keep_call_order_and_errors(self):
+        def fail():
+            raise ValueError("boom")
+
+        first, second = run_concurrently(lambda: "user", fail)
+
+        self.assertEqual(first.result(), "user")
+        with self.assertRaises(ValueError):
+            second.result()
+
+
+class LocalAuthTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.auth = LocalAuth(
+            store_path=os.path.join(directory.name, "users.sqlite3"),
+            key_path=os.path.join(directory.name, "key.pem"),
+            project_id="agrario-local",
+        )
+        self.user = self.auth.create_user(email="testuser@example.com", password="password123")
+        self.auth.set_custom_user_claims(self.user.uid, {"role": "developer"})
+
+    def test_sign_in_issues_verifiable_tokens(self):
+        response = self.auth.sign_in_with_password("testuser@example.com", "password123")
+        claims = self.auth.verify_id_token(response["idToken"], check_revoked=True)
+
+        self.assertEqual(claims["uid"], self.user.uid)
+        self.assertEqual(claims["role"], "developer")
+        self.assertEqual(claims["iss"], "https://securetoken.google.com/agrario-local")
+
+        refreshed = self.auth.refresh(response["refreshToken"])
+        self.assertEqual(self.auth.verify_id_token(refreshed["id_token"])["uid"], self.user.uid)
+
+    def test_wrong_password_and_refresh_token_as_id_token_are_rejected(self):
+        with self.assertRaises(self.auth.InvalidPasswordError):
+            self.auth.sign_in_with_password("testuser@example.com", "wrong")
+
+        response = self.auth.sign_in_with_password("testuser@example.com", "password123")
+        with self.assertRaises(self.auth.InvalidIdTokenError):
+            self.auth.verify_id_token(response["refreshToken"])
+
+    def test_revoked_tokens_fail_revocation_check(self):
+        response = self.auth.sign_in_with_password("testuser@example.com", "password123")
+        self.auth.store.update(self.user.uid, valid_after=(int(time.time()) + 1) * 1000)
+
+        with self.assertRaises(self.auth.RevokedIdTokenError):
+            self.auth.verify_id_token(response["idToken"], check_revoked=True)
@@ -7,6 +7,10 @@ def get_user_role(decoded_token, user_email):
     """
     Retrieve the user role from the decoded Firebase token or database.
 
+    Roles are set as custom claims at registration (and backfilled with
+    `manage.py sync_role_claims`), so the database is only a fallback for
+    tokens issued before that.
+
     Args:
         decoded_token (dict): The decoded Firebase token.
         user_email (str): The email of the user.
@@ -4,7 +4,6 @@ Includes views for user registration, login, email confirmation, and role-based
 """
 
 import logging
-import requests
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
@@ -26,26 +25,33 @@ from rest_framework.views import APIView
 from offers.models import AreaOffer, Parcel
 from django.db.models import Q
 from .models import MarketUser, Landowner, ProjectDeveloper
-from .firebase_auth import FirebaseAuthentication, verify_firebase_token, create_firebase_user, refresh_firebase_token
+from .firebase_auth import (
+    FirebaseAuthentication,
+    create_firebase_user,
+    get_bearer_token,
+    get_firebase_claims,
+    get_firebase_user,
+    refresh_firebase_token,
+    set_role_claim,
+)
 from .serializers import UserSerializer, LandownerSerializer, ProjectDeveloperSerializer, LandownerDashboardSerializer
 from django.shortcuts import redirect
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
-from firebase_admin import auth as firebase_auth
+from .firebase_auth import auth as firebase_auth
 from google.cloud import storage
 from .utils import get_user_role
 from .models import MarketUser, Landowner, ProjectDeveloper
-from .firebase_auth import FirebaseAuthentication, verify_firebase_token, create_firebase_user
 from .serializers import UserSerializer, LandownerSerializer, ProjectDeveloperSerializer, LandownerDashboardSerializer
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
-from firebase_admin import auth as firebase_auth
 from google.cloud import storage
 from .utils import get_user_role
 from payments.models import PaymentTransaction
 from reports.models import Report
 from reports.serializers import ReportSerializer
 from offers.serializers import ParcelSerializer
+from agrario_backend.http_client import get_session, run_concurrently
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +93,11 @@ class MarketUserViewSet(viewsets.ModelViewSet):
 
         # Create Firebase user
         firebase_user = create_firebase_user(email=email, password=password)
+        try:
+            set_role_claim(firebase_user.uid, role)
+        except Exception as e:
+            # Tokens without the claim fall back to the database role.
+            logger.error(f"Could not set role claim for {email}: {str(e)}")
 
         # Create local user
         user = serializer.save()
@@ -294,10 +305,16 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Look up the Firebase user and verify the password in parallel;
+        # the two calls are independent.
+        user_future, password_future = run_concurrently(
+            lambda: firebase_auth.get_user_by_email(email),
+            lambda: self.verify_firebase_password(email, password),
+        )
+
         # Authenticate user using Firebase
         try:
-            user_record = firebase_auth.get_user_by_email(email)
-            print(user_record)
+            user_record = user_future.result()
         except firebase_auth.UserNotFoundError:
             return Response(
                 {"error": "Invalid email or password."},
@@ -311,11 +328,10 @@ class LoginView(APIView):
 
         # Verify the password using Firebase's REST API
         try:
-            res = self.verify_firebase_password(email, password)
+            res = password_future.result()
             firebase_token= res['access_token']
             refresh_token= res['refresh_token']
         except AuthenticationFailed as e:
-            print(e)
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_401_UNAUTHORIZED,
@@ -370,14 +386,14 @@ class LoginView(APIView):
             AuthenticationFailed: If the email or password is incorrect.
         """
         firebase_api_key = settings.FIREBASE_API_KEY
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={firebase_api_key}"
+        url = f"{settings.FIREBASE_IDENTITY_TOOLKIT_URL}/v1/accounts:signInWithPassword?key={firebase_api_key}"
         payload = {
             "email": email,
             "password": password,
             "returnSecureToken": True,
         }
 
-        response = requests.post(url, json=payload)
+        response = get_session().post(url, json=payload)
         if response.status_code != 200:
             raise AuthenticationFailed("Invalid email or password.")
 
@@ -456,9 +472,8 @@ class RoleDashboardView(APIView):
             status="pending_analysis").count()
 
         # Fetch unread messages count
-        from messaging.models import Message  # Replace with the correct model path
-        unread_messages = Message.objects.filter(
-            sender=user, is_read=False).count()
+        from messaging.services import unread_total
+        unread_messages = unread_total(user)
 
         return {
             "parcels_owned": parcels_owned,
@@ -536,20 +551,17 @@ class RoleDashboardView(APIView):
         """
         Retrieve dashboard data based on the user's role.
         """
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
+        if not get_bearer_token(request):
             return Response({"error": "Authentication token not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        token = auth_header.split("Bearer ")[1]
-        decoded_token = verify_firebase_token(token)
+        decoded_token = get_firebase_claims(request)
 
         if not decoded_token:
             return Response({"error": "Invalid or expired Firebase token."}, status=status.HTTP_401_UNAUTHORIZED)
 
         email = decoded_token.get("email")
-        try:
-            user = MarketUser.objects.get(email=email)
-        except MarketUser.DoesNotExist:
+        user = get_firebase_user(request)
+        if user is None:
             return Response({"error": "User does not exist."}, status=status.HTTP_404_NOT_FOUND)
 
         if not user.is_active:
@@ -615,23 +627,20 @@ class MarketUserProfileView(viewsets.ViewSet):
         Returns:
             MarketUser instance or Response with error message.
         """
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
+        if not get_bearer_token(request):
             return Response({"error": "Authentication token not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        token = auth_header.split("Bearer ")[1]
-        decoded_token = verify_firebase_token(token)
+        decoded_token = get_firebase_claims(request)
         if not decoded_token:
             return Response({"error": "Invalid or expired Firebase token."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        email = decoded_token.get("email")
-        if not email:
+        if not decoded_token.get("email"):
             return Response({"error": "Email not found in token."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        try:
-            return MarketUser.objects.get(email=email)
-        except MarketUser.DoesNotExist:
+        user = get_firebase_user(request)
+        if user is None:
             return Response({"error": "User does not exist."}, status=status.HTTP_404_NOT_FOUND)
+        return user
 
     @swagger_auto_schema(
         operation_summary="Retrieve User Profile",
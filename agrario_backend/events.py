@@ -0,0 +1,184 @@
+"""
+Push events to connected users.
+
+Code that changes something a user is looking at calls `publish_on_commit`
+with the user's id, an event name and a JSON-serializable payload. Clients
+receive the events over Server-Sent Events from `agrario_backend.sse`.
+
+The broker is chosen with `EVENTS_BROKER`:
+
+- "local": subscribers and publishers share one process. Enough for a
+  single ASGI worker and for tests.
+- "postgres": events are sent with `pg_notify` and every process LISTENs on
+  `EVENTS_CHANNEL`, so an event reaches the user's stream whichever worker
+  holds it.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay below 8000 bytes.
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+class Subscription:
+    """
+    Events of one user for one connected client.
+    """
+
+    def __init__(self, user_id, loop):
+        self.user_id = str(user_id)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        """
+        Hand an event to the subscriber's event loop; safe from any thread.
+        """
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind refetches after reconnecting.
+            logger.warning(f"Dropping event for slow subscriber {self.user_id}.")
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    """
+    In-process broker.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """
+        Subscribe the current event loop to the events of `user_id`.
+        """
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event, data):
+        self.dispatch({"user": str(user_id), "event": event, "data": data})
+
+    def dispatch(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(message["user"], ()))
+        for subscription in subscriptions:
+            subscription.put({"event": message["event"], "data": message["data"]})
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Broker on Postgres LISTEN/NOTIFY.
+
+    Publishing runs `pg_notify` on the default connection. The first
+    subscription starts a thread that LISTENs on its own connection and
+    dispatches the notifications to this process's subscribers.
+    """
+
+    def __init__(self, channel):
+        super().__init__()
+        self.channel = channel
+        self._listener = None
+
+    def subscribe(self, user_id):
+        self._start_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event, data):
+        payload = json.dumps(
+            {"user": str(user_id), "event": event, "data": data}, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+            # Clients refetch what a truncated event refers to.
+            payload = json.dumps(
+                {"user": str(user_id), "event": event, "data": {"truncated": True}})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            listener = connections.create_connection("default")
+            try:
+                listener.ensure_connection()
+                raw = listener.connection
+                raw.autocommit = True
+                raw.execute(f'LISTEN "{self.channel}"')
+                for notify in raw.notifies():
+                    try:
+                        self.dispatch(json.loads(notify.payload))
+                    except (ValueError, KeyError):
+                        logger.warning(f"Ignoring malformed event: {notify.payload!r}")
+            except Exception as e:
+                logger.warning(f"Event listener disconnected, reconnecting: {e}")
+                time.sleep(settings.EVENTS_RECONNECT_DELAY)
+            finally:
+                listener.close()
+
+
+_broker = None
+_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the process-wide broker configured with `EVENTS_BROKER`.
+    """
+    global _broker
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                if settings.EVENTS_BROKER == "postgres":
+                    _broker = PostgresBroker(settings.EVENTS_CHANNEL)
+                else:
+                    _broker = LocalBroker()
+    return _broker
+
+
+def publish(user_id, event, data):
+    """
+    Send an event to the connected clients of `user_id` right away.
+    """
+    try:
+        get_broker().publish(user_id, event, data)
+    except Exception as e:
+        # Push is best effort; clients catch up when they refetch.
+        logger.warning(f"Could not publish {event} event: {e}")
+
+
+def publish_on_commit(user_id, event, data):
+    """
+    Send an event once the current transaction commits.
+    """
+    transaction.on_commit(lambda: publish(user_id, event, data))
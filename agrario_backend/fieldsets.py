@@ -0,0 +1,108 @@
+"""
+Sparse fieldsets for read endpoints.
+
+Clients pick the fields of a response with `?fields=` or drop fields with
+`?omit=`, both comma separated. Fields of nested serializers are addressed
+with dotted paths, e.g. `?omit=parcels.polygon` on an offer listing.
+
+Views put a `Fieldset` into the serializer context under `"fieldset"`;
+serializers using `SparseFieldsetMixin` prune their fields from it. Views
+also use `Fieldset.includes()` to leave unused columns out of the query.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {path.strip() for path in (value or "").split(",") if path.strip()}
+
+
+class Fieldset:
+    """
+    Fields requested with `?fields=` / `?omit=`.
+    """
+
+    def __init__(self, fields=None, omit=None):
+        self.fields = frozenset(fields or ())
+        self.omit = frozenset(omit or ())
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Read the fieldset of a request; writes always get all fields.
+        """
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        return cls(
+            fields=_split(request.query_params.get("fields")),
+            omit=_split(request.query_params.get("omit")),
+        )
+
+    def __bool__(self):
+        return bool(self.fields or self.omit)
+
+    def includes(self, path):
+        """
+        Whether the field at the dotted `path` is part of the response.
+        """
+        parts = path.split(".")
+        for depth in range(1, len(parts) + 1):
+            prefix = ".".join(parts[:depth])
+            if prefix in self.omit:
+                return False
+            if self._restricts(".".join(parts[:depth - 1])) and not self._selects(prefix):
+                return False
+        return True
+
+    def _restricts(self, parent):
+        """
+        `?fields=` only restricts a level when it names a field on it.
+        """
+        depth = parent.count(".") + 1 if parent else 0
+        prefix = f"{parent}." if parent else ""
+        return any(
+            path.startswith(prefix) and path.count(".") == depth
+            for path in self.fields
+        )
+
+    def _selects(self, path):
+        return any(
+            selected == path or selected.startswith(f"{path}.")
+            for selected in self.fields
+        )
+
+    def cache_key(self):
+        """
+        Stable representation for cache keys.
+        """
+        return f"fields={','.join(sorted(self.fields))};omit={','.join(sorted(self.omit))}"
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that drops the fields excluded by the context fieldset.
+
+    Works for nested serializers too: the dotted path of a field is built
+    from the names the serializer is bound under.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get("fieldset")
+        if not fieldset:
+            return fields
+
+        prefix = self._fieldset_prefix()
+        for name in list(fields):
+            if not fieldset.includes(prefix + name):
+                fields.pop(name)
+        return fields
+
+    def _fieldset_prefix(self):
+        names = []
+        node = self
+        while node is not None:
+            if getattr(node, "field_name", None):
+                names.append(node.field_name)
+            node = node.parent
+        return "".join(f"{name}." for name in reversed(names))
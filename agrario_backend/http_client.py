@@ -0,0 +1,96 @@
+"""
+Shared outbound HTTP client.
+
+One `requests.Session` per process keeps connections to Google's APIs alive
+between requests, so logins and token refreshes skip the TCP and TLS
+handshakes. Every call gets `OUTBOUND_HTTP_TIMEOUT` unless it passes its own
+timeout, and connection errors and 502/503/504 responses are retried with
+backoff. `run_concurrently` runs independent outbound calls in parallel on
+a shared thread pool.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+
+
+class TimeoutSession(requests.Session):
+    """
+    Session that applies a default timeout to every request.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _build_session():
+    retries = Retry(
+        total=settings.OUTBOUND_HTTP_RETRIES,
+        backoff_factor=settings.OUTBOUND_HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        # Firebase sign-in and token refresh have no side effects, so POST
+        # is as safe to retry as GET here.
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+        pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE,
+        max_retries=retries,
+    )
+    session = TimeoutSession(settings.OUTBOUND_HTTP_TIMEOUT)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide pooled session.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.OUTBOUND_HTTP_WORKERS,
+                    thread_name_prefix="outbound-http",
+                )
+    return _executor
+
+
+def run_concurrently(*calls):
+    """
+    Run the given zero-argument callables in parallel.
+
+    Returns:
+        list: One `concurrent.futures.Future` per call, in order. Call
+        `.result()` to get the value or re-raise the call's exception.
+    """
+    executor = get_executor()
+    futures = [executor.submit(call) for call in calls]
+    for future in futures:
+        future.exception()  # Wait without raising.
+    return futures
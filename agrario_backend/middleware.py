@@ -0,0 +1,139 @@
+"""
+Project-wide middleware for the Agrario backend.
+"""
+
+import gzip
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+
+from .query_budget import QueryBudgetExceeded, QueryRecorder, get_view_budget
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; fall back to gzip only.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+re_accept_encoding = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the SQL queries of each request and check them against the
+    budget declared on the view with `@query_budget`.
+
+    Enabled with `QUERY_BUDGET_ENABLED`. Adds `X-Query-Count` and
+    `X-Duplicate-Queries` headers, logs a warning when a budget is exceeded
+    and raises `QueryBudgetExceeded` instead when `QUERY_BUDGET_STRICT` is set.
+    The recorder is attached to the response as `query_recorder` for tests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request.query_budget = None
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        response["X-Query-Count"] = str(recorder.count)
+        response["X-Duplicate-Queries"] = str(len(recorder.duplicates))
+        response.query_recorder = recorder
+        response.query_budget = budget
+
+        if recorder.exceeds(budget):
+            message = f"Query budget exceeded for {request.path}: {recorder.describe(budget)}"
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func)
+
+
+def accepted_encodings(header):
+    """
+    Content codings of an `Accept-Encoding` header, without those refused
+    with `q=0`.
+    """
+    encodings = set()
+    for part in header.split(","):
+        match = re_accept_encoding.match(part)
+        if not match:
+            continue
+        coding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON and GeoJSON responses with brotli or gzip.
+
+    The coding is negotiated from `Accept-Encoding`, preferring brotli when
+    the `brotli` package is installed. Only responses of the types in
+    `COMPRESSION_CONTENT_TYPES` and at least `COMPRESSION_MIN_SIZE` bytes are
+    compressed. Like Django's `GZipMiddleware`, a strong ETag is weakened
+    since the compressed body is no longer byte-identical.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        encodings = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in encodings:
+            encoding = "br"
+            compressed = brotli.compress(
+                response.content, mode=brotli.MODE_TEXT, quality=settings.BROTLI_QUALITY)
+        elif "gzip" in encodings or "*" in encodings:
+            encoding = "gzip"
+            compressed = gzip.compress(
+                response.content, compresslevel=settings.GZIP_COMPRESSLEVEL, mtime=0)
+        else:
+            return response
+
+        # Compression would grow tiny or already dense bodies.
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        return response
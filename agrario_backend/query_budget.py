@@ -0,0 +1,112 @@
+"""
+SQL query instrumentation for API endpoints.
+
+Records the number of queries and duplicate query signatures executed while
+handling a request, and lets views declare a per-endpoint query budget with
+the `query_budget` decorator. The budget is enforced by
+`agrario_backend.middleware.QueryBudgetMiddleware` at runtime and by
+`agrario_backend.testing.QueryBudgetTestMixin` in tests.
+"""
+
+import re
+from collections import Counter
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in strict mode when a request runs more queries than its budget.
+    """
+
+
+def query_budget(max_queries):
+    """
+    Declare the maximum number of SQL queries a view or viewset action may run.
+
+    Usage:
+        @action(detail=False, methods=["get"])
+        @query_budget(3)
+        def my_chats(self, request): ...
+    """
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+
+def get_view_budget(view_func):
+    """
+    Resolve the declared budget for a resolved URL callback.
+
+    Handles plain functions, `APIView.as_view()` and viewset `as_view()`
+    callbacks, where the budget is declared on the action method.
+    """
+    budget = getattr(view_func, "query_budget", None)
+    if budget is not None:
+        return budget
+
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    if view_class is None:
+        return None
+
+    actions = getattr(view_func, "actions", None) or {}
+    for method_name in set(actions.values()):
+        budget = getattr(getattr(view_class, method_name, None), "query_budget", None)
+        if budget is not None:
+            return budget
+
+    return getattr(view_class, "query_budget", None)
+
+
+def normalize_sql(sql):
+    """
+    Reduce a SQL statement to a signature that ignores literal values.
+
+    Two statements with the same signature differ only by their parameters,
+    which is what an N+1 loop looks like.
+    """
+    signature = _IN_LIST.sub("IN (...)", sql)
+    signature = _STRING_LITERAL.sub("?", signature)
+    signature = _NUMBER_LITERAL.sub("?", signature)
+    return _WHITESPACE.sub(" ", signature).strip()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts queries and their signatures.
+
+    Install with `connection.execute_wrapper(recorder)`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.signatures[normalize_sql(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def duplicates(self):
+        """
+        Signatures that ran more than once, most frequent first.
+        """
+        return [
+            (signature, count)
+            for signature, count in self.signatures.most_common()
+            if count > 1
+        ]
+
+    def exceeds(self, budget):
+        return budget is not None and self.count > budget
+
+    def describe(self, budget=None):
+        lines = [f"{self.count} queries (budget: {budget if budget is not None else 'none'})"]
+        for signature, count in self.duplicates:
+            lines.append(f"  {count}x {signature}")
+        return "\n".join(lines)
@@ -0,0 +1,69 @@
+"""
+Fast JSON rendering for the REST API.
+
+`ORJSONRenderer` is a drop-in replacement for DRF's `JSONRenderer` backed by
+orjson. Its output matches the stdlib encoder DRF uses: Decimal values become
+numbers, UUIDs strings and datetimes ISO 8601 with `Z` for UTC. Anything
+orjson doesn't know natively falls back to DRF's `JSONEncoder`.
+"""
+
+from decimal import Decimal
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = (
+    orjson.OPT_UTC_Z
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_SERIALIZE_NUMPY
+)
+
+
+def default(obj):
+    """
+    Encode the types orjson does not handle natively.
+    """
+    if isinstance(obj, Decimal):
+        # Same as DRF's JSONEncoder; serializer fields already coerce
+        # decimals to strings, this covers hand-built response dicts.
+        return float(obj)
+    return _fallback_encoder.default(obj)
+
+
+def geojson_fragment(geometry):
+    """
+    Wrap a geometry's GeoJSON so it is embedded in the response as is.
+
+    Avoids parsing the GeoJSON GEOS produces into Python objects only to
+    encode it again.
+    """
+    if geometry is None:
+        return None
+    return orjson.Fragment(geometry.json)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderer which serializes to JSON using orjson.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        options = ORJSON_OPTIONS
+        renderer_context = renderer_context or {}
+        if renderer_context.get("indent") or (
+            accepted_media_type and "indent=" in accepted_media_type
+        ):
+            # orjson only supports two-space indentation.
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=default, option=options)
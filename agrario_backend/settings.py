@@ -7,9 +7,11 @@ import base64
 import json
 import logging
 import os
+import tempfile
 from pathlib import Path
 
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 from google.oauth2 import service_account
 import logging
@@ -43,6 +45,9 @@ STRIPE_CANCEL_URL = "https://your-backend-url/api/payments/cancel/"
 ANALYSE_PLUS_RATE = 1
 TAX_RATE = 0.19
 
+# Maximum number of parcels accepted by the bulk create endpoint
+PARCEL_BULK_CREATE_MAX = int(os.getenv("PARCEL_BULK_CREATE_MAX", 500))
+
 ALLOWED_HOSTS = [
     '127.0.0.1',
     'localhost',
@@ -93,6 +98,14 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'refresh-token',
+]
+
+# Tokens refreshed during authentication (accounts/middleware.py).
+CORS_EXPOSE_HEADERS = [
+    'x-firebase-token',
+    'x-refresh-token',
+    'x-token-expires-in',
 ]
 
 CORS_ALLOW_METHODS = (
@@ -126,6 +139,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
 
     # G-CLOUD
     'storages',
@@ -146,9 +160,12 @@ INSTALLED_APPS = [
     'reports',
     'messaging',
     'invites',
+    'uploads',
 ]
 
 MIDDLEWARE = [
+    "agrario_backend.middleware.QueryBudgetMiddleware",
+    "agrario_backend.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -156,19 +173,42 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.RefreshedTokenMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# SQL query budgets declared with `agrario_backend.query_budget.query_budget`
+QUERY_BUDGET_ENABLED = os.getenv("QUERY_BUDGET_ENABLED", str(DEBUG)).lower() == "true"
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "False").lower() == "true"
+
+# Response compression (`agrario_backend.middleware.CompressionMiddleware`)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CONTENT_TYPES = (
+    "application/json",
+    "application/geo+json",
+    "application/vnd.geo+json",
+)
+GZIP_COMPRESSLEVEL = int(os.getenv("GZIP_COMPRESSLEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'accounts.firebase_auth.FirebaseAuthentication',
         'accounts.firebase_auth.FirebaseAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'agrario_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'agrario_backend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
@@ -192,6 +232,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "agrario_backend.wsgi.application"
+ASGI_APPLICATION = "agrario_backend.asgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -215,6 +256,37 @@ else:
         'default': dj_database_url.config(engine='django.contrib.gis.db.backends.postgis')
     }
 AUTH_USER_MODEL = 'accounts.MarketUser'
+
+# Cache
+# Cached offer fragments and users are invalidated on write, which only
+# reaches every worker through a shared cache: set REDIS_URL in production.
+# Without it each process has its own LocMemCache, other workers see a
+# change once their entry times out, and the timeouts below default short.
+REDIS_URL = os.getenv("REDIS_URL")
+SHARED_CACHE = bool(REDIS_URL)
+
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {
+                "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            },
+        }
+    }
+
+# Seconds a serialized offer payload stays cached (see offers/cache.py).
+# Keep well below the signed document URL expiry of the storage backend.
+OFFER_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv("OFFER_FRAGMENT_CACHE_TIMEOUT", 300 if SHARED_CACHE else 30))
+
 # Load Firebase credentials
 # Load Firebase credentials
 firebase_credentials_path = os.getenv("FIREBASE_CREDENTIALS_JSON_PATH")
@@ -231,12 +303,109 @@ elif firebase_credentials_base64:
 else:
     firebase_config = None  # Default to None to handle missing credentials
 
+# "firebase" uses the Firebase Admin SDK and Google's REST APIs, "local" the
+# stand-in from accounts/local_auth.py (load tests, CI; no network needed).
+FIREBASE_AUTH_BACKEND = os.getenv("FIREBASE_AUTH_BACKEND", "firebase").lower()
+
+if firebase_config is None and FIREBASE_AUTH_BACKEND == "local":
+    firebase_config = {"project_id": os.getenv("FIREBASE_PROJECT_ID", "agrario-local")}
+
 if firebase_config is None:
     raise Exception("Firebase credentials are not provided.")
 
 # Make firebase_config available to other parts of the app
 FIREBASE_CONFIG = firebase_config
 
+# Verified ID tokens are cached in process until they expire (see
+# accounts/firebase_auth.py). Revocation is re-checked against Firebase at
+# most once per interval and token.
+FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", 10000))
+FIREBASE_REVOCATION_CHECK_INTERVAL = int(os.getenv("FIREBASE_REVOCATION_CHECK_INTERVAL", 300))
+# Refreshed tokens are reused until this many seconds before they expire.
+FIREBASE_REFRESH_CACHE_MARGIN = int(os.getenv("FIREBASE_REFRESH_CACHE_MARGIN", 60))
+# "remote" verifies ID tokens with the Admin SDK, "offline" against the
+# signing keys cached in FIREBASE_CERTS_CACHE_PATH (see accounts/jwks.py).
+FIREBASE_TOKEN_VERIFICATION = os.getenv("FIREBASE_TOKEN_VERIFICATION", "remote").lower()
+FIREBASE_CERTS_CACHE_PATH = os.getenv(
+    "FIREBASE_CERTS_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "agrario-firebase-certs.json"),
+)
+# Refresh the keys this many seconds before they expire, and keep using
+# expired keys this long while the certificate endpoint is unreachable.
+FIREBASE_CERTS_REFRESH_MARGIN = int(os.getenv("FIREBASE_CERTS_REFRESH_MARGIN", 300))
+FIREBASE_CERTS_STALE_TTL = int(os.getenv("FIREBASE_CERTS_STALE_TTL", 3600))
+FIREBASE_CERTS_TIMEOUT = int(os.getenv("FIREBASE_CERTS_TIMEOUT", 5))
+FIREBASE_TOKEN_CLOCK_SKEW = int(os.getenv("FIREBASE_TOKEN_CLOCK_SKEW", 0))
+
+# Firebase REST endpoints. The local backend serves them from
+# `manage.py run_local_firebase`, laid out like the Firebase emulator.
+FIREBASE_LOCAL_HOST = os.getenv("FIREBASE_LOCAL_HOST", "127.0.0.1:9099")
+if FIREBASE_AUTH_BACKEND == "local":
+    _firebase_hosts = {
+        host: f"http://{FIREBASE_LOCAL_HOST}/{host}"
+        for host in ("identitytoolkit.googleapis.com", "securetoken.googleapis.com", "www.googleapis.com")
+    }
+else:
+    _firebase_hosts = {
+        host: f"https://{host}"
+        for host in ("identitytoolkit.googleapis.com", "securetoken.googleapis.com", "www.googleapis.com")
+    }
+FIREBASE_IDENTITY_TOOLKIT_URL = os.getenv(
+    "FIREBASE_IDENTITY_TOOLKIT_URL", _firebase_hosts["identitytoolkit.googleapis.com"])
+FIREBASE_SECURE_TOKEN_URL = os.getenv(
+    "FIREBASE_SECURE_TOKEN_URL", _firebase_hosts["securetoken.googleapis.com"])
+FIREBASE_CERTS_URL = os.getenv(
+    "FIREBASE_CERTS_URL",
+    _firebase_hosts["www.googleapis.com"]
+    + "/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com",
+)
+# Users and signing key of the local backend, shared by all local processes.
+FIREBASE_LOCAL_STORE_PATH = os.getenv(
+    "FIREBASE_LOCAL_STORE_PATH", os.path.join(tempfile.gettempdir(), "agrario-local-auth.sqlite3"))
+FIREBASE_LOCAL_KEY_PATH = os.getenv(
+    "FIREBASE_LOCAL_KEY_PATH", os.path.join(tempfile.gettempdir(), "agrario-local-auth-key.pem"))
+
+# Pooled client for outbound REST calls (see agrario_backend/http_client.py).
+OUTBOUND_HTTP_TIMEOUT = float(os.getenv("OUTBOUND_HTTP_TIMEOUT", 10))
+OUTBOUND_HTTP_RETRIES = int(os.getenv("OUTBOUND_HTTP_RETRIES", 2))
+OUTBOUND_HTTP_BACKOFF = float(os.getenv("OUTBOUND_HTTP_BACKOFF", 0.2))
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv("OUTBOUND_HTTP_POOL_SIZE", 20))
+OUTBOUND_HTTP_WORKERS = int(os.getenv("OUTBOUND_HTTP_WORKERS", 8))
+# Seconds an authenticated user stays cached by email (see accounts/cache.py).
+# Without a shared cache this is how long other workers may keep a
+# deactivated or re-roled user.
+USER_CACHE_TIMEOUT = int(os.getenv("USER_CACHE_TIMEOUT", 300 if SHARED_CACHE else 15))
+
+# Users handled per transaction when delivering a broadcast.
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", 500))
+# Seconds without progress after which `manage.py deliver_broadcasts`
+# treats a pending or delivering broadcast as interrupted and resumes it.
+BROADCAST_STALE_AFTER = int(os.getenv("BROADCAST_STALE_AFTER", 600))
+
+# Server-Sent Events push (see agrario_backend/events.py): "local" or "postgres".
+# "local" only reaches clients of the publishing process, so it is limited to
+# a single web worker with nothing publishing from other processes.
+EVENTS_BROKER = os.getenv(
+    "EVENTS_BROKER",
+    "postgres" if "postgis" in DATABASES["default"].get("ENGINE", "") else "local",
+)
+if EVENTS_BROKER == "local" and int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+    raise ImproperlyConfigured(
+        'EVENTS_BROKER "local" drops events across WEB_CONCURRENCY workers; use "postgres".')
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "agrario_events")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+EVENTS_HEARTBEAT_INTERVAL = int(os.getenv("EVENTS_HEARTBEAT_INTERVAL", 15))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 5000))
+EVENTS_RECONNECT_DELAY = int(os.getenv("EVENTS_RECONNECT_DELAY", 5))
+# Seconds a stream ticket from /api/events/ticket/ stays valid.
+EVENTS_TICKET_TTL = int(os.getenv("EVENTS_TICKET_TTL", 60))
+
+# Direct-to-storage uploads (see uploads/backends.py): "gcs" or "local"
+UPLOAD_BACKEND = os.getenv("UPLOAD_BACKEND", "gcs")
+UPLOAD_LOCAL_DIR = os.getenv(
+    "UPLOAD_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "agrario-uploads"))
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))
+
 
 # GOOGLE CLOUD
 google_credentials_path = os.getenv("GOOGLE_CREDENTIALS_JSON_PATH")
@@ -252,12 +421,15 @@ try:
         google_credentials_info = json.loads(
             base64.b64decode(google_credentials_base64).decode("utf-8")
         )
+    elif FIREBASE_AUTH_BACKEND == "local":
+        # Local runs don't need storage credentials until a file is stored.
+        google_credentials_info = None
     else:
         raise Exception("Google Cloud credentials not provided.")
 
     GS_CREDENTIALS = service_account.Credentials.from_service_account_info(
         google_credentials_info
-    )
+    ) if google_credentials_info else None
 
 except Exception as e:
     logging.error(f"Error loading Google Cloud credentials: {e}")
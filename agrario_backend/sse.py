@@ -0,0 +1,115 @@
+"""
+Server-Sent Events endpoint for the events of `agrario_backend.events`.
+
+Needs an ASGI server: every open stream is an idle coroutine, not a
+worker thread. Browsers' `EventSource` can't send headers, so instead of
+putting the Firebase ID token into the URL (and every access log) they
+fetch a short-lived, single-use ticket from `EventTicketView` and open the
+stream with `?ticket=`.
+"""
+
+import asyncio
+import json
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.firebase_auth import FirebaseAuthentication
+from accounts.models import MarketUser
+
+from .events import get_broker
+
+TICKET_SALT = "agrario_backend.sse.ticket"
+
+
+def issue_ticket(user):
+    """
+    A signed stream ticket for `user`, valid for `EVENTS_TICKET_TTL` seconds.
+    """
+    return signing.dumps(
+        {"user": str(user.pk), "nonce": secrets.token_urlsafe(12)}, salt=TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """
+    Return the active user of a valid ticket and use it up, or None.
+
+    Tickets are signed, so any worker can check them; that each is used only
+    once holds across workers when the cache is shared.
+    """
+    try:
+        claims = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_TTL)
+    except signing.BadSignature:
+        return None
+    if not cache.add(f"events:ticket:{claims['nonce']}", True, timeout=settings.EVENTS_TICKET_TTL):
+        return None
+    return MarketUser.objects.filter(pk=claims["user"], is_active=True).first()
+
+
+class EventTicketView(APIView):
+    """
+    Issue a ticket for opening the event stream with `?ticket=`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "ticket": issue_ticket(request.user),
+            "expires_in": settings.EVENTS_TICKET_TTL,
+        })
+
+
+def _authenticate(request):
+    ticket = request.GET.get("ticket")
+    if ticket and "HTTP_AUTHORIZATION" not in request.META:
+        return redeem_ticket(ticket)
+    try:
+        result = FirebaseAuthentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream(subscription):
+    broker = get_broker()
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await subscription.get(settings.EVENTS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing the idle connection.
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event["event"], event["data"])
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def event_stream(request):
+    """
+    Stream `message`, `unread` and `offer_status` events to the user.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+
+    subscription = get_broker().subscribe(user.pk)
+    response = StreamingHttpResponse(stream(subscription), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
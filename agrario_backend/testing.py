@@ -0,0 +1,44 @@
+"""
+Test helpers shared across the Agrario apps.
+"""
+
+from django.test import override_settings
+
+
+class QueryBudgetTestMixin:
+    """
+    Mixin for `TestCase` classes that checks responses against the query
+    budget declared on the view with `@query_budget`.
+
+    Enables `QueryBudgetMiddleware` for the whole test class.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._query_budget_settings = override_settings(
+            QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=False)
+        cls._query_budget_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._query_budget_settings.disable()
+        super().tearDownClass()
+
+    def assertWithinQueryBudget(self, response, budget=None, allow_duplicates=False):
+        """
+        Fail if the request behind `response` ran more queries than its budget
+        or, unless `allow_duplicates` is set, repeated the same query shape.
+        """
+        recorder = getattr(response, "query_recorder", None)
+        if recorder is None:
+            self.fail("Response was not recorded by QueryBudgetMiddleware.")
+
+        budget = budget if budget is not None else response.query_budget
+        if budget is None:
+            self.fail("The view does not declare a query budget.")
+
+        if recorder.exceeds(budget):
+            self.fail(f"Query budget exceeded: {recorder.describe(budget)}")
+        if recorder.duplicates and not allow_duplicates:
+            self.fail(f"Duplicate queries detected (possible N+1): {recorder.describe(budget)}")
@@ -0,0 +1,61 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import orjson
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from . import renderers
+from .renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimal(self):
+        self.assertRendersLikeDRF({"area": Decimal("1234.50"), "share": Decimal("0.1")})
+
+    def test_uuid(self):
+        self.assertRendersLikeDRF({"id": uuid.UUID("12345678-1234-5678-1234-567812345678")})
+
+    def test_datetimes_and_dates(self):
+        self.assertRendersLikeDRF({
+            "aware": datetime.datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "offset": datetime.datetime(
+                2025, 3, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=1))),
+            "naive": datetime.datetime(2025, 3, 1, 12, 30, 15, 500),
+            "now": timezone.now(),
+            "date": datetime.date(2025, 3, 1),
+            "time": datetime.time(12, 30, 15, 123456),
+        })
+
+    def test_lazy_strings(self):
+        self.assertRendersLikeDRF({"label": gettext_lazy("Available"), "list": [gettext_lazy("x")]})
+
+    def test_fragment_is_embedded_as_is(self):
+        geojson = '{"type": "Point", "coordinates": [9.4, 51.3]}'
+
+        rendered = ORJSONRenderer().render({"polygon": orjson.Fragment(geojson)})
+
+        self.assertIn(geojson.encode(), rendered)
+        self.assertEqual(
+            json.loads(rendered),
+            json.loads(JSONRenderer().render({"polygon": json.loads(geojson)})),
+        )
+
+    def test_unsupported_types_use_the_drf_encoder(self):
+        data = {"duration": datetime.timedelta(minutes=5), "tags": {"solar"}}
+
+        with patch.object(
+            renderers._fallback_encoder, "default", wraps=renderers._fallback_encoder.default,
+        ) as fallback:
+            rendered = ORJSONRenderer().render(data)
+
+        self.assertEqual(fallback.call_count, 2)
+        self.assertEqual(rendered, JSONRenderer().render(data))
@@ -11,6 +11,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from .sse import EventTicketView, event_stream
+
 # Define the OpenAPI Info object
 swagger_info = openapi.Info(
     title="Agrario API",
@@ -37,6 +39,9 @@ urlpatterns = [
     path("api/reports/", include("reports.urls")),
     path("api/payments/", include("payments.urls")),
     path("api/invites/", include("invites.urls")),
+    path("api/uploads/", include("uploads.urls")),
+    path("api/events/", event_stream, name="event-stream"),
+    path("api/events/ticket/", EventTicketView.as_view(), name="event-ticket"),
     path(
         "swagger/",
         SchemaView.with_ui("swagger", cache_timeout=0),
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Message, Attachment, Chat
+from .models import Message, Attachment, Broadcast, Chat
+from .services import record_unread, search_query
 
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin):
@@ -18,9 +19,28 @@ class MessageAdmin(admin.ModelAdmin):
     """
     list_display = ('subject', 'sender', 'created_at', 'is_admin_message', 'is_read')  # Use a custom method
     list_filter = ('created_at', 'sender', 'chat', 'is_admin_message')
-    search_fields = ('subject', 'sender__email', 'body')  # Removed 'recipient__email'
+    # Searched with the full-text index, see get_search_results.
+    search_fields = ('subject', 'body')
+    search_help_text = "Full-text search in subject and body, or a sender's email address."
     ordering = ('-created_at',)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the GIN-indexed search vector instead of `icontains` scans.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if "@" in search_term:
+            return queryset.filter(sender__email__iexact=search_term), False
+        return queryset.filter(search_vector=search_query(search_term)), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            # Count messages written in the admin as unread like API ones.
+            record_unread([obj])
+
     # def get_recipient(self, obj):
     #     return obj.recipient.all()
 
@@ -38,3 +58,10 @@ class ChatAdmin(admin.ModelAdmin):
     search_fields = ("identifier",)
     list_filter = ("created_at",)
 
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ("subject", "sender", "created_at", "status", "delivered_count", "total_recipients")
+    list_filter = ("status", "created_at")
+    search_fields = ("subject", "sender__email")
+    readonly_fields = ("status", "total_recipients", "delivered_count", "last_recipient", "finished_at")
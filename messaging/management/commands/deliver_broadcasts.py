@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from messaging.models import Broadcast
+from messaging.services import claim_resumable_broadcasts, deliver_broadcast
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers failed broadcasts, and pending or delivering ones without "
+        "progress for BROADCAST_STALE_AFTER seconds, continuing after the "
+        "last recipient that was reached. With --interval it keeps running "
+        "and checks again every N seconds; the Procfile's `worker` process "
+        "runs it that way, so deliveries whose thread died are picked up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--include-delivering", action="store_true",
+            help="Also resume pending and delivering broadcasts that made progress recently.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=None,
+            help="Users per transaction (default: BROADCAST_CHUNK_SIZE).",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=None,
+            help="Run until stopped, checking every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] is None:
+            self.deliver(options)
+            self.stdout.write(self.style.SUCCESS("Done."))
+            return
+
+        while True:
+            close_old_connections()
+            try:
+                self.deliver(options)
+            except Exception as e:
+                # E.g. the database is briefly unreachable; try again later.
+                self.stderr.write(self.style.ERROR(f"Delivery pass failed: {e}"))
+            time.sleep(options["interval"])
+
+    def deliver(self, options):
+        if options["include_delivering"]:
+            broadcasts = Broadcast.objects.exclude(
+                status=Broadcast.DELIVERED).order_by("created_at")
+        else:
+            broadcasts = claim_resumable_broadcasts()
+
+        for broadcast in broadcasts:
+            try:
+                broadcast = deliver_broadcast(broadcast, chunk_size=options["chunk_size"])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"{broadcast.pk}: {e}"))
+                continue
+            self.stdout.write(
+                f"{broadcast.pk}: {broadcast.delivered_count}/{broadcast.total_recipients} delivered")
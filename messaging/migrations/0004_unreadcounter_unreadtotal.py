@@ -0,0 +1,89 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from collections import Counter
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Message = apps.get_model("messaging", "Message")
+    UnreadCounter = apps.get_model("messaging", "UnreadCounter")
+    UnreadTotal = apps.get_model("messaging", "UnreadTotal")
+
+    counters = Counter()
+    unread = Message.objects.filter(is_read=False).values_list(
+        "chat_id", "sender_id", "chat__user1_id", "chat__user2_id")
+    for chat_id, sender_id, user1_id, user2_id in unread.iterator(chunk_size=2000):
+        recipient_id = user2_id if sender_id == user1_id else user1_id
+        counters[(recipient_id, chat_id)] += 1
+
+    totals = Counter()
+    for (user_id, chat_id), count in counters.items():
+        totals[user_id] += count
+
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, chat_id=chat_id, count=count)
+         for (user_id, chat_id), count in counters.items()],
+        batch_size=2000,
+    )
+    UnreadTotal.objects.bulk_create(
+        [UnreadTotal(user_id=user_id, count=count) for user_id, count in totals.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0003_broadcast_message_broadcast"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadTotal",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unread_total",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UnreadCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "chat",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unread_counters",
+                        to="messaging.chat",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unread_counters",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("user", "chat"), name="unique_unread_counter")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
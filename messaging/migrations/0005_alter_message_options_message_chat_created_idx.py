@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0004_unreadcounter_unreadtotal"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["chat", "created_at"], name="message_chat_created_idx"),
+        ),
+    ]
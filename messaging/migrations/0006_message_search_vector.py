@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('german', coalesce({row}subject, '')), 'A') || "
+    "setweight(to_tsvector('german', coalesce({row}body, '')), 'B')"
+)
+
+CREATE_TRIGGER = f"""
+CREATE FUNCTION messaging_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR.format(row="NEW.")};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER messaging_message_search_vector_trigger
+BEFORE INSERT OR UPDATE OF subject, body ON messaging_message
+FOR EACH ROW EXECUTE FUNCTION messaging_message_search_vector_update();
+
+UPDATE messaging_message SET search_vector = {SEARCH_VECTOR.format(row="")};
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS messaging_message_search_vector_trigger ON messaging_message;
+DROP FUNCTION IF EXISTS messaging_message_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0005_alter_message_options_message_chat_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name="message",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="message_search_vector_idx"),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0006_message_search_vector"),
+        ("uploads", "0002_blob_uploadsession_sha256_uploadsession_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="attachments",
+                to="uploads.blob",
+            ),
+        ),
+    ]
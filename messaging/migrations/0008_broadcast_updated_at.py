@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0007_attachment_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="broadcast",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
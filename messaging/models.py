@@ -1,4 +1,6 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from accounts.models import MarketUser
 import logging
@@ -12,6 +14,10 @@ class Attachment(models.Model):
     Model for storing file attachments for messages.
     """
     file = models.FileField(upload_to="messages/attachments/")
+    blob = models.ForeignKey(
+        "uploads.Blob", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="attachments"
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -30,6 +36,46 @@ class Chat(models.Model):
         return f"Chat {self.identifier} between {self.user1} and {self.user2}"
 
 
+class Broadcast(models.Model):
+    """
+    A message from an admin to all users, stored once.
+
+    `messaging.services.deliver_broadcast` copies it into the users' chats in
+    chunks, outside the request. `delivered_count` and `last_recipient` track
+    the progress, so an interrupted delivery resumes where it stopped.
+    `updated_at` moves with every chunk; a delivering broadcast whose
+    `updated_at` stands still has lost its worker.
+    """
+    PENDING = "pending"
+    DELIVERING = "delivering"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (DELIVERING, "Delivering"),
+        (DELIVERED, "Delivered"),
+        (FAILED, "Failed"),
+    ]
+
+    identifier = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="broadcasts"
+    )
+    subject = models.CharField(max_length=64)
+    body = models.TextField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    total_recipients = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    last_recipient = models.UUIDField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Broadcast {self.identifier} - {self.subject} ({self.status})"
+
+
 class Message(models.Model):
     SUBJECT_CHOICES = [
 
@@ -70,9 +116,77 @@ class Message(models.Model):
         blank=True,
         related_name='messages'
     )
+    broadcast = models.ForeignKey(
+        'Broadcast',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='messages'
+    )
+    # German full-text vector of subject (weight A) and body (weight B),
+    # maintained by a database trigger, so bulk inserts are covered too.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
-        ordering = ['created_at']  # Messages are ordered by creation time
+        # No default ordering: counts and aggregates shouldn't sort. Order
+        # explicitly; the index serves a chat's messages by creation time.
+        indexes = [
+            models.Index(fields=['chat', 'created_at'], name='message_chat_created_idx'),
+            GinIndex(fields=['search_vector'], name='message_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f"Message in Chat {self.chat.identifier} from {self.sender} - {self.subject}"
+
+    @property
+    def recipient_id(self):
+        """
+        The chat participant who did not send the message.
+        """
+        chat = self.chat
+        return chat.user2_id if self.sender_id == chat.user1_id else chat.user1_id
+
+    @property
+    def recipient(self):
+        chat = self.chat
+        return chat.user2 if self.sender_id == chat.user1_id else chat.user1
+
+
+class UnreadCounter(models.Model):
+    """
+    Number of unread messages of a user in one chat.
+
+    Maintained by `messaging.services` in the transaction that creates or
+    reads the messages, so badges don't count `Message` rows.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="unread_counters"
+    )
+    chat = models.ForeignKey(
+        'Chat', on_delete=models.CASCADE, related_name="unread_counters"
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "chat"], name="unique_unread_counter"),
+        ]
+
+    def __str__(self):
+        return f"{self.count} unread for {self.user_id} in Chat {self.chat_id}"
+
+
+class UnreadTotal(models.Model):
+    """
+    Number of unread messages of a user across all chats.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="unread_total"
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.count} unread for {self.user_id}"
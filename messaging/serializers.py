@@ -1,20 +1,22 @@
 from rest_framework import serializers
-from .models import Message, Attachment, Chat
+from .models import Message, Attachment, Broadcast, Chat
 from accounts.models import MarketUser
+from .services import create_message
 import uuid
 
 
 class AttachmentSerializer(serializers.ModelSerializer):
+    MAX_SIZE = 5 * 1024 * 1024  # 5 MB
+    ALLOWED_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
+
     class Meta:
         model = Attachment
         fields = ['id', 'file', 'uploaded_at']
 
     def validate_file(self, value):
-        max_size = 5 * 1024 * 1024  # 5 MB
-        allowed_types = ['application/pdf', 'image/jpeg', 'image/png']
-        if value.size > max_size:
+        if value.size > self.MAX_SIZE:
             raise serializers.ValidationError("File size must be under 5MB.")
-        if value.content_type not in allowed_types:
+        if value.content_type not in self.ALLOWED_TYPES:
             raise serializers.ValidationError("Unsupported file type.")
         return value
 
@@ -38,12 +40,18 @@ class MessageSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    # Attachments uploaded beforehand through `/api/uploads/`.
+    attachment_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        write_only=True,
+        required=False
+    )
 
     class Meta:
         model = Message
         fields = (
             'identifier', 'sender', 'subject', 'body', 'attachments',
-            'attachment_files', 'created_at', 'is_read', 'is_admin_message'
+            'attachment_files', 'attachment_ids', 'created_at', 'is_read', 'is_admin_message'
         )
         read_only_fields = ['identifier', 'created_at', 'is_read', 'attachments', 'sender', 'is_admin_message']
 
@@ -53,29 +61,81 @@ class MessageSerializer(serializers.ModelSerializer):
 
         # Handle attachment files
         attachment_files = validated_data.pop('attachment_files', [])
+        validated_data.pop('attachment_ids', None)
 
-        # Create the message
-        message = Message.objects.create(chat=chat, **validated_data)
-
-        # Add attachments
-        for file in attachment_files:
-            attachment = Attachment.objects.create(file=file)
-            message.attachments.add(attachment)
-
-        return message
+        # Create the message and count it as unread
+        return create_message(chat=chat, attachment_files=attachment_files, **validated_data)
     
 
 class ChatSerializer(serializers.ModelSerializer):
+    SNIPPET_LENGTH = 100
+
     user1 = serializers.StringRelatedField()  # Display user1 username
     user2 = serializers.StringRelatedField()  # Display user2 username
     messages_count = serializers.SerializerMethodField()  # Count of messages in chat
+    unread_count = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ['identifier', 'user1', 'user2', 'created_at', 'messages_count']
+        fields = [
+            'identifier', 'user1', 'user2', 'created_at', 'messages_count',
+            'unread_count', 'last_message'
+        ]
 
     def get_messages_count(self, obj):
         """
-        Count messages in the chat.
+        Count messages in the chat, using the `messages_count` annotation
+        from the queryset when present.
         """
-        return obj.messages.count()
\ No newline at end of file
+        count = getattr(obj, "messages_count", None)
+        if count is not None:
+            return count
+        return obj.messages.count()
+
+    def get_unread_count(self, obj):
+        """
+        Unread messages of the requesting user, from the `unread_count`
+        annotation or the chat's counter.
+        """
+        count = getattr(obj, "unread_count", None)
+        if count is not None:
+            return count
+        request = self.context.get("request")
+        if request is None:
+            return 0
+        counter = obj.unread_counters.filter(user=request.user).first()
+        return counter.count if counter else 0
+
+    def get_last_message(self, obj):
+        """
+        Preview of the newest message, from the `last_message_*` annotations
+        when present.
+        """
+        if hasattr(obj, "last_message_at"):
+            if obj.last_message_at is None:
+                return None
+            return {
+                "subject": obj.last_message_subject,
+                "snippet": obj.last_message_snippet,
+                "created_at": obj.last_message_at,
+            }
+
+        message = obj.messages.order_by("-created_at").first()
+        if message is None:
+            return None
+        return {
+            "subject": message.subject,
+            "snippet": message.body[:self.SNIPPET_LENGTH],
+            "created_at": message.created_at,
+        }
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Broadcast
+        fields = [
+            'identifier', 'subject', 'body', 'created_at', 'status',
+            'total_recipients', 'delivered_count', 'finished_at'
+        ]
+        read_only_fields = fields
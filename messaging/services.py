@@ -0,0 +1,397 @@
+import logging
+import threading
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from accounts.models import MarketUser
+from agrario_backend.events import publish
+from uploads.blobs import store_blob
+from .models import Attachment, Broadcast, Chat, Message, UnreadCounter, UnreadTotal
+
+logger = logging.getLogger(__name__)
+
+
+def unread_total(user):
+    """
+    Return the number of unread messages of `user` with one lookup.
+    """
+    count = UnreadTotal.objects.filter(pk=user.pk).values_list("count", flat=True).first()
+    return count or 0
+
+
+def message_event(message):
+    """
+    Payload of the `message` push event.
+    """
+    return {
+        "identifier": message.pk,
+        "chat": message.chat_id,
+        "sender": message.sender_id,
+        "subject": message.subject,
+        "body": message.body,
+        "created_at": message.created_at,
+        "is_admin_message": message.is_admin_message,
+    }
+
+
+def push_after_commit(user_ids, messages=()):
+    """
+    Once the transaction commits, push `messages` to their recipients and
+    the new unread totals to `user_ids`.
+    """
+    user_ids = set(user_ids)
+
+    def push():
+        for message in messages:
+            publish(message.recipient_id, "message", message_event(message))
+        totals = dict(
+            UnreadTotal.objects.filter(pk__in=user_ids).values_list("user_id", "count"))
+        for user_id in user_ids:
+            publish(user_id, "unread", {"unread_count": totals.get(user_id, 0)})
+
+    transaction.on_commit(push)
+
+
+def _increment(model, amounts, fields):
+    """
+    Add `amounts[key]` to the counter row of each key, creating missing rows
+    first. `fields(key)` returns the lookup of a key's row. Runs one update
+    per distinct amount.
+    """
+    model.objects.bulk_create([model(**fields(key)) for key in amounts], ignore_conflicts=True)
+
+    by_amount = {}
+    for key, amount in amounts.items():
+        by_amount.setdefault(amount, []).append(key)
+    for amount, keys in by_amount.items():
+        condition = Q()
+        for key in keys:
+            condition |= Q(**fields(key))
+        model.objects.filter(condition).update(count=F("count") + amount)
+
+
+def record_unread(messages):
+    """
+    Count new `messages` as unread for their recipients and push them once
+    the transaction commits.
+
+    Call in the transaction that creates the messages; their `chat` must
+    be set. Uses a fixed number of queries for a batch of one-message-per-
+    chat copies, like support fan-out and broadcast chunks.
+    """
+    per_chat = {}
+    for message in messages:
+        key = (message.recipient_id, message.chat_id)
+        per_chat[key] = per_chat.get(key, 0) + 1
+    if not per_chat:
+        return
+
+    per_user = {}
+    for (user_id, chat_id), count in per_chat.items():
+        per_user[user_id] = per_user.get(user_id, 0) + count
+
+    _increment(UnreadCounter, per_chat, lambda key: {"user_id": key[0], "chat_id": key[1]})
+    _increment(UnreadTotal, per_user, lambda key: {"user_id": key})
+    push_after_commit(per_user, messages)
+
+
+def _decrement(user, chat, count):
+    UnreadCounter.objects.filter(user=user, chat=chat).update(
+        count=Greatest(F("count") - count, 0))
+    UnreadTotal.objects.filter(pk=user.pk).update(
+        count=Greatest(F("count") - count, 0))
+    push_after_commit([user.pk])
+
+
+def forget_unread(chat):
+    """
+    Subtract the unread counts of `chat` from its users' totals. Call before
+    the chat is deleted; its counters go with it.
+    """
+    counters = list(
+        UnreadCounter.objects.filter(chat=chat, count__gt=0).values_list("user_id", "count"))
+    for user_id, count in counters:
+        UnreadTotal.objects.filter(pk=user_id).update(count=Greatest(F("count") - count, 0))
+    if counters:
+        push_after_commit(user_id for user_id, _ in counters)
+
+
+def mark_chat_read(user, chat):
+    """
+    Mark the messages `user` received in `chat` as read.
+
+    Returns:
+        int: The number of messages that were unread.
+    """
+    with transaction.atomic():
+        count = (
+            Message.objects.filter(chat=chat, is_read=False)
+            .exclude(sender=user)
+            .update(is_read=True)
+        )
+        if count:
+            _decrement(user, chat, count)
+    return count
+
+
+def mark_message_read(user, message):
+    """
+    Mark a single message as read if `user` received it.
+    """
+    if message.is_read or message.recipient_id != user.pk:
+        return False
+
+    with transaction.atomic():
+        updated = Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True)
+        if updated:
+            _decrement(user, message.chat_id, updated)
+    message.is_read = True
+    return bool(updated)
+
+
+def search_query(text):
+    """
+    German full-text query in web search syntax: words, "phrases", OR, -word.
+    """
+    return SearchQuery(text, config="german", search_type="websearch")
+
+
+def search_messages(user, text):
+    """
+    Messages matching `text`, best match first.
+
+    Superusers search all messages, other users the chats they are part of.
+    The match runs on the GIN-indexed `search_vector`.
+    """
+    query = search_query(text)
+    messages = Message.objects.filter(search_vector=query)
+    if not user.is_superuser:
+        messages = messages.filter(Q(chat__user1=user) | Q(chat__user2=user))
+    return (
+        messages.annotate(rank=SearchRank(F("search_vector"), query))
+        .select_related("sender")
+        .prefetch_related("attachments")
+        .order_by("-rank", "-created_at")
+    )
+
+
+def get_support_chats(sender):
+    """
+    Return the chats between `sender` and every support account, creating
+    the missing ones.
+
+    Uses a fixed number of queries however many support accounts exist.
+    """
+    support_ids = list(
+        MarketUser.objects.filter(is_superuser=True).values_list("pk", flat=True))
+    if not support_ids:
+        return []
+
+    chats = {}
+    for chat in Chat.objects.filter(user1=sender, user2_id__in=support_ids).order_by("created_at"):
+        chats.setdefault(chat.user2_id, chat)
+
+    missing = [Chat(user1=sender, user2_id=pk) for pk in support_ids if pk not in chats]
+    if missing:
+        Chat.objects.bulk_create(missing)
+        chats.update((chat.user2_id, chat) for chat in missing)
+
+    return [chats[pk] for pk in support_ids]
+
+
+def _attach(file):
+    blob = store_blob(file, content_type=getattr(file, "content_type", ""))
+    return Attachment.objects.create(file=blob.storage_name, blob=blob)
+
+
+def create_message(chat, sender, attachment_files=(), attachments=(), **fields):
+    """
+    Create one message in `chat` and count it as unread for its recipient.
+
+    Messages are only created here, in `send_to_support` and by broadcasts,
+    so the unread counters stay in step with the messages.
+    """
+    with transaction.atomic():
+        message = Message.objects.create(chat=chat, sender=sender, **fields)
+        linked = [*attachments, *(_attach(file) for file in attachment_files)]
+        if linked:
+            message.attachments.add(*linked)
+        record_unread([message])
+    return message
+
+
+def send_to_support(sender, subject, body, attachment_files=(), attachments=()):
+    """
+    Send one message from `sender` to every support account.
+
+    `attachment_files` are stored once (or not at all if their content is
+    stored already), and together with the already
+    stored `attachments` linked to every copy of the message.
+
+    Returns:
+        list: The created messages, one per support chat.
+    """
+    with transaction.atomic():
+        chats = get_support_chats(sender)
+        if not chats:
+            return []
+
+        attachments = [
+            *attachments,
+            *(_attach(file) for file in attachment_files),
+        ]
+
+        messages = Message.objects.bulk_create([
+            Message(chat=chat, sender=sender, subject=subject, body=body)
+            for chat in chats
+        ])
+        record_unread(messages)
+
+        if attachments:
+            Link = Message.attachments.through
+            Link.objects.bulk_create([
+                Link(message_id=message.pk, attachment_id=attachment.pk)
+                for message in messages
+                for attachment in attachments
+            ])
+
+    return messages
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _deliver_chunk(broadcast, user_ids):
+    """
+    Copy the broadcast into the chats of `user_ids` and record the progress
+    in the same transaction.
+    """
+    with transaction.atomic():
+        chats = {}
+        for chat in Chat.objects.filter(
+                user1_id__in=user_ids, user2_id=broadcast.sender_id).order_by("created_at"):
+            chats.setdefault(chat.user1_id, chat)
+
+        missing = [
+            Chat(user1_id=pk, user2_id=broadcast.sender_id)
+            for pk in user_ids if pk not in chats
+        ]
+        if missing:
+            Chat.objects.bulk_create(missing)
+            chats.update((chat.user1_id, chat) for chat in missing)
+
+        messages = Message.objects.bulk_create([
+            Message(
+                chat=chats[pk],
+                sender_id=broadcast.sender_id,
+                subject=broadcast.subject,
+                body=broadcast.body,
+                is_admin_message=True,
+                broadcast=broadcast,
+            )
+            for pk in user_ids
+        ])
+        record_unread(messages)
+
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            delivered_count=F("delivered_count") + len(user_ids),
+            last_recipient=user_ids[-1],
+            updated_at=timezone.now(),
+        )
+
+
+def deliver_broadcast(broadcast, chunk_size=None):
+    """
+    Deliver a broadcast to every user except its sender.
+
+    Users are read with `.iterator()` and handled `BROADCAST_CHUNK_SIZE` at
+    a time, one transaction per chunk. A broadcast that was interrupted
+    continues after its `last_recipient`.
+    """
+    chunk_size = chunk_size or settings.BROADCAST_CHUNK_SIZE
+    recipients = MarketUser.objects.exclude(pk=broadcast.sender_id).order_by("pk")
+
+    if broadcast.status == Broadcast.PENDING:
+        broadcast.total_recipients = recipients.count()
+    broadcast.status = Broadcast.DELIVERING
+    broadcast.save(update_fields=["status", "total_recipients", "updated_at"])
+
+    if broadcast.last_recipient:
+        recipients = recipients.filter(pk__gt=broadcast.last_recipient)
+
+    try:
+        user_ids = recipients.values_list("pk", flat=True).iterator(chunk_size=chunk_size)
+        for chunk in _chunks(user_ids, chunk_size):
+            _deliver_chunk(broadcast, chunk)
+    except Exception:
+        logger.exception(f"Delivery of broadcast {broadcast.pk} failed.")
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            status=Broadcast.FAILED, updated_at=timezone.now())
+        raise
+
+    Broadcast.objects.filter(pk=broadcast.pk).update(
+        status=Broadcast.DELIVERED, finished_at=timezone.now(), updated_at=timezone.now())
+    broadcast.refresh_from_db()
+    return broadcast
+
+
+def claim_resumable_broadcasts():
+    """
+    Claim the broadcasts no delivery is working on, oldest first.
+
+    These are failed broadcasts and, after `BROADCAST_STALE_AFTER` seconds
+    without progress, pending and delivering ones whose worker died. The
+    grace period keeps a background delivery that is just starting from
+    being doubled. Each broadcast is claimed with a conditional update, so
+    concurrent runs don't deliver the same broadcast twice.
+
+    Returns:
+        list: The claimed broadcasts, with the status they had before.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.BROADCAST_STALE_AFTER)
+    candidates = Broadcast.objects.filter(
+        Q(status=Broadcast.FAILED)
+        | Q(status__in=[Broadcast.PENDING, Broadcast.DELIVERING], updated_at__lt=stale)
+    ).order_by("created_at")
+
+    claimed = []
+    for broadcast in candidates:
+        if Broadcast.objects.filter(
+            pk=broadcast.pk, status=broadcast.status, updated_at=broadcast.updated_at,
+        ).update(status=Broadcast.DELIVERING, updated_at=timezone.now()):
+            claimed.append(broadcast)
+    return claimed
+
+
+def _deliver_in_background(pk):
+    try:
+        deliver_broadcast(Broadcast.objects.get(pk=pk))
+    except Exception:
+        pass  # Logged by deliver_broadcast; `deliver_broadcasts` retries it.
+    finally:
+        close_old_connections()
+
+
+def start_broadcast(sender, subject, body):
+    """
+    Store a broadcast and deliver it in a background thread once the
+    current transaction commits.
+    """
+    broadcast = Broadcast.objects.create(sender=sender, subject=subject, body=body)
+    transaction.on_commit(lambda: threading.Thread(
+        target=_deliver_in_background,
+        args=(broadcast.pk,),
+        name=f"broadcast-{broadcast.pk}",
+        daemon=True,
+    ).start())
+    return broadcast
@@ -0,0 +1,17 @@
+"""
+Signal handlers for the Messaging application.
+
+Deleting a chat, through the API, the admin or a user's cascade, takes its
+unread messages off the participants' unread totals.
+"""
+
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Chat
+from .services import forget_unread
+
+
+@receiver(pre_delete, sender=Chat)
+def forget_chat_unread(sender, instance, **kwargs):
+    forget_unread(instance)
@@ -1,3 +1,408 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest.mock import patch
+from rest_framework.test import APIClient
+
+from accounts.models import MarketUser
+from agrario_backend.events import LocalBroker
+from agrario_backend.sse import issue_ticket, redeem_ticket, stream
+from agrario_backend.testing import QueryBudgetTestMixin
+from .models import Broadcast, Chat, Message, UnreadCounter
+from .serializers import MessageSerializer
+from .services import _deliver_chunk, deliver_broadcast, record_unread, unread_total
+
+
+class ChatQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        self.client.force_authenticate(user=self.user)
+
+        for index in range(5):
+            support = MarketUser.objects.create_user(
+                email=f"support{index}@example.com",
+                password="password123",
+                is_superuser=True,
+            )
+            chat = Chat.objects.create(user1=self.user, user2=support)
+            Message.objects.create(
+                chat=chat, sender=self.user, subject="Sonstiges", body="Hello")
+
+        self.replied_chat = Chat.objects.get(user2__email="support2@example.com")
+        reply = Message.objects.create(
+            chat=self.replied_chat, sender=self.replied_chat.user2,
+            subject="Sonstiges", body="Thanks, we are on it. " * 10)
+        record_unread([reply])
+
+    def test_my_chats_is_within_budget(self):
+        response = self.client.get("/api/messaging/chats/my-chats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertWithinQueryBudget(response)
+
+        newest = response.data[0]
+        self.assertEqual(newest["identifier"], str(self.replied_chat.identifier))
+        self.assertEqual(newest["messages_count"], 2)
+        self.assertEqual(newest["unread_count"], 1)
+        self.assertEqual(len(newest["last_message"]["snippet"]), 100)
+        self.assertEqual(response.data[1]["unread_count"], 0)
+        self.assertEqual(response.data[1]["last_message"]["snippet"], "Hello")
+
+
+class SupportFanOutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_support(self, count):
+        for _ in range(count):
+            index = MarketUser.objects.count()
+            MarketUser.objects.create_user(
+                email=f"support{index}@example.com",
+                password="password123",
+                is_superuser=True,
+            )
+
+    def send(self):
+        return self.client.post(
+            "/api/messaging/messages/", {"subject": "Sonstiges", "body": "Hello"})
+
+    def test_message_reaches_every_support_chat(self):
+        self.add_support(3)
+
+        self.assertEqual(self.send().status_code, 201)
+        self.assertEqual(self.send().status_code, 201)
+
+        self.assertEqual(Chat.objects.filter(user1=self.user).count(), 3)
+        self.assertEqual(Message.objects.filter(sender=self.user).count(), 6)
+
+    def test_query_count_does_not_grow_with_support_team(self):
+        self.add_support(2)
+        with CaptureQueriesContext(connection) as small_team:
+            self.send()
+
+        self.add_support(8)
+        Chat.objects.all().delete()
+        with CaptureQueriesContext(connection) as large_team:
+            self.send()
+
+        self.assertEqual(len(large_team), len(small_team))
+        self.assertEqual(Message.objects.filter(sender=self.user).count(), 10)
+
+
+class BroadcastDeliveryTests(TestCase):
+    def setUp(self):
+        self.admin = MarketUser.objects.create_user(
+            email="admin@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+        for index in range(5):
+            MarketUser.objects.create_user(
+                email=f"user{index}@example.com",
+                password="password123",
+                role="landowner",
+            )
+
+    def test_broadcast_is_queued_and_not_delivered_in_request(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post(
+                "/api/messaging/messages/broadcast/", {"subject": "News", "body": "Hello"})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], Broadcast.PENDING)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Message.objects.exists())
+
+    def test_delivery_in_chunks_tracks_progress(self):
+        broadcast = Broadcast.objects.create(sender=self.admin, subject="News", body="Hello")
+
+        broadcast = deliver_broadcast(broadcast, chunk_size=2)
+
+        self.assertEqual(broadcast.status, Broadcast.DELIVERED)
+        self.assertEqual(broadcast.total_recipients, 5)
+        self.assertEqual(broadcast.delivered_count, 5)
+        self.assertEqual(Message.objects.filter(broadcast=broadcast).count(), 5)
+        self.assertEqual(Chat.objects.filter(user2=self.admin).count(), 5)
+
+    def test_interrupted_delivery_resumes(self):
+        broadcast = Broadcast.objects.create(sender=self.admin, subject="News", body="Hello")
+        calls = []
+
+        def fail_on_second_chunk(broadcast, user_ids):
+            calls.append(user_ids)
+            if len(calls) == 2:
+                raise RuntimeError("Worker stopped.")
+            _deliver_chunk(broadcast, user_ids)
+
+        with patch("messaging.services._deliver_chunk", side_effect=fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                deliver_broadcast(broadcast, chunk_size=2)
+
+        broadcast.refresh_from_db()
+        self.assertEqual(broadcast.status, Broadcast.FAILED)
+        self.assertEqual(broadcast.delivered_count, 2)
+
+        broadcast = deliver_broadcast(broadcast, chunk_size=2)
+        self.assertEqual(broadcast.status, Broadcast.DELIVERED)
+        self.assertEqual(broadcast.delivered_count, 5)
+        self.assertEqual(Message.objects.filter(broadcast=broadcast).count(), 5)
+
+    def test_command_resumes_only_stale_deliveries(self):
+        stale = Broadcast.objects.create(
+            sender=self.admin, subject="Stale", body="Hello", status=Broadcast.DELIVERING)
+        active = Broadcast.objects.create(
+            sender=self.admin, subject="Active", body="Hello", status=Broadcast.DELIVERING)
+        Broadcast.objects.filter(pk=stale.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+
+        call_command("deliver_broadcasts", stdout=StringIO())
+
+        stale.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(stale.status, Broadcast.DELIVERED)
+        self.assertEqual(Message.objects.filter(broadcast=stale).count(), 5)
+        self.assertEqual(active.status, Broadcast.DELIVERING)
+        self.assertFalse(Message.objects.filter(broadcast=active).exists())
+
+    def test_worker_keeps_running_after_a_failed_pass(self):
+        broadcast = Broadcast.objects.create(
+            sender=self.admin, subject="News", body="Hello", status=Broadcast.FAILED)
+        command = "messaging.management.commands.deliver_broadcasts"
+
+        with patch(f"{command}.claim_resumable_broadcasts",
+                   side_effect=[RuntimeError("Database unavailable."), [broadcast]]), \
+                patch(f"{command}.time.sleep", side_effect=[None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("deliver_broadcasts", interval=60, stdout=StringIO(), stderr=StringIO())
+
+        broadcast.refresh_from_db()
+        self.assertEqual(broadcast.status, Broadcast.DELIVERED)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        self.support = MarketUser.objects.create_user(
+            email="support@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(user=self.user)
+        self.support_client = APIClient()
+        self.support_client.force_authenticate(user=self.support)
+
+    def test_counters_follow_sending_and_reading(self):
+        for _ in range(2):
+            self.user_client.post(
+                "/api/messaging/messages/", {"subject": "Sonstiges", "body": "Hello"})
+        chat = Chat.objects.get(user1=self.user, user2=self.support)
+
+        self.assertEqual(unread_total(self.support), 2)
+        self.assertEqual(unread_total(self.user), 0)
+        self.assertEqual(UnreadCounter.objects.get(user=self.support, chat=chat).count, 2)
+
+        response = self.support_client.patch(
+            f"/api/messaging/messages/{chat.identifier}/mark-as-read/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(unread_total(self.support), 0)
+        self.assertFalse(Message.objects.filter(is_read=False).exists())
+
+    def test_unread_count_is_a_single_lookup(self):
+        self.support_client.post(
+            "/api/messaging/messages/admin-message/",
+            {"recipient_id": str(self.user.pk), "body": "Welcome"})
+
+        with self.assertNumQueries(1):
+            response = self.user_client.get("/api/messaging/messages/unread-count/")
+        self.assertEqual(response.data["unread_count"], 1)
+
+        message = Message.objects.get()
+        self.user_client.get(f"/api/messaging/messages/{message.pk}/")
+        self.assertEqual(unread_total(self.user), 0)
+
+    def test_deleting_a_chat_takes_its_unread_messages_off_the_total(self):
+        self.user_client.post(
+            "/api/messaging/messages/", {"subject": "Sonstiges", "body": "Hello"})
+        chat = Chat.objects.get(user1=self.user, user2=self.support)
+
+        response = self.support_client.delete(f"/api/messaging/chats/{chat.identifier}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(unread_total(self.support), 0)
+
+    def test_serializer_created_messages_are_counted(self):
+        chat = Chat.objects.create(user1=self.user, user2=self.support)
+        serializer = MessageSerializer(data={"subject": "Sonstiges", "body": "Hi"})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save(chat=chat, sender=self.user)
+
+        self.assertEqual(unread_total(self.support), 1)
+
+
+class EventPushTests(TestCase):
+    def setUp(self):
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        self.support = MarketUser.objects.create_user(
+            email="support@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+
+    @patch("messaging.services.publish")
+    def test_new_message_is_pushed_after_commit(self, mock_publish):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post("/api/messaging/messages/", {"subject": "Sonstiges", "body": "Hello"})
+
+        events = {call.args[1]: call.args for call in mock_publish.call_args_list}
+        self.assertEqual(events["message"][0], self.support.pk)
+        self.assertEqual(events["message"][2]["body"], "Hello")
+        self.assertEqual(events["unread"][2], {"unread_count": 1})
+
+    def test_stream_delivers_published_events(self):
+        broker = LocalBroker()
+
+        async def receive():
+            subscription = broker.subscribe(self.user.pk)
+            with patch("agrario_backend.sse.get_broker", return_value=broker):
+                events = stream(subscription)
+                await anext(events)  # retry hint
+                broker.publish(self.user.pk, "unread", {"unread_count": 3})
+                broker.publish(self.support.pk, "unread", {"unread_count": 9})
+                chunk = await anext(events)
+                await events.aclose()
+            return chunk
+
+        chunk = asyncio.run(receive())
+        self.assertEqual(chunk, 'event: unread\ndata: {"unread_count": 3}\n\n')
+        self.assertFalse(broker._subscriptions)
+
+    def test_stream_ticket_is_single_use(self):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post("/api/events/ticket/")
+        self.assertEqual(response.status_code, 200)
+        ticket = response.data["ticket"]
+        self.assertNotIn("Bearer", ticket)
+
+        self.assertEqual(redeem_ticket(ticket), self.user)
+        self.assertIsNone(redeem_ticket(ticket))
+        self.assertIsNone(redeem_ticket(ticket + "x"))
+
+    @override_settings(EVENTS_TICKET_TTL=-1)
+    def test_expired_stream_ticket_is_refused(self):
+        self.assertIsNone(redeem_ticket(issue_ticket(self.user)))
+
+
+class ConversationPaginationTests(TestCase):
+    def setUp(self):
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        support = MarketUser.objects.create_user(
+            email="support@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+        self.chat = Chat.objects.create(user1=self.user, user2=support)
+        for index in range(5):
+            Message.objects.create(
+                chat=self.chat, sender=self.user, subject="Sonstiges", body=f"Message {index}")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_newest_first_with_older_pages(self):
+        url = f"/api/messaging/messages/{self.chat.identifier}/conversation/?page_size=2"
+
+        first = self.client.get(url)
+        self.assertEqual([m["body"] for m in first.data["results"]], ["Message 4", "Message 3"])
+
+        older = self.client.get(first.data["next"])
+        self.assertEqual([m["body"] for m in older.data["results"]], ["Message 2", "Message 1"])
+
+    def test_other_users_cannot_read_the_chat(self):
+        stranger = MarketUser.objects.create_user(
+            email="stranger@example.com", password="password123", role="developer")
+        self.client.force_authenticate(user=stranger)
+
+        response = self.client.get(f"/api/messaging/messages/{self.chat.identifier}/conversation/")
+        self.assertEqual(response.status_code, 404)
+
+
+class MessageSearchTests(TestCase):
+    """
+    Needs PostgreSQL: the search vector is filled by a database trigger.
+    """
+
+    def setUp(self):
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        support = MarketUser.objects.create_user(
+            email="support@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+        chat = Chat.objects.create(user1=self.user, user2=support)
+        Message.objects.create(
+            chat=chat, sender=self.user, subject="Sonstiges",
+            body="Wann wird die Anlage auf meinem Flurstück gebaut?")
+        Message.objects.create(
+            chat=chat, sender=self.user, subject="Angebot erstellen",
+            body="Ich möchte ein Angebot für meine Fläche erstellen.")
+        self.client = APIClient()
+
+    def test_search_matches_word_forms(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get("/api/messaging/messages/search/", {"q": "Anlagen"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+        self.assertIn("Flurstück", response.data["results"][0]["body"])
+
+    def test_search_is_limited_to_own_chats(self):
+        stranger = MarketUser.objects.create_user(
+            email="stranger@example.com", password="password123", role="developer")
+        self.client.force_authenticate(user=stranger)
+
+        response = self.client.get("/api/messaging/messages/search/", {"q": "Angebot"})
+        self.assertEqual(response.data["count"], 0)
@@ -1,14 +1,25 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import serializers
-from .models import Message, Chat, Attachment
-from .serializers import MessageSerializer, ChatSerializer
+from .models import Broadcast, Message, Chat, Attachment, UnreadCounter
+from .serializers import BroadcastSerializer, MessageSerializer, ChatSerializer
+from .services import (
+    create_message,
+    mark_chat_read,
+    mark_message_read,
+    search_messages,
+    send_to_support,
+    start_broadcast,
+    unread_total,
+)
 from rest_framework import status, viewsets
-from django.db import models
-from django.db.models import Q, Max, Count
+from django.db import models, transaction
+from django.db.models import Q, Max, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
 from accounts.models import MarketUser
+from agrario_backend.query_budget import query_budget
 import uuid
 import logging
 from rest_framework.exceptions import ValidationError, PermissionDenied
@@ -23,57 +34,145 @@ class ChatViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Return chats associated with the authenticated user.
+        Return chats associated with the authenticated user, with their
+        message and unread counts and a preview of the last message, newest
+        activity first.
         """
         user = self.request.user
-        return Chat.objects.filter(models.Q(user1=user) | models.Q(user2=user))
+        messages = Message.objects.filter(chat=OuterRef("pk"))
+        last_message = messages.order_by("-created_at")
+        return (
+            Chat.objects.filter(models.Q(user1=user) | models.Q(user2=user))
+            .select_related("user1", "user2")
+            .annotate(
+                messages_count=Coalesce(
+                    Subquery(messages.values("chat").annotate(total=Count("pk")).values("total")),
+                    0,
+                ),
+                unread_count=Coalesce(
+                    Subquery(
+                        UnreadCounter.objects.filter(chat=OuterRef("pk"), user=user)
+                        .values("count")[:1]
+                    ),
+                    0,
+                ),
+                last_message_subject=Subquery(last_message.values("subject")[:1]),
+                last_message_snippet=Subquery(
+                    last_message.annotate(
+                        snippet=Substr("body", 1, ChatSerializer.SNIPPET_LENGTH)
+                    ).values("snippet")[:1]
+                ),
+                last_message_at=Subquery(last_message.values("created_at")[:1]),
+            )
+            .order_by(F("last_message_at").desc(nulls_last=True), "-created_at")
+        )
 
     @action(detail=False, methods=['get'], url_path='my-chats')
+    @query_budget(1)
     def my_chats(self, request):
         """
-        Retrieve all chats for the logged-in user.
+        Retrieve the inbox of the logged-in user in one query.
         """
         chats = self.get_queryset()
         serializer = self.get_serializer(chats, many=True)
         return Response(serializer.data)
 
 
+class ConversationPagination(CursorPagination):
+    """
+    Newest messages first; the `next` link loads older ones.
+    """
+    ordering = "-created_at"
+    page_size = 30
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class MessageSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
 class MessageViewSet(viewsets.ModelViewSet):
-    queryset = Message.objects.all()
+    queryset = Message.objects.order_by("created_at")
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        sender = self.request.user
-        agrario_support = MarketUser.objects.filter(is_superuser=True)
+        """
+        Send the message to every Agrario Support account at once.
+        """
+        data = serializer.validated_data
 
-        for acc in agrario_support:
-            # Ensure chat is created between the sender and Agrario Support
-            chat, created = Chat.objects.get_or_create(
-                user1=sender, user2=acc)
-            # Save the message and pass the chat explicitly
-            serializer.save(sender=sender, chat=chat)
+        # Attachments uploaded through an upload session of this user.
+        attachment_ids = set(data.get("attachment_ids", []))
+        attachments = []
+        if attachment_ids:
+            attachments = list(Attachment.objects.filter(
+                pk__in=attachment_ids,
+                upload_session__user=self.request.user,
+            ))
+            if len(attachments) != len(attachment_ids):
+                raise ValidationError({"attachment_ids": "Unknown attachment."})
+
+        messages = send_to_support(
+            sender=self.request.user,
+            subject=data.get("subject", Message._meta.get_field("subject").default),
+            body=data["body"],
+            attachment_files=data.get("attachment_files", []),
+            attachments=attachments,
+        )
+        if not messages:
+            raise ValidationError({"error": "No support account is available."})
+
+        # The copies only differ in their chat; respond with the first one.
+        serializer.instance = messages[0]
 
     @action(detail=True, methods=['get'], url_path='conversation')
     def get_conversation(self, request, pk=None):
         """
-        Retrieve all messages in the same chat.
+        Retrieve the messages of a chat, newest first, one page at a time.
+        Follow `next` to load older messages.
         """
         user = request.user
-        chat = Chat.objects.filter(identifier=pk).first()
+        chat = Chat.objects.filter(
+            Q(user1=user) | Q(user2=user), identifier=pk).first()
         if not chat:
             return Response({"error": "Chat not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        messages = Message.objects.filter(chat=chat).order_by('created_at')
-        serializer = self.get_serializer(messages, many=True)
-        return Response(serializer.data)
+        messages = (
+            Message.objects.filter(chat=chat)
+            .select_related("sender")
+            .prefetch_related("attachments")
+        )
+        paginator = ConversationPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Full-text search over the messages visible to the user.
+
+        `?q=` takes web search syntax: words, "quoted phrases", `or`, `-word`.
+        """
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = MessageSearchPagination()
+        page = paginator.paginate_queryset(search_messages(request.user, text), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def destroy(self, request, *args, **kwargs):
         """
         Archive a message instead of deleting it.
         """
         instance = self.get_object()
-        if instance.recipient != request.user:
+        if instance.recipient_id != request.user.pk:
             return Response({"error": "You cannot delete this message."}, status=status.HTTP_403_FORBIDDEN)
 
         instance.archived = True
@@ -85,8 +184,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         Get the count of unread messages for the logged-in user.
         """
-        user = self.request.user
-        count = Message.objects.filter(recipient=user, is_read=False).count()
+        count = unread_total(request.user)
         return Response({"unread_count": count}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['patch'], url_path='mark-as-read')
@@ -95,13 +193,12 @@ class MessageViewSet(viewsets.ModelViewSet):
         Mark all messages in a chat as read.
         """
         user = request.user
-        chat = Chat.objects.filter(identifier=pk).first()
+        chat = Chat.objects.filter(
+            Q(user1=user) | Q(user2=user), identifier=pk).first()
         if not chat:
             return Response({"error": "Chat not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Mark messages as read
-        Message.objects.filter(chat=chat, recipient=user,
-                               is_read=False).update(is_read=True)
+        mark_chat_read(user, chat)
         return Response({"message": "Messages marked as read."}, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
@@ -109,12 +206,9 @@ class MessageViewSet(viewsets.ModelViewSet):
         Retrieve a single message and mark it as read if the authenticated user is part of the chat.
         """
         instance = self.get_object()
-        user = request.user
 
-        # Mark the message as read only if the user is part of the chat
-        if (instance.chat.user1 == user or instance.chat.user2 == user) and not instance.is_read:
-            instance.is_read = True
-            instance.save(update_fields=["is_read"])
+        # Only the recipient reads a message.
+        mark_message_read(request.user, instance)
 
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -138,13 +232,17 @@ class MessageViewSet(viewsets.ModelViewSet):
         if not recipient:
             return Response({"error": "Recipient not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        message = Message.objects.create(
-            sender=request.user,
-            recipient=recipient,
-            subject=subject,
-            body=body,
-            is_admin_message=True
-        )
+        with transaction.atomic():
+            chat = Chat.objects.filter(user1=recipient, user2=request.user).first()
+            if not chat:
+                chat = Chat.objects.create(user1=recipient, user2=request.user)
+            message = create_message(
+                chat=chat,
+                sender=request.user,
+                subject=subject,
+                body=body,
+                is_admin_message=True
+            )
 
         return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
 
@@ -152,6 +250,9 @@ class MessageViewSet(viewsets.ModelViewSet):
     def broadcast_message(self, request):
         """
         Allow superusers to send a broadcast message to all users.
+
+        The broadcast is stored once and delivered in the background; poll
+        `broadcast/<identifier>/` for the progress.
         """
         if not request.user.is_superuser:
             raise PermissionDenied(
@@ -160,19 +261,21 @@ class MessageViewSet(viewsets.ModelViewSet):
         subject = request.data.get("subject", "Broadcast Message")
         body = request.data.get("body", "")
 
-        # Retrieve all users
-        users = MarketUser.objects.all()
-        messages = [
-            Message(
-                sender=request.user,
-                recipient=user,
-                subject=subject,
-                body=body,
-                is_admin_message=True
-            )
-            for user in users
-        ]
+        broadcast = start_broadcast(request.user, subject, body)
+
+        return Response(BroadcastSerializer(broadcast).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'broadcast/(?P<broadcast_id>[^/.]+)')
+    def broadcast_status(self, request, broadcast_id=None):
+        """
+        Report the delivery progress of a broadcast.
+        """
+        if not request.user.is_superuser:
+            raise PermissionDenied(
+                "Only superusers can view broadcasts.")
 
-        Message.objects.bulk_create(messages)
+        broadcast = Broadcast.objects.filter(identifier=broadcast_id).first()
+        if not broadcast:
+            return Response({"error": "Broadcast not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({"message": "Broadcast sent successfully."}, status=status.HTTP_201_CREATED)
+        return Response(BroadcastSerializer(broadcast).data, status=status.HTTP_200_OK)
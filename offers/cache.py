@@ -0,0 +1,185 @@
+"""
+Versioned cache of serialized offer payloads.
+
+Serialized `AreaOffer` and `AreaOfferConfirmation` payloads are cached per
+object under a version token. The token is replaced whenever the object or
+anything nested in its payload changes (see `offers.signals`), so stale
+fragments are never read again and simply expire. Fragments are fetched
+with `get_many`, which lets list endpoints assemble a page from cached
+per-offer payloads and only serialize the misses.
+"""
+
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "offers"
+OFFER = "offer"
+CONFIRMATION = "confirmation"
+STAT_KINDS = (OFFER, CONFIRMATION)
+
+
+def _version_key(kind, pk):
+    return f"{KEY_PREFIX}:version:{kind}:{pk}"
+
+
+def _fragment_key(kind, pk, version, variant):
+    return f"{KEY_PREFIX}:fragment:{kind}:{pk}:{version}:{variant}"
+
+
+def _stat_key(kind, outcome):
+    return f"{KEY_PREFIX}:stats:{kind}:{outcome}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_version(kind, pk):
+    """
+    Invalidate all cached fragments of one object.
+    """
+    if pk is None:
+        return
+    cache.set(_version_key(kind, pk), _new_version(), timeout=None)
+
+
+def get_versions(kind, pks):
+    """
+    Return the current version token of each object, creating missing ones.
+    """
+    keys = {pk: _version_key(kind, pk) for pk in pks}
+    found = cache.get_many(keys.values())
+
+    versions = {}
+    for pk, key in keys.items():
+        if key not in found:
+            # `add` keeps a token another process stored in the meantime.
+            cache.add(key, _new_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[pk] = found[key]
+    return versions
+
+
+def _record(kind, hits, misses):
+    for outcome, count in (("hits", hits), ("misses", misses)):
+        if not count:
+            continue
+        key = _stat_key(kind, outcome)
+        if not cache.add(key, count, timeout=None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, timeout=None)
+
+
+def get_fragments(kind, pks, variant, build):
+    """
+    Return the cached payload for each pk, in order.
+
+    Args:
+        kind (str): Fragment kind, e.g. `OFFER`.
+        pks (list): Primary keys of the objects.
+        variant (str): Anything besides the object that shapes the payload.
+        build (callable): Called with the missing pks, returns `{pk: payload}`.
+    """
+    pks = list(pks)
+    if not pks:
+        return []
+
+    versions = get_versions(kind, pks)
+    keys = {pk: _fragment_key(kind, pk, versions[pk], variant) for pk in pks}
+    cached = cache.get_many(keys.values())
+
+    missing = [pk for pk in pks if keys[pk] not in cached]
+    _record(kind, hits=len(pks) - len(missing), misses=len(missing))
+
+    built = build(missing) if missing else {}
+    if built:
+        cache.set_many(
+            {keys[pk]: payload for pk, payload in built.items()},
+            timeout=settings.OFFER_FRAGMENT_CACHE_TIMEOUT,
+        )
+
+    return [cached[keys[pk]] if keys[pk] in cached else built[pk] for pk in pks]
+
+
+def get_stats():
+    """
+    Hit/miss counters per fragment kind.
+    """
+    keys = [_stat_key(kind, outcome) for kind in STAT_KINDS for outcome in ("hits", "misses")]
+    values = cache.get_many(keys)
+
+    stats = {}
+    for kind in STAT_KINDS:
+        hits = values.get(_stat_key(kind, "hits"), 0)
+        misses = values.get(_stat_key(kind, "misses"), 0)
+        total = hits + misses
+        stats[kind] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def _request_variant(request, *parts):
+    """
+    Document URLs are absolute, so the host is part of every variant.
+    """
+    raw = ":".join([request.get_host() if request else "", *map(str, parts)])
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
+def offer_payloads(pks, request, include_geometry=True, fieldset=None):
+    """
+    Serialized `AreaOfferSerializer` payloads for the given offer pks.
+
+    `fieldset` paths are relative to the offer payload.
+    """
+    from agrario_backend.fieldsets import Fieldset
+    from .models import AreaOffer, Parcel
+    from .serializers import AreaOfferSerializer
+
+    fieldset = fieldset or Fieldset()
+
+    def build(missing):
+        offers = AreaOffer.objects.filter(pk__in=missing)
+        if fieldset.includes("parcels"):
+            parcels = Parcel.objects.all()
+            if not (include_geometry and fieldset.includes("parcels.polygon")):
+                parcels = parcels.defer("polygon")
+            offers = offers.prefetch_related(Prefetch("parcels", queryset=parcels))
+        if fieldset.includes("documented_offers"):
+            offers = offers.prefetch_related("documented_offers")
+
+        context = {"request": request, "fieldset": fieldset}
+        data = AreaOfferSerializer(offers, many=True, context=context).data
+        return {offer.pk: payload for offer, payload in zip(offers, data)}
+
+    variant = _request_variant(request, int(include_geometry), fieldset.cache_key())
+    return get_fragments(OFFER, pks, variant, build)
+
+
+def confirmation_payloads(confirmations, request):
+    """
+    Serialized `AreaOfferConfirmationSerializer` payloads for confirmations.
+    """
+    from .serializers import AreaOfferConfirmationSerializer
+
+    by_pk = {confirmation.pk: confirmation for confirmation in confirmations}
+
+    def build(missing):
+        instances = [by_pk[pk] for pk in missing]
+        data = AreaOfferConfirmationSerializer(
+            instances, many=True, context={"request": request}).data
+        return {instance.pk: payload for instance, payload in zip(instances, data)}
+
+    return get_fragments(CONFIRMATION, list(by_pk), "", build)
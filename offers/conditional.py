@@ -0,0 +1,62 @@
+"""
+Conditional GET for collection endpoints.
+
+The validators of a listing are derived from a cheap collection state
+instead of the response body: one aggregate query per queryset for the row
+count and the newest `updated_at`. The state lives in the database, so
+every worker derives the same ETag after a write. A matching
+`If-None-Match` is answered with 304 before the queryset is serialized.
+
+No Last-Modified is sent: deleting a row doesn't move the newest
+`updated_at`, so a client revalidating with `If-Modified-Since` alone would
+keep the deleted row.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def collection_etag(request, get_querysets):
+    """
+    Return the ETag of a collection, computed once per request.
+
+    A change to a row bumps its `updated_at`; a deleted row lowers the count.
+    """
+    etag = getattr(request, "_collection_etag", None)
+    if etag is not None:
+        return etag
+
+    summaries = [
+        get_queryset(request).aggregate(latest=Max("updated_at"), total=Count("pk"))
+        for get_queryset in get_querysets
+    ]
+    # The query string selects the representation (filters, fieldsets).
+    raw = ":".join([
+        request.get_full_path(),
+        *(
+            f"{summary['total']}@{summary['latest'].isoformat() if summary['latest'] else ''}"
+            for summary in summaries
+        ),
+    ])
+    etag = hashlib.md5(raw.encode()).hexdigest()
+    request._collection_etag = etag
+    return etag
+
+
+def collection_condition(*get_querysets):
+    """
+    Decorate a view method with ETag handling.
+
+    Args:
+        get_querysets (callable): Each called with the request, returns rows
+            the response is built from or depends on. The models need an
+            `updated_at` field with `auto_now`.
+    """
+
+    def etag(request, *args, **kwargs):
+        return collection_etag(request, get_querysets)
+
+    return method_decorator(condition(etag_func=etag))
@@ -0,0 +1,143 @@
+"""Geometry helpers for the Offers application.
+
+Builds parcel geometries from the coordinate formats accepted by the API and
+computes their areas in batch using NumPy instead of per-geometry transforms.
+"""
+
+import numpy as np
+from django.contrib.gis.geos import MultiPolygon, Polygon
+
+# Radius used by EPSG:3857 (Web Mercator), matching `geom.transform(3857)`.
+WEB_MERCATOR_RADIUS = 6378137.0
+# Web Mercator is undefined at the poles; clamp like PostGIS/PROJ do.
+WEB_MERCATOR_MAX_LATITUDE = 85.06
+
+
+def points_to_ring(points):
+    """
+    Convert a list of `{lat, lng}` dicts into a closed `[lng, lat]` ring.
+
+    Args:
+        points (list[dict]): Points as sent by the frontend.
+
+    Returns:
+        list[list[float]]: The ring in GeoJSON order, closed if needed.
+    """
+    ring = [[point["lng"], point["lat"]] for point in points]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def close_ring(ring):
+    """
+    Return the ring closed (first point == last point).
+    """
+    ring = [list(point[:2]) for point in ring]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def geojson_to_polygons(geometry):
+    """
+    Normalize a GeoJSON `Polygon` or `MultiPolygon` dict to a list of polygons.
+
+    Each polygon is a list of closed rings, the first ring being the exterior.
+
+    Raises:
+        ValueError: If the geometry type is not supported or rings are empty.
+    """
+    if not isinstance(geometry, dict):
+        raise ValueError("Geometry must be a GeoJSON object.")
+
+    geom_type = geometry.get("type")
+    coordinates = geometry.get("coordinates")
+    if geom_type == "Polygon":
+        polygons = [coordinates]
+    elif geom_type == "MultiPolygon":
+        polygons = coordinates
+    else:
+        raise ValueError(f"Unsupported geometry type: {geom_type}.")
+
+    if not polygons:
+        raise ValueError("Geometry has no coordinates.")
+
+    normalized = []
+    for rings in polygons:
+        if not rings:
+            raise ValueError("Polygon has no rings.")
+        closed = [close_ring(ring) for ring in rings]
+        if any(len(ring) < 4 for ring in closed):
+            raise ValueError("Polygon rings need at least three distinct points.")
+        normalized.append(closed)
+    return normalized
+
+
+def build_multipolygon(polygons, srid=4326):
+    """
+    Build a GEOS MultiPolygon directly from ring coordinates.
+
+    Constructing GEOS objects from coordinate sequences avoids serializing to
+    GeoJSON and parsing it back for every parcel.
+    """
+    return MultiPolygon(
+        [Polygon(*[tuple(map(tuple, ring)) for ring in rings]) for rings in polygons],
+        srid=srid,
+    )
+
+
+def web_mercator_areas(geometries):
+    """
+    Compute the EPSG:3857 planar area of many geometries in one pass.
+
+    The result matches `geom.transform(3857); geom.area` for lat/lng input,
+    but all rings of all geometries are projected and reduced as one array.
+
+    Args:
+        geometries (list[list[list[ring]]]): For each geometry, its polygons as
+            returned by `geojson_to_polygons`.
+
+    Returns:
+        numpy.ndarray: Area in square meters for each geometry.
+    """
+    coords = []
+    ring_lengths = []
+    ring_owner = []
+    ring_sign = []
+
+    for index, polygons in enumerate(geometries):
+        for rings in polygons:
+            for ring_index, ring in enumerate(rings):
+                coords.extend(ring)
+                ring_lengths.append(len(ring))
+                ring_owner.append(index)
+                # Exterior rings add area, holes subtract it.
+                ring_sign.append(1.0 if ring_index == 0 else -1.0)
+
+    if not coords:
+        return np.zeros(len(geometries))
+
+    points = np.asarray(coords, dtype=np.float64)
+    lng = np.radians(points[:, 0])
+    lat = np.radians(
+        np.clip(points[:, 1], -WEB_MERCATOR_MAX_LATITUDE, WEB_MERCATOR_MAX_LATITUDE)
+    )
+    x = WEB_MERCATOR_RADIUS * lng
+    y = WEB_MERCATOR_RADIUS * np.log(np.tan(np.pi / 4 + lat / 2))
+
+    # Shoelace terms between consecutive points. Rings are closed, so the
+    # cross term spanning two rings is masked out below.
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    ring_starts = np.concatenate(([0], np.cumsum(ring_lengths)[:-1]))
+    ring_ends = ring_starts + np.asarray(ring_lengths) - 1
+    mask = np.ones(len(cross), dtype=bool)
+    mask[ring_ends[:-1]] = False
+    cross = np.where(mask, cross, 0.0)
+
+    ring_areas = np.abs(np.add.reduceat(np.append(cross, 0.0), ring_starts)) / 2
+    return np.bincount(
+        ring_owner,
+        weights=ring_areas * np.asarray(ring_sign),
+        minlength=len(geometries),
+    )
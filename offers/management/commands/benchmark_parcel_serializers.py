@@ -0,0 +1,92 @@
+import json
+import time
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from offers.models import Parcel
+from offers.serializers import ParcelSerializer, ParcelValuesSerializer
+
+BENCHMARK_FEATURE_PREFIX = "benchmark-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares ParcelSerializer with the values-based ParcelValuesSerializer "
+        "on generated parcels. All rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+            help="Row counts to benchmark.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Runs per serializer and size; the fastest run is reported.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'rows':>8} {'ParcelSerializer':>18} {'values fast path':>18} {'speedup':>8}")
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                self.create_parcels(size)
+                queryset = Parcel.objects.filter(
+                    alkis_feature_id__startswith=BENCHMARK_FEATURE_PREFIX).order_by("id")
+
+                self.check_equivalence(queryset[:100])
+                model_time = self.time_run(
+                    lambda: ParcelSerializer(queryset, many=True).data, options["repeat"])
+                values_time = self.time_run(
+                    lambda: ParcelValuesSerializer(queryset).data, options["repeat"])
+
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{size:>8} {model_time:>17.3f}s {values_time:>17.3f}s "
+                f"{model_time / values_time:>7.1f}x"
+            )
+
+    def create_parcels(self, size):
+        parcels = []
+        for index in range(size):
+            lng = 7.0 + (index % 1000) * 0.001
+            lat = 51.0 + (index // 1000) * 0.001
+            polygon = Polygon.from_bbox((lng, lat, lng + 0.0009, lat + 0.0009))
+            parcels.append(Parcel(
+                alkis_feature_id=f"{BENCHMARK_FEATURE_PREFIX}{index}",
+                state_name="Nordrhein-Westfalen",
+                district_name="Dortmund",
+                municipality_name="Dortmund",
+                cadastral_area="Benchmark",
+                communal_district="Benchmark",
+                cadastral_parcel=str(index),
+                plot_number_main=str(index % 10000),
+                area_square_meters=10000,
+                polygon=MultiPolygon(polygon, srid=4326),
+            ))
+        Parcel.objects.bulk_create(parcels, batch_size=5000)
+
+    def check_equivalence(self, queryset):
+        expected = [dict(row) for row in ParcelSerializer(queryset, many=True).data]
+        actual = ParcelValuesSerializer(queryset).data
+
+        for row in expected + actual:
+            if row["polygon"]:
+                row["polygon"] = json.loads(row["polygon"])
+
+        if expected != actual:
+            self.stderr.write(self.style.ERROR(
+                "ParcelValuesSerializer output differs from ParcelSerializer."))
+
+    @staticmethod
+    def time_run(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("offers", "0002_parcel_analyse_plus"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="areaoffer",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("V", "In Vorbereitung"),
+                    ("P", "Vorprüfung abgeschlossen"),
+                    ("A", "Aktiv"),
+                    ("I", "Inaktiv"),
+                ],
+                db_index=True,
+                default="V",
+                max_length=2,
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("offers", "0003_alter_areaoffer_status"),
+        ("uploads", "0002_blob_uploadsession_sha256_uploadsession_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="areaofferdocuments",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="offer_documents",
+                to="uploads.blob",
+            ),
+        ),
+    ]
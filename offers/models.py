@@ -67,6 +67,7 @@ class Parcel(models.Model):
         appear_in_offer: Foreign key linking to an AreaOffer.
         created_by: User who created the parcel.
         created_at: Timestamp when the parcel was created.
+        updated_at: Timestamp of the last change to the parcel.
     """
 
     STATUS_CHOICES = [
@@ -103,6 +104,8 @@ class Parcel(models.Model):
         settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name="created_parcels"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the conditional GET validators of parcel listings.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     analyse_plus = models.BooleanField(default=False)
 
     def __str__(self):
@@ -144,13 +147,16 @@ class AreaOffer(models.Model):
         INACTIVE = "I", _("Inaktiv")
 
     status = models.CharField(
-        max_length=2, choices=OfferStatus.choices, default=OfferStatus.IN_PREPARATION
+        max_length=2, choices=OfferStatus.choices, default=OfferStatus.IN_PREPARATION,
+        db_index=True
     )
     hide_from_search = models.BooleanField(default=False)
     created_by = models.ForeignKey(
         MarketUser, on_delete=models.SET_NULL, null=True, related_name="area_offers"
     )
     available_from = models.DateField()
+    # Part of the conditional GET validators of listings with offers.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.offer_number:
@@ -207,6 +213,7 @@ class AreaOfferDocuments(models.Model):
     Attributes:
         offer: The offer to which this document belongs.
         document: The file uploaded for the offer.
+        blob: The deduplicated stored content of `document`.
         uploaded_at: The timestamp when the document was uploaded.
     """
 
@@ -214,6 +221,10 @@ class AreaOfferDocuments(models.Model):
         AreaOffer, on_delete=models.CASCADE, related_name="documented_offers"
     )
     document = models.FileField(upload_to="area_offer_documents/")
+    blob = models.ForeignKey(
+        "uploads.Blob", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="offer_documents"
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -3,8 +3,10 @@
 Defines serializers for Landuse, Parcel, AreaOffer, and related models.
 """
 
+from urllib.parse import urljoin, urlsplit
+
 from rest_framework import serializers
-from django.contrib.gis.geos import Polygon, MultiPolygon
+from django.contrib.gis.geos import Polygon
 from django.core.exceptions import ValidationError
 from django.contrib.gis.geos.error import GEOSException
 
@@ -20,9 +22,23 @@ from .models import (
 )
 from reports.models import Report
 import logging
-from django.contrib.gis.geos import GEOSGeometry, MultiPolygon
 from django.contrib.gis.gdal import SpatialReference, CoordTransform
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
+from django.conf import settings
+import numpy as np
+
+from agrario_backend.fieldsets import SparseFieldsetMixin
+from agrario_backend.renderers import geojson_fragment
+from . import cache
+from .signals import bump_after_commit
+from .geometry import (
+    build_multipolygon,
+    geojson_to_polygons,
+    points_to_ring,
+    web_mercator_areas,
+)
 
 logging.basicConfig(
     # Adjust level as needed (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -34,7 +50,20 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class GeoJSONFragmentField(GeometryField):
+    """
+    Geometry field that hands the GEOS GeoJSON to the renderer unparsed.
+    """
+
+    def to_representation(self, value):
+        if isinstance(value, dict) or value is None:
+            return value
+        return geojson_fragment(value)
+
+
 class ParcelGeoSerializer(GeoFeatureModelSerializer):
+    polygon = GeoJSONFragmentField()
+
     class Meta:
         model = Parcel
         fields = ('id', 'alkis_feature_id', 'state_name', 'district_name',
@@ -52,7 +81,7 @@ class LanduseSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class ParcelSerializer(serializers.ModelSerializer):
+class ParcelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     We'll make `polygon` read-only and define `polygon_coords`
     for the list of { lat, lng } points from the frontend.
@@ -101,6 +130,9 @@ class ParcelSerializer(serializers.ModelSerializer):
         Return a simple representation of the polygon if you want to
         show it in GET responses. For example, GeoJSON or WKT.
         """
+        # Listings defer the geometry column; don't load it row by row.
+        if "polygon" in obj.get_deferred_fields():
+            return None
         if obj.polygon:
             return obj.polygon.geojson  # or obj.polygon.wkt
         return None
@@ -112,38 +144,17 @@ class ParcelSerializer(serializers.ModelSerializer):
         polygon_coords = validated_data.pop("polygon_coords", None)
 
         if polygon_coords and isinstance(polygon_coords, list):
-            logger.info(f"Received polygon_coords: {polygon_coords}")
-
-            # Convert that array of { lat, lng } to a GeoJSON "Polygon"
-            ring = []
-            for point in polygon_coords:
-                # Each `point` is a dict: { "lat": ..., "lng": ... }
-                lat = point["lat"]
-                lng = point["lng"]
-                ring.append([lng, lat])  # GeoJSON order: [lng, lat]
-
-            # Close the ring if needed (first == last)
-            if ring and ring[0] != ring[-1]:
-                ring.append(ring[0])
-
-            polygon_geojson = {
-                "type": "Polygon",
-                "coordinates": [ring],  # single ring
-            }
-            logger.info(f"Constructed Polygon GeoJSON: {polygon_geojson}")
+            logger.debug("Received %d polygon_coords", len(polygon_coords))
 
             try:
-                geom = GEOSGeometry(str(polygon_geojson), srid=4326)
-                # If you want to calculate area in m², transform to WebMerc (EPSG:3857) or any projected SRID
-                if geom.geom_type == "Polygon":
-                    geom = MultiPolygon(geom, srid=geom.srid)
-                geom_3857 = geom.clone()
-                geom_3857.transform(3857)
-                area_sqm = geom_3857.area
-
-                validated_data["polygon"] = geom  # store in lat/lng
-                validated_data["area_square_meters"] = round(area_sqm, 2)
-            except Exception as e:
+                # Convert that array of { lat, lng } to a single closed ring
+                polygons = [[points_to_ring(polygon_coords)]]
+                geom = build_multipolygon(polygons)  # store in lat/lng
+                area_sqm = web_mercator_areas([polygons])[0]
+
+                validated_data["polygon"] = geom
+                validated_data["area_square_meters"] = round(float(area_sqm), 2)
+            except (KeyError, TypeError, ValueError, GEOSException) as e:
                 logger.error(
                     f"Error creating geometry from polygon_coords: {e}")
                 raise serializers.ValidationError({
@@ -173,6 +184,174 @@ class ParcelSerializer(serializers.ModelSerializer):
         return instance
 
 
+class ParcelValuesSerializer:
+    """
+    Read-only fast path for parcel listings.
+
+    Produces the same representation as `ParcelSerializer` without building
+    model instances or GEOS geometries: rows come from `.values_list()` and
+    the polygon is encoded to GeoJSON by PostGIS (`ST_AsGeoJSON`). The
+    polygon string is equivalent GeoJSON, but compact rather than the
+    spaced format GDAL emits.
+
+    Usage mirrors a serializer: `ParcelValuesSerializer(queryset).data`.
+    Pass a `Fieldset` to select only the requested columns; without
+    `polygon` the geometry column is not read at all.
+    """
+
+    # Model columns backing each output field, where the name differs.
+    columns = {
+        "appear_in_offer": "appear_in_offer_id",
+        "created_by": "created_by_id",
+        "polygon": "polygon_geojson",
+    }
+
+    def __init__(self, queryset, fieldset=None):
+        self.queryset = queryset
+        self.fields = [
+            field for field in ParcelSerializer.Meta.fields
+            if field != "polygon_coords" and (fieldset is None or fieldset.includes(field))
+        ]
+        # Reuse the model serializer's field so decimals format identically.
+        self.area_field = ParcelSerializer().fields["area_square_meters"]
+
+    def get_rows(self):
+        queryset = self.queryset
+        if "polygon" in self.fields:
+            queryset = queryset.annotate(
+                polygon_geojson=AsGeoJSON("polygon", precision=15))
+        columns = [self.columns.get(field, field) for field in self.fields]
+        # An empty `values_list()` would select every column.
+        return queryset.values_list(*(columns or ["pk"]))
+
+    @property
+    def data(self):
+        fields = self.fields
+        area_index = fields.index("area_square_meters") if "area_square_meters" in fields else None
+        to_decimal = self.area_field.to_representation
+
+        data = []
+        for row in self.get_rows():
+            item = dict(zip(fields, row))
+            if area_index is not None and row[area_index] is not None:
+                item["area_square_meters"] = to_decimal(row[area_index])
+            data.append(item)
+        return data
+
+
+class ParcelBulkCreateSerializer(serializers.Serializer):
+    """
+    Create many parcels in one request.
+
+    Accepts either a GeoJSON FeatureCollection, where each feature carries
+    the parcel attributes in `properties`, or a compact payload
+    `{"parcels": [{..., "coordinates": [[lng, lat], ...]}]}` with a single
+    ring per parcel. Geometries are built and measured in one pass and the
+    rows are inserted with `bulk_create`.
+    """
+
+    type = serializers.ChoiceField(
+        choices=["FeatureCollection"], required=False)
+    features = serializers.ListField(
+        child=serializers.DictField(), required=False)
+    parcels = serializers.ListField(
+        child=serializers.DictField(), required=False)
+
+    def validate(self, attrs):
+        if "features" in attrs:
+            if attrs.get("type") != "FeatureCollection":
+                raise serializers.ValidationError(
+                    {"type": "Expected a GeoJSON FeatureCollection."})
+            items = [
+                (feature.get("properties") or {}, feature.get("geometry"))
+                for feature in attrs["features"]
+            ]
+        elif "parcels" in attrs:
+            items = []
+            for parcel in attrs["parcels"]:
+                parcel = dict(parcel)
+                ring = parcel.pop("coordinates", None)
+                items.append((parcel, {"type": "Polygon", "coordinates": [ring]}))
+        else:
+            raise serializers.ValidationError(
+                "Provide either a FeatureCollection or a `parcels` list.")
+
+        if not items:
+            raise serializers.ValidationError("No parcels provided.")
+
+        max_parcels = settings.PARCEL_BULK_CREATE_MAX
+        if len(items) > max_parcels:
+            raise serializers.ValidationError(
+                f"At most {max_parcels} parcels can be created per request.")
+
+        # Validate all attributes with the regular parcel serializer.
+        properties = [item[0] for item in items]
+        attributes = ParcelSerializer(data=properties, many=True)
+        if not attributes.is_valid():
+            raise serializers.ValidationError({"parcels": attributes.errors})
+
+        geometry_errors = {}
+        geometries = []
+        for index, (_, geometry) in enumerate(items):
+            try:
+                geometries.append(geojson_to_polygons(geometry))
+            except (TypeError, ValueError) as e:
+                geometry_errors[index] = [str(e)]
+                geometries.append([])
+
+        # Range-check every coordinate of the batch at once.
+        points = [
+            point for polygons in geometries for rings in polygons
+            for ring in rings for point in ring
+        ]
+        try:
+            coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        except ValueError:
+            raise serializers.ValidationError(
+                {"geometry": ["Coordinates must be [lng, lat] pairs."]})
+        if ((np.abs(coords[:, 0]) > 180) | (np.abs(coords[:, 1]) > 90)).any():
+            raise serializers.ValidationError(
+                {"geometry": ["Coordinates must be [lng, lat] in EPSG:4326."]})
+
+        if geometry_errors:
+            raise serializers.ValidationError({"geometry": geometry_errors})
+
+        attrs["items"] = list(zip(attributes.validated_data, geometries))
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Insert all parcels with a single `bulk_create`.
+        """
+        items = validated_data["items"]
+        created_by = validated_data.get("created_by")
+        areas = web_mercator_areas([polygons for _, polygons in items])
+
+        parcels = []
+        for (attributes, polygons), area_sqm in zip(items, areas):
+            attributes.pop("polygon_coords", None)
+            try:
+                polygon = build_multipolygon(polygons)
+            except GEOSException as e:
+                logger.error(f"Error creating geometry in bulk create: {e}")
+                raise serializers.ValidationError({
+                    "polygon": ["Invalid polygon coordinates."]
+                })
+            parcels.append(Parcel(
+                **attributes,
+                polygon=polygon,
+                area_square_meters=round(float(area_sqm), 2),
+                created_by=created_by,
+            ))
+
+        created = Parcel.objects.bulk_create(parcels)
+
+        # bulk_create sends no post_save, so invalidate the offers here.
+        for offer_id in {parcel.appear_in_offer_id for parcel in created} - {None}:
+            bump_after_commit(cache.OFFER, offer_id)
+        return created
+
+
 class BasketItemSerializer(serializers.ModelSerializer):
     parcel = ParcelSerializer()
 
@@ -263,7 +442,7 @@ class ParcelDetailsSerializer(serializers.ModelSerializer):
         ]
 
 
-class AreaOfferDocumentsSerializer(serializers.ModelSerializer):
+class AreaOfferDocumentsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     document_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -272,13 +451,23 @@ class AreaOfferDocumentsSerializer(serializers.ModelSerializer):
         read_only_fields = ["uploaded_at"]
 
     def get_document_url(self, obj):
+        if not obj.document or not hasattr(obj.document, 'url'):
+            return None
+
+        url = obj.document.url
         request = self.context.get('request')
-        if obj.document and hasattr(obj.document, 'url'):
-            return request.build_absolute_uri(obj.document.url)
-        return None
+        if request is None or urlsplit(url).netloc:
+            # Cloud storage already returns absolute URLs.
+            return url
+
+        # Resolve the base URI once per serialization, not once per document.
+        base_uri = self.context.get('absolute_base_uri')
+        if base_uri is None:
+            base_uri = self.context['absolute_base_uri'] = request.build_absolute_uri('/')
+        return urljoin(base_uri, url)
 
 
-class AreaOfferSerializer(serializers.ModelSerializer):
+class AreaOfferSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     status_display = serializers.CharField(
         source="get_status_display", read_only=True)
     utilization_display = serializers.CharField(
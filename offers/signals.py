@@ -0,0 +1,77 @@
+"""
+Signal handlers for the Offers application.
+
+Bump the fragment cache versions in `offers.cache` whenever an offer or
+anything nested in its serialized payload changes. Versions are bumped after
+the transaction commits so a concurrent reader can't cache the old rows
+under the new version.
+
+Status changes of an offer are pushed to its creator as `offer_status`
+events.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from agrario_backend.events import publish_on_commit
+
+from . import cache
+from .models import AreaOffer, AreaOfferConfirmation, AreaOfferDocuments, Parcel
+
+
+def bump_after_commit(kind, pk):
+    transaction.on_commit(lambda: cache.bump_version(kind, pk))
+
+
+@receiver(post_save, sender=AreaOffer)
+@receiver(post_delete, sender=AreaOffer)
+def invalidate_offer(sender, instance, **kwargs):
+    bump_after_commit(cache.OFFER, instance.pk)
+
+
+@receiver(post_init, sender=AreaOffer)
+def remember_offer_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get("status")
+
+
+@receiver(post_save, sender=AreaOffer)
+def push_offer_status(sender, instance, created, **kwargs):
+    status = instance.__dict__.get("status")
+    if not created and status != instance._loaded_status and instance.created_by_id:
+        publish_on_commit(instance.created_by_id, "offer_status", {
+            "offer": instance.pk,
+            "offer_number": instance.offer_number,
+            "status": status,
+        })
+    instance._loaded_status = status
+
+
+@receiver(post_init, sender=Parcel)
+def remember_parcel_offer(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred column is never loaded here.
+    instance._loaded_offer_id = instance.__dict__.get("appear_in_offer_id")
+
+
+@receiver(post_save, sender=Parcel)
+@receiver(post_delete, sender=Parcel)
+def invalidate_parcel_offers(sender, instance, **kwargs):
+    offer_ids = {
+        getattr(instance, "_loaded_offer_id", None),
+        instance.__dict__.get("appear_in_offer_id"),
+    }
+    for offer_id in offer_ids - {None}:
+        bump_after_commit(cache.OFFER, offer_id)
+    instance._loaded_offer_id = instance.__dict__.get("appear_in_offer_id")
+
+
+@receiver(post_save, sender=AreaOfferDocuments)
+@receiver(post_delete, sender=AreaOfferDocuments)
+def invalidate_document_offer(sender, instance, **kwargs):
+    bump_after_commit(cache.OFFER, instance.offer_id)
+
+
+@receiver(post_save, sender=AreaOfferConfirmation)
+@receiver(post_delete, sender=AreaOfferConfirmation)
+def invalidate_confirmation(sender, instance, **kwargs):
+    bump_after_commit(cache.CONFIRMATION, instance.pk)
@@ -1,3 +1,519 @@
-from django.test import TestCase
+import gzip
+import json
+import math
+import time
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from accounts.cache import cache_user
+from accounts.firebase_auth import clear_token_cache
+from accounts.models import MarketUser
+from agrario_backend.fieldsets import Fieldset, SparseFieldsetMixin
+from agrario_backend.middleware import CompressionMiddleware
+from agrario_backend.testing import QueryBudgetTestMixin
+from . import cache as fragment_cache
+from .conditional import collection_condition, collection_etag
+from .geometry import build_multipolygon, geojson_to_polygons, points_to_ring, web_mercator_areas
+from .models import AreaOffer, AreaOfferConfirmation, Parcel, Watchlist
+from .serializers import ParcelBulkCreateSerializer, ParcelSerializer, ParcelValuesSerializer
+
+WEB_MERCATOR_RADIUS = 6378137.0
+
+
+def mercator_square_area(size_degrees):
+    """Area of a square with its south-west corner on (0, 0) in EPSG:3857."""
+    width = WEB_MERCATOR_RADIUS * math.radians(size_degrees)
+    height = WEB_MERCATOR_RADIUS * math.log(
+        math.tan(math.pi / 4 + math.radians(size_degrees) / 2))
+    return width * height
+
+
+class ParcelGeometryTests(SimpleTestCase):
+    def test_points_to_ring_closes_ring(self):
+        ring = points_to_ring([
+            {"lat": 0, "lng": 0},
+            {"lat": 0, "lng": 1},
+            {"lat": 1, "lng": 1},
+        ])
+        self.assertEqual(ring[0], ring[-1])
+        self.assertEqual(ring[1], [1, 0])
+
+    def test_batch_areas_match_web_mercator(self):
+        square = [[0, 0], [1, 0], [1, 1], [0, 1]]
+        holed = geojson_to_polygons({
+            "type": "Polygon",
+            "coordinates": [square, [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]],
+        })
+        multi = geojson_to_polygons({
+            "type": "MultiPolygon",
+            "coordinates": [[square], [square]],
+        })
+
+        areas = web_mercator_areas([
+            geojson_to_polygons({"type": "Polygon", "coordinates": [square]}),
+            holed,
+            multi,
+        ])
+
+        self.assertAlmostEqual(areas[0], mercator_square_area(1), places=2)
+        self.assertAlmostEqual(
+            areas[1], mercator_square_area(1) - mercator_square_area(0.5), places=2)
+        self.assertAlmostEqual(areas[2], 2 * mercator_square_area(1), places=2)
+
+    def test_unsupported_geometry_is_rejected(self):
+        with self.assertRaises(ValueError):
+            geojson_to_polygons({"type": "Point", "coordinates": [0, 0]})
+
+
+class FragmentCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.built = []
+
+    def build(self, pks):
+        self.built.append(list(pks))
+        return {pk: {"pk": pk} for pk in pks}
+
+    def test_fragments_compose_and_only_build_misses(self):
+        fragment_cache.get_fragments(fragment_cache.OFFER, [1, 2], "", self.build)
+        payloads = fragment_cache.get_fragments(
+            fragment_cache.OFFER, [2, 3, 1], "", self.build)
+
+        self.assertEqual(payloads, [{"pk": 2}, {"pk": 3}, {"pk": 1}])
+        self.assertEqual(self.built, [[1, 2], [3]])
+        stats = fragment_cache.get_stats()[fragment_cache.OFFER]
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+
+    def test_version_bump_invalidates_fragment(self):
+        fragment_cache.get_fragments(fragment_cache.OFFER, [1], "", self.build)
+        fragment_cache.bump_version(fragment_cache.OFFER, 1)
+        fragment_cache.get_fragments(fragment_cache.OFFER, [1], "", self.build)
+
+        self.assertEqual(self.built, [[1], [1]])
+
+
+class SparseParcelSerializer(SparseFieldsetMixin, serializers.Serializer):
+    id = serializers.IntegerField()
+    polygon = serializers.CharField()
+
+
+class SparseOfferSerializer(SparseFieldsetMixin, serializers.Serializer):
+    offer_number = serializers.IntegerField()
+    status = serializers.CharField()
+    parcels = SparseParcelSerializer(many=True)
+
+
+class SparseFieldsetTests(SimpleTestCase):
+    offer = {
+        "offer_number": 1,
+        "status": "active",
+        "parcels": [{"id": 1, "polygon": "{}"}],
+    }
+
+    def serialize(self, **fieldset):
+        return SparseOfferSerializer(
+            self.offer, context={"fieldset": Fieldset(**fieldset)}).data
+
+    def test_omit_nested_field(self):
+        data = self.serialize(omit={"parcels.polygon"})
+        self.assertEqual(data["parcels"], [{"id": 1}])
+        self.assertEqual(data["status"], "active")
+
+    def test_fields_select_per_level(self):
+        data = self.serialize(fields={"offer_number", "parcels.id"})
+        self.assertEqual(dict(data), {"offer_number": 1, "parcels": [{"id": 1}]})
+
+    def test_selecting_nested_serializer_keeps_all_of_its_fields(self):
+        data = self.serialize(fields={"parcels"})
+        self.assertEqual(list(data), ["parcels"])
+        self.assertEqual(data["parcels"], [{"id": 1, "polygon": "{}"}])
+
+
+@override_settings(
+    COMPRESSION_MIN_SIZE=200,
+    COMPRESSION_CONTENT_TYPES=("application/json",),
+    GZIP_COMPRESSLEVEL=6,
+    BROTLI_QUALITY=5,
+)
+class CompressionMiddlewareTests(SimpleTestCase):
+    payload = {"features": [{"coordinates": [7.4, 51.5]}] * 50}
+
+    def get(self, response, accept_encoding="gzip, deflate"):
+        middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_large_json_is_gzipped_with_weak_etag(self):
+        response = JsonResponse(self.payload)
+        response["ETag"] = '"abc"'
+        original = response.content
+
+        response = self.get(response)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), original)
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_small_and_non_json_responses_are_untouched(self):
+        small = self.get(JsonResponse({"ok": True}))
+        html = self.get(HttpResponse("x" * 1000, content_type="text/html"))
+
+        self.assertFalse(small.has_header("Content-Encoding"))
+        self.assertFalse(html.has_header("Content-Encoding"))
+
+    def test_refused_coding_is_not_used(self):
+        response = self.get(JsonResponse(self.payload), accept_encoding="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+def make_parcel(**fields):
+    return Parcel.objects.create(**{
+        "alkis_feature_id": "DENW1234",
+        "state_name": "Hessen",
+        "district_name": "Kassel",
+        "municipality_name": "Kassel",
+        "cadastral_area": "Kassel",
+        "communal_district": "Kassel",
+        "cadastral_parcel": "1",
+        "plot_number_main": "1",
+        "area_square_meters": 1000,
+        **fields,
+    })
+
+
+def compact_parcel(index, **fields):
+    """A parcel of the compact bulk-create payload, a small square near Kassel."""
+    lng, lat = 9.4 + index * 0.001, 51.3
+    return {
+        "alkis_feature_id": f"DEHE{index}",
+        "state_name": "Hessen",
+        "district_name": "Kassel",
+        "municipality_name": "Kassel",
+        "cadastral_area": "Kassel",
+        "communal_district": "Kassel",
+        "cadastral_parcel": str(index),
+        "plot_number_main": str(index),
+        "coordinates": [
+            [lng, lat], [lng + 0.0005, lat], [lng + 0.0005, lat + 0.0005], [lng, lat + 0.0005],
+        ],
+        **fields,
+    }
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class ParcelBuyTests(TestCase):
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            email="buyer@example.com", password="password123", role="developer")
+        self.parcel = make_parcel()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer token")
+
+    def test_buy_marks_parcel_purchased(self, mock_verify):
+        mock_verify.return_value = {"uid": "buyer-uid", "email": self.user.email}
+
+        response = self.client.post(f"/api/offers/parcels/{self.parcel.pk}/buy/")
+
+        self.assertEqual(response.status_code, 200)
+        details = response.data["transaction_details"]
+        self.assertEqual(details["user_email"], self.user.email)
+        self.assertEqual(details["transaction_id"], f"mock_txn_{self.parcel.pk}_{self.user.email}")
+        self.parcel.refresh_from_db()
+        self.assertEqual(self.parcel.status, "purchased")
+
+    def test_purchased_parcel_cannot_be_bought_again(self, mock_verify):
+        mock_verify.return_value = {"uid": "buyer-uid", "email": self.user.email}
+        Parcel.objects.filter(pk=self.parcel.pk).update(status="purchased")
+
+        response = self.client.post(f"/api/offers/parcels/{self.parcel.pk}/buy/")
+        self.assertEqual(response.status_code, 400)
+
+
+class CollectionListView:
+    @collection_condition(lambda request: Parcel.objects.all())
+    def list(self, request):
+        return HttpResponse("[]", content_type="application/json")
+
+
+class CollectionStateTests(TestCase):
+    def etag(self):
+        request = RequestFactory().get("/api/offers/parcel_geo_data/")
+        return collection_etag(request, [lambda request: Parcel.objects.all()])
+
+    def test_edit_changes_etag(self):
+        parcel = make_parcel()
+        etag = self.etag()
+
+        # Neither the count nor created_at change.
+        parcel.land_use = "Ackerland"
+        parcel.save()
+
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_delete_changes_etag(self):
+        make_parcel()
+        parcel = make_parcel(cadastral_parcel="2")
+        etag = self.etag()
+
+        parcel.delete()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_only_the_etag_validates(self):
+        make_parcel()
+        view = CollectionListView()
+
+        response = view.list(RequestFactory().get("/api/offers/parcel_geo_data/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+        # If-Modified-Since alone can't tell that a row was deleted.
+        response = view.list(RequestFactory().get(
+            "/api/offers/parcel_geo_data/", HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)))
+        self.assertEqual(response.status_code, 200)
+
+        response = view.list(RequestFactory().get(
+            "/api/offers/parcel_geo_data/", HTTP_IF_NONE_MATCH=response["ETag"]))
+        self.assertEqual(response.status_code, 304)
+
+
+class BulkCreateInvalidationTests(TestCase):
+    def test_bulk_created_parcels_invalidate_their_offer(self):
+        cache.clear()
+        offer = AreaOffer.objects.create(available_from="2027-01-01", important_remarks="")
+        version = fragment_cache.get_versions(fragment_cache.OFFER, [offer.pk])[offer.pk]
+
+        serializer = ParcelBulkCreateSerializer(
+            data={"parcels": [compact_parcel(1, appear_in_offer=str(offer.pk))]})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+        new_version = fragment_cache.get_versions(fragment_cache.OFFER, [offer.pk])[offer.pk]
+        self.assertNotEqual(new_version, version)
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class ParcelBulkCreateTests(TestCase):
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com", password="password123", role="landowner")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer token")
+
+    def post(self, payload):
+        return self.client.post("/api/offers/parcels/bulk-create/", payload, format="json")
+
+    def test_valid_batch_is_created_for_the_user(self, mock_verify):
+        mock_verify.return_value = {"uid": "landowner-uid", "email": self.user.email}
+
+        response = self.post({"parcels": [compact_parcel(index) for index in range(3)]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+        parcels = Parcel.objects.order_by("cadastral_parcel")
+        self.assertEqual([parcel.created_by_id for parcel in parcels], [self.user.pk] * 3)
+        # Areas are computed from the geometry, not taken from the payload.
+        self.assertTrue(all(parcel.area_square_meters > 0 for parcel in parcels))
+
+    def test_feature_collection_is_accepted(self, mock_verify):
+        mock_verify.return_value = {"uid": "landowner-uid", "email": self.user.email}
+        parcel = compact_parcel(1)
+        ring = parcel.pop("coordinates")
+
+        response = self.post({
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "properties": parcel,
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+            }],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Parcel.objects.get().created_by, self.user)
+
+    @override_settings(PARCEL_BULK_CREATE_MAX=2)
+    def test_batch_size_is_limited(self, mock_verify):
+        mock_verify.return_value = {"uid": "landowner-uid", "email": self.user.email}
+
+        self.assertEqual(self.post({"parcels": [compact_parcel(i) for i in range(2)]}).status_code, 201)
+        response = self.post({"parcels": [compact_parcel(i) for i in range(3)]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Parcel.objects.count(), 2)
+
+    def test_errors_are_reported_per_item(self, mock_verify):
+        mock_verify.return_value = {"uid": "landowner-uid", "email": self.user.email}
+        missing_state = compact_parcel(1)
+        del missing_state["state_name"]
+
+        response = self.post({"parcels": [compact_parcel(0), missing_state]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["parcels"][0], {})
+        self.assertIn("state_name", response.data["parcels"][1])
+
+        bad_ring = compact_parcel(1, coordinates=[[9.4, 51.3], [9.5, 51.3]])
+        response = self.post({"parcels": [compact_parcel(0), bad_ring]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(1, response.data["geometry"])
+        self.assertFalse(Parcel.objects.exists())
+
+
+class ParcelValuesSerializerTests(TestCase):
+    def test_output_matches_model_serializer(self):
+        user = MarketUser.objects.create_user(
+            email="landowner@example.com", password="password123", role="landowner")
+        offer = AreaOffer.objects.create(available_from="2027-01-01", important_remarks="")
+        ring = [[9.4, 51.3], [9.4005, 51.3], [9.4005, 51.3005], [9.4, 51.3005], [9.4, 51.3]]
+        make_parcel(
+            polygon=build_multipolygon([[ring]]),
+            area_square_meters=Decimal("1234.50"),
+            appear_in_offer=offer,
+            created_by=user,
+            land_use="Ackerland",
+            analyse_plus=True,
+        )
+        make_parcel(cadastral_parcel="2", polygon=None, area_square_meters=Decimal("7.05"))
+        parcels = Parcel.objects.order_by("pk")
+
+        expected = ParcelSerializer(parcels, many=True).data
+        actual = ParcelValuesSerializer(parcels).data
+
+        self.assertEqual(len(actual), len(expected))
+        for expected_item, actual_item in zip(expected, actual):
+            self.assertEqual(set(actual_item), set(expected_item))
+            for field, value in expected_item.items():
+                with self.subTest(parcel=expected_item["id"], field=field):
+                    if field == "polygon" and value is not None:
+                        # Equivalent GeoJSON, formatted differently.
+                        self.assertEqual(json.loads(actual_item[field]), json.loads(value))
+                    else:
+                        self.assertEqual(actual_item[field], value)
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class OfferQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            email="developer@example.com", password="password123", role="developer")
+        for index in range(3):
+            offer = AreaOffer.objects.create(
+                available_from="2027-01-01", important_remarks="", created_by=self.user,
+                criteria={"index": index})
+            for number in range(2):
+                parcel = make_parcel(cadastral_parcel=f"{index}-{number}", appear_in_offer=offer)
+            Watchlist.objects.create(user=self.user, parcel=parcel)
+            AreaOfferConfirmation.objects.create(
+                offer=offer, confirmed_by=self.user, utilization="SA")
+        # Steady state: the user is resolved from the cache, not the database.
+        cache_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer token")
+
+    def get(self, mock_verify, url):
+        mock_verify.return_value = {"uid": "developer-uid", "email": self.user.email}
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        return response
+
+    def test_watchlist_is_within_budget(self, mock_verify):
+        response = self.get(mock_verify, "/api/offers/parcels/watchlist/")
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(item["criteria"] for item in response.data))
+
+    def test_registered_parcels_is_within_budget(self, mock_verify):
+        response = self.get(mock_verify, "/api/offers/parcels/registered-parcels/")
+        self.assertEqual(len(response.data), 6)
+
+    def test_submitted_offers_is_within_budget(self, mock_verify):
+        response = self.get(mock_verify, "/api/offers/area_offers/submitted-offers/")
+        offers = response.data["offers"]
+        self.assertEqual(len(offers), 3)
+        self.assertTrue(all(len(item["offer"]["parcels"]) == 2 for item in offers))
+
+    def test_active_offers_is_within_budget(self, mock_verify):
+        response = self.get(mock_verify, "/api/offers/area_offers/active_offers/")
+        self.assertEqual(response.data["count"], 3)
+        self.assertTrue(all(len(offer["parcels"]) == 2 for offer in response.data["offers"]))
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class ActiveOffersListTests(TestCase):
+    url = "/api/offers/area_offers/active_offers/"
+
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            email="developer@example.com", password="password123", role="developer")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer token")
+
+    def get(self, mock_verify, **params):
+        mock_verify.return_value = {"uid": "developer-uid", "email": self.user.email}
+        return self.client.get(self.url, params)
+
+    def create_offers(self, count, **fields):
+        AreaOffer.objects.bulk_create([
+            AreaOffer(
+                offer_number=AreaOffer.objects.count() + index + 1,
+                available_from="2027-01-01", important_remarks="", **fields)
+            for index in range(count)
+        ])
+
+    def test_pages_default_to_20_and_are_capped_at_100(self, mock_verify):
+        self.create_offers(101)
+
+        response = self.get(mock_verify)
+        self.assertEqual(response.data["count"], 101)
+        self.assertEqual(len(response.data["offers"]), 20)
+        self.assertIsNone(response.data["previous"])
+        self.assertIn("page=2", response.data["next"])
+
+        self.assertEqual(len(self.get(mock_verify, page_size=5).data["offers"]), 5)
+        self.assertEqual(len(self.get(mock_verify, page_size=500).data["offers"]), 100)
+
+    def test_status_filter(self, mock_verify):
+        self.create_offers(2, status=AreaOffer.OfferStatus.ACTIVE)
+        self.create_offers(3, status=AreaOffer.OfferStatus.INACTIVE)
+
+        response = self.get(mock_verify, status=AreaOffer.OfferStatus.ACTIVE)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            {offer["status"] for offer in response.data["offers"]}, {AreaOffer.OfferStatus.ACTIVE})
+
+        self.assertEqual(self.get(mock_verify).data["count"], 5)
+
+        response = self.get(mock_verify, status="active")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.data)
+
+    def test_geometry_is_only_loaded_on_request(self, mock_verify):
+        offer = AreaOffer.objects.create(available_from="2027-01-01", important_remarks="")
+        ring = [[9.4, 51.3], [9.4005, 51.3], [9.4005, 51.3005], [9.4, 51.3]]
+        make_parcel(polygon=build_multipolygon([[ring]]), appear_in_offer=offer)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(mock_verify, include_geometry="false")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["offers"][0]["parcels"][0]["polygon"])
+        self.assertFalse(any('"polygon"' in query["sql"] for query in queries))
+
+        response = self.get(mock_verify, include_geometry="true")
+        polygon = json.loads(response.data["offers"][0]["parcels"][0]["polygon"])
+        self.assertEqual(polygon["type"], "MultiPolygon")
@@ -9,14 +9,18 @@ from django.conf import settings
 from decimal import Decimal
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.gis.db.models.functions import Transform
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.pagination import PageNumberPagination
 from .services import get_basket_summary
+from .cache import confirmation_payloads, get_stats, offer_payloads
+from .conditional import collection_condition
 from accounts.models import MarketUser
 from payments.models import PaymentTransaction
 from reports.models import Report
@@ -35,11 +39,18 @@ from .serializers import (
     AreaOfferConfirmationSerializer,
     LanduseSerializer,
     ParcelSerializer,
+    ParcelBulkCreateSerializer,
     ParcelGeoSerializer,
+    ParcelValuesSerializer,
     WatchlistSerializer,
     BasketItemSerializer
 )
-from accounts.firebase_auth import verify_firebase_token
+from accounts.firebase_auth import get_firebase_user
+from accounts.permissions import FirebaseIsAuthenticated
+from agrario_backend.fieldsets import Fieldset
+from agrario_backend.parsers import ORJSONParser
+from agrario_backend.query_budget import query_budget
+from uploads.blobs import store_blob
 
 from django.contrib.gis.db.models.functions import Transform
 import stripe
@@ -47,6 +58,18 @@ import stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
+def all_parcels_queryset(request):
+    return Parcel.objects.all()
+
+
+def registered_parcels_queryset(request):
+    return Parcel.objects.filter(appear_in_offer__isnull=False)
+
+
+def all_offers_queryset(request):
+    return AreaOffer.objects.all()
+
+
 class ParcelGeoViewSet(viewsets.ModelViewSet):
     serializer_class = ParcelGeoSerializer
 
@@ -56,35 +79,18 @@ class ParcelGeoViewSet(viewsets.ModelViewSet):
             polygon_4326=Transform('polygon', 4326)
         )
 
+    @collection_condition(all_parcels_queryset)
+    def list(self, request, *args, **kwargs):
+        """
+        GeoJSON of all parcels; answered with 304 while the collection is unchanged.
+        """
+        return super().list(request, *args, **kwargs)
+
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 
-class FirebaseIsAuthenticated(BasePermission):
-    """
-    Custom permission class for Firebase authentication.
-    """
-
-    def has_permission(self, request, view):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            request.error_message = {
-                "error": "Authentication header or Bearer token is missing."}
-            return False
-
-        token = auth_header.split("Bearer ")[1]
-        decoded_token = verify_firebase_token(token)
-        if not decoded_token:
-            request.error_message = {
-                "error": "Invalid or expired Firebase token."}
-            return False
-
-        request.user_email = decoded_token.get("email")
-        request.user_role = decoded_token.get("role", "user")
-        return True
-
-
 class LanduseViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Landuse instances.
@@ -103,36 +109,50 @@ class ParcelViewSet(viewsets.ModelViewSet):
     serializer_class = ParcelSerializer
     permission_classes = [FirebaseIsAuthenticated]
 
-    def perform_create(self, serializer):
-        """
-        Override the default create behavior to fetch `MarketUser` dynamically using Firebase UID.
-        """
-        auth_header = self.request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            raise PermissionDenied(
-                "Authentication token is missing or invalid.")
-
-        token = auth_header.split("Bearer ")[1]
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fieldset"] = Fieldset.from_request(self.request)
+        return context
 
-        # Verify the Firebase token
-        decoded_token = verify_firebase_token(token)
-        if not decoded_token:
-            raise PermissionDenied("Invalid or expired Firebase token.")
+    def list(self, request, *args, **kwargs):
+        """
+        List parcels through the values-based fast path.
 
-        # Fetch the Firebase UID and locate the corresponding MarketUser
-        email = decoded_token.get("email")
-        if not email:
-            raise PermissionDenied("Email not found in Firebase token.")
+        Supports `?fields=` / `?omit=`; only the selected columns are queried.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        fieldset = Fieldset.from_request(request)
+        return Response(ParcelValuesSerializer(queryset, fieldset=fieldset).data)
 
-        try:
-            market_user = MarketUser.objects.get(email=email)
-        except MarketUser.DoesNotExist:
+    def perform_create(self, serializer):
+        """
+        Override the default create behavior to set `created_by` to the
+        `MarketUser` of the request's Firebase token.
+        """
+        market_user = get_firebase_user(self.request)
+        if market_user is None:
             raise PermissionDenied(
-                "User associated with this Firebase UID not found.")
+                "User associated with this Firebase token not found.")
 
         # Save the Parcel instance with the `created_by` field set
         serializer.save(created_by=market_user)
 
+    @action(detail=False, methods=["post"], url_path="bulk-create", permission_classes=[FirebaseIsAuthenticated])
+    def bulk_create(self, request):
+        """
+        Create many parcels in one request from a FeatureCollection or a
+        compact `parcels` list.
+        """
+        serializer = ParcelBulkCreateSerializer(
+            data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        parcels = serializer.save(created_by=request.user)
+
+        return Response(
+            ParcelSerializer(parcels, many=True, context={"request": request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=True, methods=["get"], permission_classes=[FirebaseIsAuthenticated])
     def details(self, request, pk=None):
         """
@@ -180,31 +200,9 @@ class ParcelViewSet(viewsets.ModelViewSet):
         """
         Purchase a parcel.
         """
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return Response(
-                {"error": "Authentication token is missing or invalid."},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-
-        token = auth_header.split("Bearer ")[1]
-        decoded_token = verify_firebase_token(token)
-        if not decoded_token:
-            return Response(
-                {"error": "Invalid or expired Firebase token."},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-
-        user_email = decoded_token.get("email")
-        if not user_email:
-            return Response(
-                {"error": "Email not found in Firebase token."},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-
-        try:
-            user = MarketUser.objects.get(email=user_email)
-        except MarketUser.DoesNotExist:
+        # The token was already verified by the permission check.
+        user = get_firebase_user(request)
+        if user is None:
             return Response(
                 {"error": "User does not exist."},
                 status=status.HTTP_404_NOT_FOUND,
@@ -218,12 +216,12 @@ class ParcelViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            transaction_id = f"mock_txn_{parcel.id}_{user_email}"
+            transaction_id = f"mock_txn_{parcel.id}_{user.email}"
             transaction_details = {
                 "transaction_id": transaction_id,
                 "amount": parcel.area_square_meters * 10,  # Example pricing logic
                 "status": "completed",
-                "user_email": user_email,
+                "user_email": user.email,
             }
 
             parcel.status = "purchased"
@@ -426,8 +424,11 @@ class ParcelViewSet(viewsets.ModelViewSet):
         """
         user_email = request.user_email
         parcels = Parcel.objects.filter(created_by__email=user_email)
-        serializer = self.get_serializer(parcels, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fieldset = Fieldset.from_request(request)
+        return Response(
+            ParcelValuesSerializer(parcels, fieldset=fieldset).data,
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=True, methods=["get"], permission_classes=[FirebaseIsAuthenticated])
     def detailed_view(self, request, pk=None):
@@ -453,10 +454,9 @@ class ParcelViewSet(viewsets.ModelViewSet):
                 parcel, context={'request': request})
 
             offer_data = {}
-            if parcel.appear_in_offer:
-                offer_serializer = AreaOfferSerializer(
-                    parcel.appear_in_offer, context={'request': request})
-                offer_data = offer_serializer.data
+            if parcel.appear_in_offer_id:
+                offer_data = offer_payloads(
+                    [parcel.appear_in_offer_id], request)[0]
 
             if not report_purchased:
                 parcel_data = parcel_serializer.data
@@ -500,6 +500,9 @@ class ParcelViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(
                 cadastral_parcel__icontains=cadastral_parcel)
 
+        if not Fieldset.from_request(self.request).includes("polygon"):
+            queryset = queryset.defer("polygon")
+
         return queryset
 
     @action(detail=True, methods=["post"], url_path="add-to-watchlist", permission_classes=[FirebaseIsAuthenticated])
@@ -538,48 +541,54 @@ class ParcelViewSet(viewsets.ModelViewSet):
             return Response({"error": "Parcel not in the watchlist."}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=["get"], url_path="watchlist", permission_classes=[FirebaseIsAuthenticated])
+    @query_budget(3)
     def list_watchlist(self, request):
         """
         List all parcels in the user's watchlist with criteria from AreaOffer.
         """
-        watchlist_items = Watchlist.objects.filter(
-            user=request.user).values_list('parcel', flat=True)
-        parcels_in_watchlist = Parcel.objects.filter(id__in=watchlist_items)
+        parcels_in_watchlist = Parcel.objects.filter(
+            watched_by__user=request.user).select_related("appear_in_offer")
 
-        response_data = []
-
-        for parcel in parcels_in_watchlist:
-            parcel_data = ParcelSerializer(
-                parcel, context={'request': request}).data
-            criteria_data = parcel.appear_in_offer.criteria if parcel.appear_in_offer else {}
-
-            response_data.append({
-                "parcel": parcel_data,
-                "criteria": criteria_data
-            })
-
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(
+            self._parcels_with_criteria(parcels_in_watchlist),
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=False, methods=["get"], url_path="registered-parcels", permission_classes=[FirebaseIsAuthenticated])
+    @query_budget(4)
+    @collection_condition(registered_parcels_queryset, all_offers_queryset)
     def registered_parcels(self, request):
         """
         Vraća sve parcele koje imaju vezan AreaOffer sa odvojenim kriterijumima.
         """
-        parcels_with_offer = Parcel.objects.filter(
-            appear_in_offer__isnull=False)
-        response_data = []
+        parcels_with_offer = registered_parcels_queryset(request).select_related("appear_in_offer")
+
+        return Response(
+            self._parcels_with_criteria(parcels_with_offer),
+            status=status.HTTP_200_OK,
+        )
+
+    def _parcels_with_criteria(self, parcels):
+        """
+        Serialize parcels in one pass and pair each with its offer criteria.
 
-        for parcel in parcels_with_offer:
-            parcel_data = ParcelSerializer(
-                parcel, context={'request': request}).data
-            criteria_data = parcel.appear_in_offer.criteria if parcel.appear_in_offer else {}
+        Expects `appear_in_offer` to be selected with the parcels. The
+        `?fields=` / `?omit=` paths are relative to the parcel payload.
+        """
+        context = self.get_serializer_context()
+        if not context["fieldset"].includes("polygon"):
+            parcels = parcels.defer("polygon")
 
-            response_data.append({
-                "parcel": parcel_data,
-                "criteria": criteria_data
-            })
+        parcels = list(parcels)
+        parcel_data = ParcelSerializer(parcels, many=True, context=context).data
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return [
+            {
+                "parcel": data,
+                "criteria": parcel.appear_in_offer.criteria if parcel.appear_in_offer else {}
+            }
+            for parcel, data in zip(parcels, parcel_data)
+        ]
 
 class ParcelOwnershipPermission(IsAuthenticated):
     """
@@ -591,11 +600,22 @@ class ParcelOwnershipPermission(IsAuthenticated):
         return isinstance(obj, Parcel) and obj.created_by == request.user
 
 
+class AreaOfferPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
 class AreaOfferViewSet(viewsets.ModelViewSet):
     queryset = AreaOffer.objects.all()
     serializer_class = AreaOfferSerializer
     permission_classes = [FirebaseIsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, ORJSONParser]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fieldset"] = Fieldset.from_request(self.request)
+        return context
 
     def perform_create(self, serializer):
         """
@@ -647,30 +667,82 @@ class AreaOfferViewSet(viewsets.ModelViewSet):
         Return only AreaOffers created by the authenticated user.
         """
         user = self.request.user
-        queryset = AreaOffer.objects.filter(created_by=user).prefetch_related("parcels")
+        parcels = Parcel.objects.all()
+        if not Fieldset.from_request(self.request).includes("parcels.polygon"):
+            parcels = parcels.defer("polygon")
+        queryset = AreaOffer.objects.filter(created_by=user).prefetch_related(
+            Prefetch("parcels", queryset=parcels))
         return queryset
 
     def _handle_uploaded_files(self, offer):
         """
         Handles uploaded files for an AreaOffer.
+
+        Large documents should be uploaded with an upload session instead
+        (`/api/uploads/sessions/`), which stores them without passing
+        through this request. Files whose content is stored already are
+        not stored again.
         """
         files = self.request.FILES.getlist('documents')
         for file in files:
-            AreaOfferDocuments.objects.create(offer=offer, document=file)
+            blob = store_blob(file, content_type=file.content_type)
+            AreaOfferDocuments.objects.create(offer=offer, document=blob.storage_name, blob=blob)
 
     @action(detail=False, methods=["get"], url_path="active_offers", permission_classes=[FirebaseIsAuthenticated])
+    @query_budget(6)
     def list_active_offers(self, request):
         """
-        Return all active area offers with status 'A'.
+        Return a page of area offers, optionally filtered by `?status=`.
+
+        Offer payloads come from the versioned fragment cache; misses are
+        serialized with parcels and documents prefetched, so the page is built
+        in a fixed number of queries. Parcel geometries are only loaded with
+        `?include_geometry=true`; `?fields=` / `?omit=` prune the offer
+        payloads further.
         """
         # staviti kad skontamo sa statusima sta kako gde
         # active_offers = AreaOffer.objects.filter(status=AreaOffer.OfferStatus.ACTIVE)
         active_offers = AreaOffer.objects.all()
 
-        serializer = AreaOfferSerializer(
-            active_offers, many=True, context={'request': request})
+        offer_status = request.query_params.get("status")
+        if offer_status:
+            if offer_status not in AreaOffer.OfferStatus.values:
+                return Response(
+                    {"error": f"Invalid status. Expected one of {AreaOffer.OfferStatus.values}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            active_offers = active_offers.filter(status=offer_status)
+
+        include_geometry = request.query_params.get(
+            "include_geometry", "false").lower() == "true"
+
+        offer_ids = active_offers.order_by(
+            "-available_from", "offer_number").values_list("identifier", flat=True)
+
+        paginator = AreaOfferPagination()
+        page = paginator.paginate_queryset(offer_ids, request, view=self)
+
+        # Cached per-offer payloads; only the misses are serialized, with
+        # parcels and documents prefetched.
+        offers_data = offer_payloads(
+            page, request, include_geometry=include_geometry,
+            fieldset=Fieldset.from_request(request))
 
-        return Response({"offers": serializer.data}, status=status.HTTP_200_OK)
+        return Response({
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "offers": offers_data,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="cache-stats", permission_classes=[FirebaseIsAuthenticated])
+    def cache_stats(self, request):
+        """
+        Hit/miss counters of the serialized offer cache (superusers only).
+        """
+        if not request.user.is_superuser:
+            return Response({"error": "Only superusers can view cache statistics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(get_stats(), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="submit_offer", permission_classes=[FirebaseIsAuthenticated])
     def submit_offer(self, request, pk=None):
@@ -707,27 +779,29 @@ class AreaOfferViewSet(viewsets.ModelViewSet):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=["get"], url_path="submitted-offers", permission_classes=[FirebaseIsAuthenticated])
+    @query_budget(5)
     def submitted_offers(self, request):
         try:
             user = request.user
-            user_confirmations = AreaOfferConfirmation.objects.filter(
-                confirmed_by=user)
-
-            response_data = []
-
-            for confirmation in user_confirmations:
-                offer = confirmation.offer
-
-                offer_serializer = AreaOfferSerializer(
-                    offer, context={'request': request})
+            user_confirmations = list(
+                AreaOfferConfirmation.objects.filter(confirmed_by=user)
+                .select_related("offer")
+                .prefetch_related("offer__parcels", "offer__documented_offers")
+            )
 
-                confirmation_serializer = AreaOfferConfirmationSerializer(
-                    confirmation, context={'request': request})
+            offers_data = AreaOfferSerializer(
+                [confirmation.offer for confirmation in user_confirmations],
+                many=True, context={'request': request}).data
+            confirmations_data = AreaOfferConfirmationSerializer(
+                user_confirmations, many=True, context={'request': request}).data
 
-                response_data.append({
-                    "offer": offer_serializer.data,
-                    "offer_confirmation": confirmation_serializer.data
-                })
+            response_data = [
+                {
+                    "offer": offer_data,
+                    "offer_confirmation": confirmation_data
+                }
+                for offer_data, confirmation_data in zip(offers_data, confirmations_data)
+            ]
 
             return Response({"offers": response_data}, status=status.HTTP_200_OK)
 
@@ -747,17 +821,9 @@ class AreaOfferViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            offer = offer_confirmation.offer
-
-            offer_serializer = AreaOfferSerializer(
-                offer, context={'request': request})
-
-            confirmation_serializer = AreaOfferConfirmationSerializer(
-                offer_confirmation, context={'request': request})
-
             response_data = {
-                "offer": offer_serializer.data,
-                "offer_confirmation": confirmation_serializer.data
+                "offer": offer_payloads([offer_confirmation.offer_id], request)[0],
+                "offer_confirmation": confirmation_payloads([offer_confirmation], request)[0]
             }
 
             return Response(response_data, status=status.HTTP_200_OK)
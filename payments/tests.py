@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 from rest_framework.test import APIClient
 from unittest.mock import patch
 from django.utils.timezone import now, timedelta
@@ -6,6 +7,9 @@ from accounts.models import ProjectDeveloper, ProjectDeveloperInterest
 from subscriptions.models import PlatformSubscription, ProjectDeveloperSubscription
 from reports.models import Parcel
 from payments.models import PaymentTransaction
+from offers.cache import offer_payloads
+from offers.models import AreaOffer
+from offers.tests import make_parcel
 
 class ProjectDeveloperSubscriptionTests(TestCase):
     def setUp(self):
@@ -163,3 +167,32 @@ class ProjectDeveloperSubscriptionTests(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertIn("No valid parcels found.", response.data["error"])
+
+
+class AnalysePlusWebhookTests(TestCase):
+    @patch("stripe.PaymentIntent.retrieve")
+    def test_paid_analyse_plus_refreshes_cached_offer(self, mock_retrieve):
+        """The cached offer payloads show the parcel's new Analyse-Plus flag."""
+        cache.clear()
+        offer = AreaOffer.objects.create(available_from="2027-01-01", important_remarks="")
+        parcel = make_parcel(appear_in_offer=offer)
+        request = RequestFactory().get("/api/offers/areaoffers/")
+        [payload] = offer_payloads([offer.pk], request)
+        self.assertFalse(payload["parcels"][0]["analyse_plus"])
+
+        mock_retrieve.return_value = {
+            "metadata": {"payment_type": "analyse_plus", "parcel_ids": str(parcel.pk)},
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(
+                "/api/payments/stripe-webhook/",
+                {
+                    "type": "checkout.session.completed",
+                    "data": {"object": {"id": "cs_test", "payment_intent": "pi_test"}},
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        [payload] = offer_payloads([offer.pk], request)
+        self.assertTrue(payload["parcels"][0]["analyse_plus"])
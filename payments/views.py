@@ -1,5 +1,6 @@
 import stripe
 from django.conf import settings
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -10,7 +11,9 @@ from subscriptions.models import PlatformSubscription
 from offers.services import get_basket_summary
 import logging
 import json
+from offers import cache as offer_cache
 from offers.models import BasketItem, Parcel
+from offers.signals import bump_after_commit
 from accounts.models import ProjectDeveloper
 from decimal import Decimal
 import datetime
@@ -174,11 +177,17 @@ class StripeWebhookView(APIView):
                         parcel_ids = metadata.get("parcel_ids")
                         print("parcel_ids: ", parcel_ids)
                         if parcel_ids:
-                            for parcel_id in parcel_ids.split(","):
-                                parcel = Parcel.objects.filter(id=parcel_id)
-                                if parcel.exists():
-                                    parcel.update(analyse_plus=True)
-                                    print("Parcel updated:", parcel)
+                            parcels = Parcel.objects.filter(id__in=parcel_ids.split(","))
+                            offer_ids = set(
+                                parcels.exclude(appear_in_offer=None)
+                                .values_list("appear_in_offer_id", flat=True)
+                            )
+                            # `update` skips post_save, so the cached offer
+                            # payloads that embed these parcels are bumped here.
+                            parcels.update(analyse_plus=True, updated_at=timezone.now())
+                            for offer_id in offer_ids:
+                                bump_after_commit(offer_cache.OFFER, offer_id)
+                            print("Parcels updated:", parcel_ids)
 
                             BasketItem.objects.filter(parcel__id__in=parcel_ids.split(",")).delete()
                             print("Basket items deleted for parcel_ids:", parcel_ids)
@@ -0,0 +1,79 @@
+"""Energy suitability metrics for the Reports application.
+
+The metrics are computed with NumPy on arrays of parcel areas, so a whole
+offer or a batch of thousands of parcels is one set of array operations.
+Site inputs (irradiance, wind speed, grid distance) may be scalars or one
+value per parcel.
+"""
+
+import numpy as np
+
+SOLAR_PANEL_EFFICIENCY = 0.15  # 15% efficiency
+WIND_TURBINE_EFFICIENCY = 0.4  # 40% efficiency
+AIR_DENSITY = 1.225  # kg/m³ (at sea level)
+BATTERY_SCALING_FACTOR = 0.01  # Adjust scaling factor for battery suitability
+USABLE_SHARE_SOLAR = 0.5  # Assume 50% is usable for solar panels
+USABLE_SHARE_WIND = 0.1  # Assume 10% is usable for wind turbines
+HOURS_PER_YEAR = 8760
+
+METRICS = (
+    "total_area_m2",
+    "usable_area_solar_m2",
+    "usable_area_wind_m2",
+    "solar_energy_potential_kwh_per_year",
+    "wind_energy_potential_kwh_per_year",
+    "battery_suitability_score",
+)
+
+
+def energy_metrics(areas_m2, average_solar_irradiance, average_wind_speed, grid_distance):
+    """
+    Calculate energy suitability metrics for many parcels at once.
+
+    Args:
+        areas_m2 (array-like): Area of each parcel in square meters.
+        average_solar_irradiance (float or array-like): Average solar
+            irradiance in kWh/m²/day.
+        average_wind_speed (float or array-like): Average wind speed in m/s.
+        grid_distance (float or array-like): Distance to the nearest grid
+            infrastructure in meters.
+
+    Returns:
+        dict[str, numpy.ndarray]: One array per metric in `METRICS`, aligned
+        with `areas_m2`.
+    """
+    total_area = np.asarray(areas_m2, dtype=np.float64)
+    irradiance = np.asarray(average_solar_irradiance, dtype=np.float64)
+    wind_speed = np.asarray(average_wind_speed, dtype=np.float64)
+    grid_distance = np.broadcast_to(np.asarray(grid_distance, dtype=np.float64), total_area.shape)
+
+    usable_area_solar = total_area * USABLE_SHARE_SOLAR
+    usable_area_wind = total_area * USABLE_SHARE_WIND
+
+    solar_energy_potential = usable_area_solar * irradiance * 365 * SOLAR_PANEL_EFFICIENCY
+    wind_energy_potential = (
+        0.5 * AIR_DENSITY * usable_area_wind * wind_speed**3 * WIND_TURBINE_EFFICIENCY * HOURS_PER_YEAR
+    )
+    # Parcels without a known grid distance score 0.
+    battery_suitability = np.divide(
+        usable_area_solar * BATTERY_SCALING_FACTOR,
+        grid_distance,
+        out=np.zeros_like(total_area),
+        where=grid_distance > 0,
+    )
+
+    return {
+        "total_area_m2": total_area,
+        "usable_area_solar_m2": usable_area_solar,
+        "usable_area_wind_m2": usable_area_wind,
+        "solar_energy_potential_kwh_per_year": solar_energy_potential,
+        "wind_energy_potential_kwh_per_year": wind_energy_potential,
+        "battery_suitability_score": battery_suitability,
+    }
+
+
+def aggregate_metrics(metrics):
+    """
+    Sum per-parcel metrics into the metrics of the parcels as one area.
+    """
+    return {name: float(values.sum()) for name, values in metrics.items()}
@@ -5,6 +5,8 @@ import uuid
 from typing import Dict
 
 from offers.models import Parcel
+from .energy import energy_metrics
+from .services import AREA_SRID
 
 class Report(models.Model):
     """
@@ -68,6 +70,9 @@ class Report(models.Model):
         """
         Calculate energy suitability metrics for a parcel.
 
+        For many parcels use `reports.services.parcel_energy_metrics`, which
+        computes the same metrics for all of them at once.
+
         Args:
             mpoly (MultiPolygon): The geometry of the parcel.
             average_solar_irradiance (float): Average solar irradiance in kWh/m²/day.
@@ -77,37 +82,8 @@ class Report(models.Model):
         Returns:
             Dict[str, float]: A dictionary containing calculated metrics.
         """
-        # Constants
-        SOLAR_PANEL_EFFICIENCY = 0.15  # 15% efficiency
-        WIND_TURBINE_EFFICIENCY = 0.4  # 40% efficiency
-        AIR_DENSITY = 1.225  # kg/m³ (at sea level)
-        BATTERY_SCALING_FACTOR = 0.01  # Adjust scaling factor for battery suitability
-
-        # Calculate area
-        total_area_m2 = mpoly.area  # Total area in square meters
-        usable_area_solar = total_area_m2 * 0.5  # Assume 50% is usable for solar panels
-        usable_area_wind = total_area_m2 * 0.1  # Assume 10% is usable for wind turbines
-
-        # Solar energy potential
-        solar_energy_potential = (
-            usable_area_solar * average_solar_irradiance * 365 * SOLAR_PANEL_EFFICIENCY
-        )
-
-        # Wind energy potential
-        wind_energy_potential = (
-            0.5 * AIR_DENSITY * usable_area_wind * (average_wind_speed**3) * WIND_TURBINE_EFFICIENCY * 8760  # 8760 = hours in a year
-        )
-
-        # Battery suitability
-        battery_suitability = (
-            usable_area_solar / grid_distance * BATTERY_SCALING_FACTOR if grid_distance > 0 else 0
-        )
-
-        return {
-            "total_area_m2": total_area_m2,
-            "usable_area_solar_m2": usable_area_solar,
-            "usable_area_wind_m2": usable_area_wind,
-            "solar_energy_potential_kwh_per_year": solar_energy_potential,
-            "wind_energy_potential_kwh_per_year": wind_energy_potential,
-            "battery_suitability_score": battery_suitability,
-        }
+        # Measure in the same projection as `parcel_energy_metrics`; the
+        # area of the stored lat/lng geometry would be in square degrees.
+        area = mpoly.transform(AREA_SRID, clone=True).area
+        metrics = energy_metrics(area, average_solar_irradiance, average_wind_speed, grid_distance)
+        return {name: float(value) for name, value in metrics.items()}
@@ -68,3 +68,20 @@ class ReportSerializer(serializers.ModelSerializer):
                 data[field] = "Blurred"
 
         return data
+
+
+class EnergyMetricsRequestSerializer(serializers.Serializer):
+    """
+    Input of `ReportViewSet.energy_metrics`: the parcels, by id or by offer,
+    and the site inputs.
+    """
+    parcel_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    offer = serializers.UUIDField(required=False)
+    solar_irradiance = serializers.FloatField(default=4.5)
+    wind_speed = serializers.FloatField(default=7.0)
+    grid_distance = serializers.FloatField(default=1000)
+
+    def validate(self, attrs):
+        if not attrs.get("parcel_ids") and not attrs.get("offer"):
+            raise serializers.ValidationError("Provide 'parcel_ids' or 'offer'.")
+        return attrs
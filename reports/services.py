@@ -0,0 +1,61 @@
+import numpy as np
+from django.contrib.gis.db.models.functions import Area, Transform
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .energy import aggregate_metrics, energy_metrics
+
+# ETRS89 / UTM zone 32N, the projection the parcels are imported from;
+# areas in it are in square meters.
+AREA_SRID = 25832
+
+
+def parcel_areas(parcels):
+    """
+    Projected area of each parcel, computed by PostGIS in one query.
+
+    Args:
+        parcels (QuerySet): The parcels; those without a polygon are skipped.
+
+    Returns:
+        tuple: The parcel ids and a `numpy.ndarray` of their areas in m².
+    """
+    rows = list(
+        parcels.filter(polygon__isnull=False)
+        .annotate(projected_area=Cast(Area(Transform("polygon", AREA_SRID)), FloatField()))
+        .order_by("id")
+        .values_list("id", "projected_area")
+    )
+    if not rows:
+        return [], np.zeros(0)
+    ids, areas = zip(*rows)
+    return list(ids), np.asarray(areas, dtype=np.float64)
+
+
+def parcel_energy_metrics(parcels, solar_irradiance, wind_speed, grid_distance):
+    """
+    Energy metrics of many parcels, per parcel and for all of them together.
+
+    Args:
+        parcels (QuerySet): The parcels to analyse.
+        solar_irradiance (float): Average solar irradiance in kWh/m²/day.
+        wind_speed (float): Average wind speed in m/s.
+        grid_distance (float): Distance to the nearest grid infrastructure in meters.
+
+    Returns:
+        dict: `parcels`, a list of `{"parcel": id, <metric>: value}`, and
+        `total`, the summed metrics. Both are empty if no parcel has a polygon.
+    """
+    ids, areas = parcel_areas(parcels)
+    if not ids:
+        return {"parcels": [], "total": {}}
+
+    metrics = energy_metrics(areas, solar_irradiance, wind_speed, grid_distance)
+    columns = {name: values.tolist() for name, values in metrics.items()}
+    return {
+        "parcels": [
+            {"parcel": parcel_id, **{name: values[index] for name, values in columns.items()}}
+            for index, parcel_id in enumerate(ids)
+        ],
+        "total": aggregate_metrics(metrics),
+    }
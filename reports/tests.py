@@ -1,3 +1,108 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from accounts.firebase_auth import clear_token_cache
+from accounts.models import MarketUser
+from offers.models import Parcel
+from .energy import aggregate_metrics, energy_metrics
+from .models import Report
+from .services import AREA_SRID, parcel_energy_metrics
+
+
+class EnergyMetricsTests(SimpleTestCase):
+    def test_batch_matches_single_parcel_formula(self):
+        areas = np.array([10_000.0, 2_500.0, 0.0])
+        metrics = energy_metrics(areas, 4.5, 7.0, 1000)
+
+        usable_solar = 10_000.0 * 0.5
+        self.assertAlmostEqual(metrics["usable_area_solar_m2"][0], usable_solar)
+        self.assertAlmostEqual(
+            metrics["solar_energy_potential_kwh_per_year"][0], usable_solar * 4.5 * 365 * 0.15)
+        self.assertAlmostEqual(
+            metrics["wind_energy_potential_kwh_per_year"][1],
+            0.5 * 1.225 * 250.0 * 7.0**3 * 0.4 * 8760)
+        self.assertAlmostEqual(metrics["battery_suitability_score"][0], usable_solar / 1000 * 0.01)
+        self.assertEqual(metrics["total_area_m2"][2], 0.0)
+
+    def test_per_parcel_inputs_and_zero_grid_distance(self):
+        metrics = energy_metrics([1000.0, 1000.0], [4.0, 5.0], 7.0, [0.0, 500.0])
+
+        self.assertLess(*metrics["solar_energy_potential_kwh_per_year"])
+        self.assertEqual(metrics["battery_suitability_score"][0], 0.0)
+        self.assertAlmostEqual(metrics["battery_suitability_score"][1], 500.0 / 500.0 * 0.01)
+
+    def test_aggregate_sums_parcels(self):
+        total = aggregate_metrics(energy_metrics([1000.0, 3000.0], 4.5, 7.0, 1000))
+        self.assertEqual(total["total_area_m2"], 4000.0)
+        self.assertIsInstance(total["battery_suitability_score"], float)
+
+
+def make_parcel(index, polygon=True):
+    lng, lat = 9.4 + index * 0.01, 51.3
+    ring = ((lng, lat), (lng + 0.001, lat), (lng + 0.001, lat + 0.001), (lng, lat + 0.001), (lng, lat))
+    return Parcel.objects.create(
+        alkis_feature_id=f"DEHE{index}",
+        state_name="Hessen",
+        district_name="Kassel",
+        municipality_name="Kassel",
+        cadastral_area="Kassel",
+        communal_district="Kassel",
+        cadastral_parcel=str(index),
+        plot_number_main=str(index),
+        area_square_meters=0,
+        polygon=MultiPolygon(Polygon(ring), srid=4326) if polygon else None,
+    )
+
+
+@patch("accounts.firebase_auth.auth.verify_id_token")
+class ParcelEnergyMetricsTests(TestCase):
+    def setUp(self):
+        clear_token_cache()
+        cache.clear()
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com", password="password123", role="landowner")
+        self.parcels = [make_parcel(0), make_parcel(1), make_parcel(2, polygon=False)]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer token")
+
+    def authenticate(self, mock_verify):
+        mock_verify.return_value = {"uid": "landowner-uid", "email": self.user.email}
+
+    def test_metrics_use_projected_areas(self, mock_verify):
+        result = parcel_energy_metrics(Parcel.objects.all(), 4.5, 7.0, 1000)
+
+        self.assertEqual([row["parcel"] for row in result["parcels"]], [p.pk for p in self.parcels[:2]])
+        expected = self.parcels[0].polygon.transform(AREA_SRID, clone=True).area
+        self.assertAlmostEqual(result["parcels"][0]["total_area_m2"], expected, delta=1)
+        self.assertAlmostEqual(
+            result["total"]["total_area_m2"],
+            sum(row["total_area_m2"] for row in result["parcels"]))
+
+    def test_single_parcel_method_agrees_with_batch(self, mock_verify):
+        parcel = self.parcels[0]
+        single = Report.calculate_energy_metrics(parcel.polygon, 4.5, 7.0, 1000)
+        batch = parcel_energy_metrics(Parcel.objects.filter(pk=parcel.pk), 4.5, 7.0, 1000)
+
+        for name, value in batch["total"].items():
+            self.assertAlmostEqual(single[name], value, delta=abs(value) * 1e-6, msg=name)
+
+    def test_endpoint_returns_metrics_per_parcel(self, mock_verify):
+        self.authenticate(mock_verify)
+        response = self.client.post(
+            "/api/reports/energy_metrics/",
+            {"parcel_ids": [parcel.pk for parcel in self.parcels], "wind_speed": 6},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["parcels"]), 2)
+
+    def test_malformed_input_is_rejected(self, mock_verify):
+        self.authenticate(mock_verify)
+        for payload in ({"offer": "not-a-uuid"}, {"parcel_ids": "123"}, {}):
+            response = self.client.post("/api/reports/energy_metrics/", payload, format="json")
+            self.assertEqual(response.status_code, 400, payload)
@@ -2,43 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Report
-from .serializers import ReportSerializer
+from .serializers import EnergyMetricsRequestSerializer, ReportSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
 from django.contrib.gis.geos import MultiPolygon
-from rest_framework.permissions import BasePermission
 from rest_framework.views import APIView
-from accounts.firebase_auth import verify_firebase_token
+from accounts.permissions import FirebaseIsAuthenticated
 from django.http import HttpResponseNotFound, FileResponse
 from django.shortcuts import get_object_or_404
 import os
 from django.conf import settings
 import logging
 from offers.models import Parcel
+from .services import parcel_energy_metrics
 
 logger = logging.getLogger(__name__)
 
 
-class FirebaseIsAuthenticated(BasePermission):
-    """
-    Custom permission class for Firebase authentication.
-    """
-    def has_permission(self, request, view):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            request.error_message = {"error": "Authentication header or Bearer token is missing."}
-            return False
-
-        token = auth_header.split("Bearer ")[1]
-        decoded_token = verify_firebase_token(token)
-        if not decoded_token:
-            request.error_message = {"error": "Invalid or expired Firebase token."}
-            return False
-
-        request.user_email = decoded_token.get("email")
-        request.user_role = decoded_token.get("role", "user")
-        return True
-
 class ReportPagination(PageNumberPagination):
     page_size = 10
 
@@ -86,20 +66,14 @@ class ReportViewSet(viewsets.ModelViewSet):
             if not parcels.exists():
                 return Response({"error": "No valid parcels found."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Process the polygon from parcels
-            polygon = parcels.first().polygon
-            if not polygon:
+            # Calculate metrics for all parcels together
+            metrics = parcel_energy_metrics(parcels, solar_irradiance, wind_speed, grid_distance)["total"]
+            if not metrics:
                 return Response({"error": "Polygon data is missing for the selected parcels."}, status=status.HTTP_400_BAD_REQUEST)
 
-            mpoly = MultiPolygon(polygon) if polygon.geom_type == "Polygon" else polygon
-
-            # Calculate metrics
-            metrics = Report.calculate_energy_metrics(
-                mpoly=mpoly,
-                average_solar_irradiance=solar_irradiance,
-                average_wind_speed=wind_speed,
-                grid_distance=grid_distance,
-            )
+            # Combine the polygons of the parcels
+            polygons = [polygon for parcel in parcels if parcel.polygon for polygon in parcel.polygon]
+            mpoly = MultiPolygon(polygons, srid=polygons[0].srid)
 
             # Assign usable_area_m2 as the sum of usable solar and wind areas
             usable_area_m2 = metrics["usable_area_solar_m2"] + metrics["usable_area_wind_m2"]
@@ -142,6 +116,30 @@ class ReportViewSet(viewsets.ModelViewSet):
             logger.error(f"Unexpected error in create_report: {str(e)}")
             return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+    @action(detail=False, methods=["post"], url_path="energy_metrics")
+    def energy_metrics(self, request):
+        """
+        Energy metrics of many parcels without creating a report.
+
+        Takes `parcel_ids` or an `offer` identifier plus the site inputs of
+        `create_report`, and returns the metrics per parcel and in `total`.
+        """
+        serializer = EnergyMetricsRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        if data.get("offer"):
+            parcels = Parcel.objects.filter(appear_in_offer_id=data["offer"])
+        else:
+            parcels = Parcel.objects.filter(id__in=data["parcel_ids"])
+
+        result = parcel_energy_metrics(
+            parcels, data["solar_irradiance"], data["wind_speed"], data["grid_distance"])
+        if not result["parcels"]:
+            return Response({"error": "No valid parcels found."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["get"], permission_classes=[FirebaseIsAuthenticated])
     def view_report(self, request, pk=None):
         """
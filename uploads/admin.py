@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import Blob, UploadSession
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size", "content_type", "ref_count", "created_at")
+    search_fields = ("sha256", "storage_name")
+    readonly_fields = ("sha256", "storage_name", "size", "content_type", "ref_count")
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("filename", "user", "purpose", "status", "size", "created_at")
+    list_filter = ("purpose", "status", "backend", "created_at")
+    search_fields = ("filename", "user__email")
+    readonly_fields = ("storage_name", "upload_url", "received_bytes", "sha256", "blob", "completed_at")
@@ -0,0 +1,145 @@
+"""
+Storage backends for upload sessions, chosen with `UPLOAD_BACKEND`.
+
+- "gcs": the client uploads straight to Google Cloud Storage through a
+  resumable upload session; no file bytes pass through the web workers.
+- "local": chunks are PUT to this API and assembled on local disk, then
+  saved to the default storage. A stand-in for tests and development.
+
+Completing a session calls `verify`, which checks and hashes the stored
+file without holding any lock, then `register` inside the transaction that
+locks the session, which only records the blob.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .blobs import adopt_blob, hash_file, store_blob
+
+
+class UploadError(Exception):
+    """
+    The upload is incomplete or doesn't match the session.
+    """
+
+
+def check_digest(session, sha256):
+    if session.sha256 and session.sha256 != sha256:
+        raise UploadError("The uploaded file does not match the declared SHA-256.")
+
+
+class GCSResumableBackend:
+    name = "gcs"
+
+    # GCS accepts resumable chunks in multiples of 256 KiB.
+    CHUNK_GRANULARITY = 256 * 1024
+
+    def start(self, session, request):
+        """
+        Open a resumable upload session for the file and return the target
+        the client uploads to.
+        """
+        blob = default_storage.bucket.blob(session.storage_name)
+        session.upload_url = blob.create_resumable_upload_session(
+            content_type=session.content_type,
+            size=session.size,
+            origin=request.headers.get("Origin"),
+        )
+        return {
+            "method": "PUT",
+            "url": session.upload_url,
+            "chunk_granularity": self.CHUNK_GRANULARITY,
+        }
+
+    def write_chunk(self, session, start, data):
+        raise UploadError("Upload the file to the issued upload URL.")
+
+    def verify(self, session):
+        """
+        Check the uploaded object and return its SHA-256.
+
+        Hashing streams the object from the bucket, so it runs before
+        `complete_upload` locks the session.
+        """
+        gcs_blob = default_storage.bucket.get_blob(session.storage_name)
+        if gcs_blob is None:
+            raise UploadError("The file has not been uploaded.")
+        if gcs_blob.size != session.size:
+            raise UploadError(f"Expected {session.size} bytes, the stored file has {gcs_blob.size}.")
+
+        with gcs_blob.open("rb") as f:
+            sha256 = hash_file(f)
+        check_digest(session, sha256)
+        return sha256
+
+    def register(self, session, sha256):
+        """
+        Return the `Blob` of the verified object; identical content stored
+        before is kept and the new object deleted.
+        """
+        return adopt_blob(sha256, session.storage_name, session.size, session.content_type)
+
+
+class LocalChunkBackend:
+    name = "local"
+
+    def start(self, session, request):
+        session.upload_url = request.build_absolute_uri(
+            reverse("upload-session-chunk", args=[session.pk]))
+        return {
+            "method": "PUT",
+            "url": session.upload_url,
+            "chunk_granularity": 1,
+        }
+
+    def _part_path(self, session):
+        return os.path.join(settings.UPLOAD_LOCAL_DIR, f"{session.pk}.part")
+
+    def write_chunk(self, session, start, data):
+        """
+        Append a chunk; chunks must arrive in order.
+        """
+        if start != session.received_bytes:
+            raise UploadError(f"Expected a chunk starting at byte {session.received_bytes}.")
+        if session.received_bytes + len(data) > session.size:
+            raise UploadError("The chunk exceeds the announced file size.")
+
+        os.makedirs(settings.UPLOAD_LOCAL_DIR, exist_ok=True)
+        with open(self._part_path(session), "ab" if start else "wb") as f:
+            f.write(data)
+        session.received_bytes += len(data)
+
+    def verify(self, session):
+        if session.received_bytes != session.size:
+            raise UploadError(
+                f"Expected {session.size} bytes, received {session.received_bytes}.")
+
+        with open(self._part_path(session), "rb") as f:
+            sha256 = hash_file(f)
+        check_digest(session, sha256)
+        return sha256
+
+    def register(self, session, sha256):
+        path = self._part_path(session)
+        with open(path, "rb") as f:
+            file = File(f, name=session.filename)
+            blob = store_blob(file, session.filename, session.content_type, sha256=sha256)
+        os.remove(path)
+        return blob
+
+
+BACKENDS = {
+    GCSResumableBackend.name: GCSResumableBackend,
+    LocalChunkBackend.name: LocalChunkBackend,
+}
+
+
+def get_backend(name=None):
+    """
+    Return the backend of a session, or the configured one.
+    """
+    return BACKENDS[name or settings.UPLOAD_BACKEND]()
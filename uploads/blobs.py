@@ -0,0 +1,133 @@
+"""
+Content-addressed file storage with reference counting.
+
+`store_blob` hashes a file and saves it only if no blob with the same
+SHA-256 exists; `adopt_blob` does the same for a file a client already
+uploaded to storage. Each `Attachment` / `AreaOfferDocuments` row holds one
+reference; `release_blob` drops it and deletes the file with the last one.
+"""
+
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.text import get_valid_filename
+
+from .models import Blob
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file):
+    """
+    SHA-256 hex digest of a file-like object, read in chunks.
+    """
+    digest = hashlib.sha256()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(sha256, filename):
+    """
+    A fresh storage name for content with this hash.
+
+    Each name is unique, so concurrent uploads of the same content never
+    write to (or delete) the path another request's blob points to.
+    """
+    name = get_valid_filename(os.path.basename(filename or "")) or "file"
+    return f"blobs/{sha256[:2]}/{sha256}/{uuid.uuid4().hex[:12]}/{name}"
+
+
+def _acquire(sha256):
+    """
+    Take a reference on an existing blob, or return None.
+    """
+    blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+    if blob is not None:
+        Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+        blob.ref_count += 1
+    return blob
+
+
+def _create(sha256, storage_name, size, content_type):
+    """
+    Register a new blob with one reference, or None if another request
+    registered the same content first.
+    """
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(
+                sha256=sha256, storage_name=storage_name, size=size,
+                content_type=content_type or "", ref_count=1)
+    except IntegrityError:
+        return None
+
+
+def store_blob(file, filename=None, content_type="", sha256=None):
+    """
+    Store `file` unless its content is stored already; return its blob
+    with a reference taken for the caller. `sha256` skips hashing a file
+    that was hashed before.
+    """
+    sha256 = sha256 or hash_file(file)
+    filename = filename or getattr(file, "name", None)
+
+    with transaction.atomic():
+        blob = _acquire(sha256)
+        if blob is not None:
+            return blob
+
+        name = default_storage.save(blob_name(sha256, filename), file)
+        blob = _create(sha256, name, file.size, content_type)
+        if blob is None:
+            # Another request stored the same content first; drop our copy.
+            blob = _acquire(sha256)
+            if blob.storage_name != name:
+                default_storage.delete(name)
+    return blob
+
+
+def adopt_blob(sha256, storage_name, size, content_type=""):
+    """
+    Register a file already in storage under its hash. If the content is
+    stored already, the new copy is deleted and the existing blob is used.
+    """
+    with transaction.atomic():
+        blob = _acquire(sha256) or _create(sha256, storage_name, size, content_type)
+        if blob is None:
+            blob = _acquire(sha256)
+        if blob.storage_name != storage_name:
+            transaction.on_commit(lambda: default_storage.delete(storage_name))
+    return blob
+
+
+def retain_blob(blob):
+    """
+    Take another reference on a blob, e.g. for a deduplicated upload.
+    """
+    Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+
+
+def release_blob(blob_id):
+    """
+    Drop a reference; the last one deletes the blob and, after commit, its
+    file.
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - 1)
+            return
+        name = blob.storage_name
+        blob.delete()
+    transaction.on_commit(lambda: default_storage.delete(name))
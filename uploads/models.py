@@ -0,0 +1,120 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+
+class Blob(models.Model):
+    """
+    A stored file, shared by every attachment and offer document with the
+    same content.
+
+    Files are addressed by their SHA-256, so identical uploads are stored
+    once. `ref_count` counts the rows using the blob; the file is deleted
+    when the last one goes (see `uploads.blobs`).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    storage_name = models.CharField(max_length=512)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} references)"
+
+
+class UploadSession(models.Model):
+    """
+    A file uploaded by the client straight to storage.
+
+    The client announces the file, sends its bytes to the target issued by
+    the storage backend (see `uploads.backends`) and then completes the
+    session, which registers the stored file as a message `Attachment` or an
+    `AreaOfferDocuments` row.
+
+    Attributes:
+        purpose: What the file becomes once the upload completes.
+        offer: The offer a document is uploaded for.
+        storage_name: Name the file is uploaded to in the default storage.
+        sha256: Hash declared by the client; a blob the user already
+            uploaded with this hash is reused without a transfer.
+        blob: The stored content once the upload completes.
+        upload_url: Resumable upload URL issued by the backend.
+        received_bytes: Bytes stored so far (local backend).
+    """
+
+    MESSAGE_ATTACHMENT = "message_attachment"
+    OFFER_DOCUMENT = "offer_document"
+    PURPOSE_CHOICES = [
+        (MESSAGE_ATTACHMENT, "Message attachment"),
+        (OFFER_DOCUMENT, "Offer document"),
+    ]
+
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    ]
+
+    UPLOAD_TO = {
+        MESSAGE_ATTACHMENT: "messages/attachments/",
+        OFFER_DOCUMENT: "area_offer_documents/",
+    }
+
+    identifier = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    purpose = models.CharField(max_length=32, choices=PURPOSE_CHOICES)
+    offer = models.ForeignKey(
+        "offers.AreaOffer", on_delete=models.CASCADE, null=True, blank=True,
+        related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    storage_name = models.CharField(max_length=512, unique=True)
+    backend = models.CharField(max_length=16)
+    upload_url = models.TextField(blank=True)
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    blob = models.ForeignKey(
+        "Blob", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="upload_sessions"
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    attachment = models.OneToOneField(
+        "messaging.Attachment", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="upload_session"
+    )
+    document = models.OneToOneField(
+        "offers.AreaOfferDocuments", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="upload_session"
+    )
+
+    def __str__(self):
+        return f"Upload {self.identifier} - {self.filename} ({self.status})"
+
+    @staticmethod
+    def build_storage_name(purpose, filename):
+        """
+        A unique name for the file under the `upload_to` of its model.
+        """
+        name = get_valid_filename(os.path.basename(filename)) or "upload"
+        return f"{UploadSession.UPLOAD_TO[purpose]}{uuid.uuid4().hex}/{name}"
+
+    @property
+    def is_expired(self):
+        return timezone.now() >= self.expires_at
@@ -0,0 +1,49 @@
+from rest_framework import serializers
+
+from messaging.serializers import AttachmentSerializer
+from offers.models import AreaOffer
+from .models import UploadSession
+
+# (max size in bytes, allowed content types) per purpose
+LIMITS = {
+    UploadSession.MESSAGE_ATTACHMENT: (AttachmentSerializer.MAX_SIZE, AttachmentSerializer.ALLOWED_TYPES),
+    UploadSession.OFFER_DOCUMENT: (20 * 1024 * 1024, ['application/pdf', 'image/jpeg', 'image/png']),
+}
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offer = serializers.PrimaryKeyRelatedField(
+        queryset=AreaOffer.objects.all(), required=False, allow_null=True)
+    sha256 = serializers.RegexField(
+        r"^[0-9a-f]{64}$", required=False, allow_blank=True,
+        help_text="SHA-256 of the file, lowercase hex. Lets a repeated upload skip the transfer.")
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'identifier', 'purpose', 'offer', 'filename', 'content_type', 'size',
+            'sha256', 'status', 'received_bytes', 'created_at', 'expires_at', 'completed_at',
+            'attachment', 'document'
+        ]
+        read_only_fields = [
+            'identifier', 'status', 'received_bytes', 'created_at', 'expires_at',
+            'completed_at', 'attachment', 'document'
+        ]
+
+    def validate(self, attrs):
+        max_size, allowed_types = LIMITS[attrs['purpose']]
+        if attrs['size'] > max_size:
+            raise serializers.ValidationError(
+                {"size": f"File size must be under {max_size // (1024 * 1024)}MB."})
+        if attrs['content_type'] not in allowed_types:
+            raise serializers.ValidationError({"content_type": "Unsupported file type."})
+
+        offer = attrs.get('offer')
+        if attrs['purpose'] == UploadSession.OFFER_DOCUMENT:
+            if offer is None:
+                raise serializers.ValidationError({"offer": "Required for offer documents."})
+            if offer.created_by_id != self.context['request'].user.pk:
+                raise serializers.ValidationError({"offer": "You can only add documents to your own offers."})
+        elif offer is not None:
+            raise serializers.ValidationError({"offer": "Only offer documents belong to an offer."})
+        return attrs
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from messaging.models import Attachment
+from offers.models import AreaOfferDocuments
+from .backends import UploadError, get_backend
+from .blobs import retain_blob
+from .models import Blob, UploadSession
+
+
+def _uploaded_before(user, sha256, size):
+    """
+    A blob with this content that `user` uploaded before. Only the user's
+    own uploads count, so a hash can't be used to claim someone else's file.
+    """
+    if not sha256:
+        return None
+    return Blob.objects.filter(
+        sha256=sha256,
+        size=size,
+        upload_sessions__user=user,
+        upload_sessions__status=UploadSession.COMPLETED,
+    ).first()
+
+
+def start_upload(user, request, **fields):
+    """
+    Create an upload session and return it with the backend's upload target,
+    or no target when the user already uploaded the same content.
+    """
+    backend = get_backend()
+    session = UploadSession(
+        user=user,
+        backend=backend.name,
+        storage_name=UploadSession.build_storage_name(fields["purpose"], fields["filename"]),
+        expires_at=timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL),
+        **fields,
+    )
+    session.blob = _uploaded_before(user, session.sha256, session.size)
+    target = None if session.blob else backend.start(session, request)
+    session.save()
+    return session, target
+
+
+def _check_open(session):
+    if session.is_expired:
+        raise UploadError("The upload session has expired.")
+
+
+def complete_upload(session):
+    """
+    Verify the stored file and register it as an attachment or offer
+    document. Completing a completed session is a no-op.
+
+    Raises:
+        UploadError: If the upload is expired, incomplete or doesn't match.
+    """
+    session = UploadSession.objects.get(pk=session.pk)
+    if session.status == UploadSession.COMPLETED:
+        return session
+    _check_open(session)
+
+    backend = get_backend(session.backend)
+    # Hashing may download the whole file, so no transaction or row lock
+    # is held while it runs.
+    sha256 = None if session.blob else backend.verify(session)
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == UploadSession.COMPLETED:
+            return session
+        _check_open(session)
+
+        if session.blob:
+            # Same content as an earlier upload; nothing was transferred.
+            retain_blob(session.blob)
+            blob = session.blob
+        else:
+            blob = backend.register(session, sha256)
+
+        # Assigning the name stores a reference; nothing is re-uploaded.
+        if session.purpose == UploadSession.MESSAGE_ATTACHMENT:
+            session.attachment = Attachment.objects.create(file=blob.storage_name, blob=blob)
+        else:
+            session.document = AreaOfferDocuments.objects.create(
+                offer_id=session.offer_id, document=blob.storage_name, blob=blob)
+
+        session.blob = blob
+        session.status = UploadSession.COMPLETED
+        session.completed_at = timezone.now()
+        session.save()
+    return session
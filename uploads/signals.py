@@ -0,0 +1,21 @@
+"""
+Signal handlers for the Uploads application.
+
+Deleting an attachment or offer document drops its reference on the shared
+blob; the file itself goes with the last reference.
+"""
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from messaging.models import Attachment
+from offers.models import AreaOfferDocuments
+
+from .blobs import release_blob
+
+
+@receiver(post_delete, sender=Attachment)
+@receiver(post_delete, sender=AreaOfferDocuments)
+def release_file(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blob(instance.blob_id)
@@ -0,0 +1,186 @@
+import hashlib
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import MarketUser
+from messaging.models import Attachment, Message
+from . import blobs
+from .models import Blob, UploadSession
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    UPLOAD_BACKEND="local",
+    UPLOAD_LOCAL_DIR=tempfile.mkdtemp(),
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": MEDIA_ROOT},
+        },
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class LocalUploadSessionTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = MarketUser.objects.create_user(
+            email="landowner@example.com",
+            password="password123",
+            role="landowner",
+        )
+        MarketUser.objects.create_user(
+            email="support@example.com",
+            password="password123",
+            is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def start(self, size, **data):
+        return self.client.post("/api/uploads/sessions/", {
+            "purpose": UploadSession.MESSAGE_ATTACHMENT,
+            "filename": "plan.pdf",
+            "content_type": "application/pdf",
+            "size": size,
+            **data,
+        })
+
+    def put_chunk(self, session, data, start, total):
+        return self.client.put(
+            f"/api/uploads/sessions/{session['identifier']}/chunk/",
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{total}",
+        )
+
+    def test_chunked_upload_becomes_message_attachment(self):
+        content = b"%PDF-1.4 plan"
+        session = self.start(len(content)).data
+        self.assertEqual(session["upload"]["method"], "PUT")
+
+        first = self.put_chunk(session, content[:6], 0, len(content))
+        self.assertEqual(first.status_code, 308)
+        self.assertEqual(first["Range"], "bytes=0-5")
+        self.assertEqual(self.put_chunk(session, content[6:], 6, len(content)).status_code, 200)
+
+        completed = self.client.post(f"/api/uploads/sessions/{session['identifier']}/complete/")
+        self.assertEqual(completed.data["status"], UploadSession.COMPLETED)
+
+        response = self.client.post("/api/messaging/messages/", {
+            "subject": "Sonstiges", "body": "See attachment",
+            "attachment_ids": [completed.data["attachment"]],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        attachment = Message.objects.get().attachments.get()
+        with attachment.file.open("rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_chunks_must_arrive_in_order(self):
+        session = self.start(10).data
+
+        response = self.put_chunk(session, b"12345", 5, 10)
+        self.assertEqual(response.status_code, 400)
+
+        incomplete = self.client.post(f"/api/uploads/sessions/{session['identifier']}/complete/")
+        self.assertEqual(incomplete.status_code, 400)
+
+    def test_limits_are_checked_before_upload(self):
+        response = self.start(50 * 1024 * 1024)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def upload(self, content, **data):
+        session = self.start(len(content), **data).data
+        if session["upload"]:
+            self.put_chunk(session, content, 0, len(content))
+        return self.client.post(f"/api/uploads/sessions/{session['identifier']}/complete/")
+
+    def test_identical_uploads_share_one_blob(self):
+        content = b"%PDF-1.4 same plan"
+        first = self.upload(content)
+        second = self.upload(content)
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(content).hexdigest())
+        self.assertNotEqual(first.data["attachment"], second.data["attachment"])
+        self.assertEqual(
+            set(Attachment.objects.values_list("file", flat=True)), {blob.storage_name})
+
+    def test_declared_hash_skips_the_transfer(self):
+        content = b"%PDF-1.4 known plan"
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.upload(content, sha256=sha256)
+
+        session = self.start(len(content), sha256=sha256).data
+        self.assertIsNone(session["upload"])
+        completed = self.client.post(f"/api/uploads/sessions/{session['identifier']}/complete/")
+        self.assertEqual(completed.data["status"], UploadSession.COMPLETED)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    def test_declared_hash_must_match(self):
+        response = self.upload(b"%PDF-1.4 plan", sha256="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Blob.objects.exists())
+
+    def test_file_is_hashed_before_the_session_is_locked(self):
+        depths = []
+
+        def hash_outside(file):
+            depths.append(len(connection.atomic_blocks))
+            return blobs.hash_file(file)
+
+        outer = len(connection.atomic_blocks)
+        with patch("uploads.backends.hash_file", side_effect=hash_outside):
+            response = self.upload(b"%PDF-1.4 plan")
+
+        self.assertEqual(response.data["status"], UploadSession.COMPLETED)
+        self.assertEqual(depths, [outer])
+
+    def test_last_reference_deletes_the_file(self):
+        content = b"%PDF-1.4 shared"
+        self.upload(content)
+        self.upload(content)
+        blob = Blob.objects.get()
+        first, second = Attachment.objects.all()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.storage_name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.storage_name))
+
+    def test_losing_a_concurrent_store_keeps_the_winners_file(self):
+        winner = blobs.store_blob(ContentFile(b"same bytes", name="a.pdf"))
+        acquire = blobs._acquire
+
+        # The second request checks before the first one registered its blob.
+        with patch("uploads.blobs._acquire", side_effect=[None, acquire(winner.sha256)]):
+            loser = blobs.store_blob(ContentFile(b"same bytes", name="a.pdf"))
+
+        self.assertEqual(loser.pk, winner.pk)
+        self.assertTrue(default_storage.exists(winner.storage_name))
+        root = f"blobs/{winner.sha256[:2]}/{winner.sha256}"
+        copies = [
+            name for directory in default_storage.listdir(root)[0]
+            for name in default_storage.listdir(f"{root}/{directory}")[1]
+        ]
+        self.assertEqual(len(copies), 1)
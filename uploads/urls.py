@@ -0,0 +1,7 @@
+from rest_framework.routers import DefaultRouter
+from .views import UploadSessionViewSet
+
+router = DefaultRouter()
+router.register(r'sessions', UploadSessionViewSet, basename='upload-session')
+
+urlpatterns = router.urls
@@ -0,0 +1,87 @@
+import re
+
+from django.db import transaction
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .backends import UploadError, get_backend
+from .models import UploadSession
+from .serializers import UploadSessionSerializer
+from .services import complete_upload, start_upload
+
+re_content_range = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Upload files straight to storage.
+
+    1. `POST /api/uploads/sessions/` announces the file and returns an `upload`
+       target: PUT the bytes there, in chunks with `Content-Range` if needed.
+    2. `POST /api/uploads/sessions/<identifier>/complete/` registers the stored file
+       and returns the session with its `attachment` or `document` id.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        session, target = start_upload(request.user, request, **serializer.validated_data)
+
+        data = self.get_serializer(session).data
+        data["upload"] = target
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["put"], url_path="chunk", url_name="chunk")
+    def chunk(self, request, pk=None):
+        """
+        Receive a chunk for the local backend, like a GCS resumable upload:
+        308 with the stored `Range` until the last byte arrives.
+        """
+        match = re_content_range.fullmatch(request.headers.get("Content-Range", ""))
+        if not match:
+            return Response({"error": "A 'Content-Range: bytes start-end/total' header is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        start, end = int(match.group(1)), int(match.group(2))
+        data = request.body
+        if end - start + 1 != len(data):
+            return Response({"error": "Content-Range does not match the chunk size."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            session = self.get_queryset().select_for_update().filter(pk=pk).first()
+            if not session:
+                return Response({"error": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+            if session.status != UploadSession.PENDING or session.is_expired:
+                return Response({"error": "The upload session is closed."}, status=status.HTTP_409_CONFLICT)
+
+            try:
+                get_backend(session.backend).write_chunk(session, start, data)
+            except UploadError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            session.save(update_fields=["received_bytes"])
+
+        if session.received_bytes < session.size:
+            response = Response({"received_bytes": session.received_bytes}, status=308)
+            response["Range"] = f"bytes=0-{session.received_bytes - 1}"
+            return response
+        return Response({"received_bytes": session.received_bytes}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"], url_path="complete")
+    def complete(self, request, pk=None):
+        """
+        Register the uploaded file once all bytes are stored.
+        """
+        session = self.get_object()
+        try:
+            session = complete_upload(session)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)